@@ -0,0 +1,153 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Benchmark: f-k migration (fk_migration.py) vs. delay-and-sum (planewave_delays + RXbeamformer)
+#
+# Synthetic point scatterers are reconstructed with both engines on the same medium grid.
+# Reported: runtime (DAS including the delay table) on the full grid, and the -6 dB axial / lateral resolution
+# and the peak position of each point on a fine region of interest.
+# Both engines use the same receive aperture |x - x_element| <= z / (2 * F) (--fnumber, 0 = full aperture).
+#
+# usage (from the repository root, or with the package installed: pip install -e .):
+# PYTHONPATH=. python benchmarks/fk_vs_das.py --elements 128 --angles 7 --max-angle 10
+
+
+import argparse
+from datetime import datetime
+import numpy as np
+
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.src.delays import planewave_delays
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.fk_migration import fk_migration
+from dasIT.data.synthetic import point_scatterer_rf
+
+from resolution import point_resolution
+
+
+def receive_aperture(grid, dasIT_transducer, fnumber):
+    # rectangular receive aperture |x - x_element| <= z / (2 * F), shape [depth, lateral pixel, td_element, 1]
+    if fnumber is None:
+        return None
+    lateral_distance = np.abs(np.reshape(grid[0], (1, -1, 1)) -
+                              np.reshape(dasIT_transducer.lateral_transducer_spacing, (1, 1, -1)))
+    return np.expand_dims(lateral_distance <= np.reshape(grid[1], (-1, 1, 1)) / (2 * fnumber), axis=3).astype(int)
+
+
+def peak_position(frame, grid):
+    peak_z, peak_x = np.unravel_index(np.argmax(np.abs(frame)), frame.shape)
+    return np.ravel(grid[0])[peak_x], np.ravel(grid[1])[peak_z]
+
+
+def reconstruct(signals, dasIT_transducer, dasIT_medium, fnumber):
+    # delay-and-sum (including the delay table) and f-k migration on the same grid
+    sos = dasIT_medium.speed_of_sound
+    angles = dasIT_transducer.planewave_angles()
+    start_timing = datetime.now()
+    delays = planewave_delays(medium=dasIT_medium.medium,
+                              sos=sos,
+                              fsampling=dasIT_transducer.sampling_frequency,
+                              angles=angles,
+                              elements=dasIT_transducer.lateral_transducer_spacing,
+                              nsamples=dasIT_medium.rx_echo_totalnr_samples)
+    das_frame = RXbeamformer(signals=signals, delays=delays.sample_delays,
+                             apodization=receive_aperture(dasIT_medium.medium, dasIT_transducer, fnumber)).frame
+    das_time = (datetime.now() - start_timing).total_seconds()
+
+    start_timing = datetime.now()
+    fk_frame = fk_migration(signals=signals,
+                            transducer=dasIT_transducer,
+                            medium=dasIT_medium.medium,
+                            angles=angles,
+                            sos=sos,
+                            fnumber=fnumber).frame
+    fk_time = (datetime.now() - start_timing).total_seconds()
+    return das_frame, fk_frame, das_time, fk_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='f-k migration vs. delay-and-sum benchmark')
+    parser.add_argument('--elements', type=int, default=128)
+    parser.add_argument('--angles', type=int, default=7)
+    parser.add_argument('--max-angle', type=float, default=10, help='[deg]')
+    parser.add_argument('--depth', type=float, default=120, help='[wavelengths]')
+    parser.add_argument('--fnumber', type=float, default=1.0, help='receive F-number (0: full aperture)')
+    parser.add_argument('--roi-spacing', type=float, default=5e-5, help='pixel spacing of the resolution ROIs [m]')
+    args = parser.parse_args()
+
+    sos = 1540
+    dasIT_transducer = transducer(center_frequency_hz=5e6,
+                                  bandwidth_hz=[3e6, 7e6],
+                                  adc_ratio=4,
+                                  transducer_elements_nr=args.elements,
+                                  element_pitch_m=3e-4,
+                                  pinmap=np.arange(1, args.elements + 1),
+                                  focus_number=1.0,
+                                  totalnr_planewaves=args.angles,
+                                  planewave_angle_interval=[-args.max_angle, args.max_angle],
+                                  speed_of_sound_ms=sos)
+    def build_medium(roi=None, roi_spacing=None):
+        return medium(speed_of_sound_ms=sos,
+                      center_frequency=dasIT_transducer.center_frequency,
+                      sampling_frequency=dasIT_transducer.sampling_frequency,
+                      max_depth_wavelength=args.depth,
+                      lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing,
+                      roi=roi,
+                      roi_spacing=roi_spacing)
+    dasIT_medium = build_medium()
+    angles = dasIT_transducer.planewave_angles()
+    depth_m = args.depth * dasIT_transducer.wavelength
+    scatterers = [(x, z) for z in (0.25 * depth_m, 0.5 * depth_m, 0.75 * depth_m) for x in (-0.005, 0.0, 0.005)]
+
+    signals = point_scatterer_rf(transducer=dasIT_transducer,
+                                 nsamples=dasIT_medium.rx_echo_totalnr_samples,
+                                 scatterers=scatterers,
+                                 angles=angles,
+                                 sos=sos,
+                                 noise=0.01,
+                                 seed=0)
+
+    fnumber = args.fnumber if args.fnumber > 0 else None
+
+    # runtime on the full image grid
+    das_frame, fk_frame, das_time, fk_time = reconstruct(signals, dasIT_transducer, build_medium(), fnumber)
+    print(f'Configuration: {args.elements} elements, {args.angles} angles, F-number {args.fnumber}, '
+          f'grid {das_frame.shape[0]} x {das_frame.shape[1]} pixels')
+    print(f'Runtime DAS: {das_time:.3f} [s]   f-k: {fk_time:.3f} [s]   speedup: {das_time / fk_time:.1f}x')
+
+    # resolution and localization on a fine region of interest around each point (the full grid samples
+    # laterally at the element pitch)
+    print('Point (x, z) [mm]      DAS axial / lateral [mm]    f-k axial / lateral [mm]    f-k - DAS peak x / z [mm]')
+    for x_s, z_s in scatterers:
+        roi_medium = build_medium(roi=[[x_s - 1.5e-3, x_s + 1.5e-3], [z_s - 1e-3, z_s + 1e-3]],
+                                  roi_spacing=[args.roi_spacing, args.roi_spacing])
+        das_roi, fk_roi, _, _ = reconstruct(signals, dasIT_transducer, roi_medium, fnumber)
+        (das_res,), (fk_res,) = (point_resolution(das_roi, roi_medium.medium, [(x_s, z_s)], window=1e-3),
+                                 point_resolution(fk_roi, roi_medium.medium, [(x_s, z_s)], window=1e-3))
+        das_peak, fk_peak = (peak_position(frame, roi_medium.medium) for frame in (das_roi, fk_roi))
+        print(f'({x_s * 1e3:6.2f}, {z_s * 1e3:6.2f})      '
+              f'{das_res[0] * 1e3:5.3f} / {das_res[1] * 1e3:5.3f}               '
+              f'{fk_res[0] * 1e3:5.3f} / {fk_res[1] * 1e3:5.3f}               '
+              f'{(fk_peak[0] - das_peak[0]) * 1e3:6.3f} / {(fk_peak[1] - das_peak[1]) * 1e3:6.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Benchmark: minimum variance beamformer (mv_bf.py) vs. delay-and-sum (RXbeamformer)
+#
+# Both beamformers use the full receive aperture (or the F-number aperture with --fnumber-apodization).
+# Synthetic data: point scatterers (-6 dB resolution) and a pair of scatterers closer than the DAS lateral
+# resolution (depth of the dip between both peaks). CIRS data (optional, --cirs <directory with CIRS_phantom.h5,
+# transducer.csv and tgc_cntrl_pt.csv>, see example_data/CIRSphantom_GE9LD_VVantage): runtime and -6 dB resolution
+# of the brightest wire target.
+#
+# usage (from the repository root, or with the package installed: pip install -e .):
+# PYTHONPATH=. python benchmarks/mv_vs_das.py --subarray 32 --cirs example_data/CIRSphantom_GE9LD_VVantage
+
+
+import os
+import io
+import argparse
+import contextlib
+from datetime import datetime
+import numpy as np
+
+from dasIT.data.loader import RFDataloader, TDloader, TGCloader
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.features.tgc import tg_compensation
+from dasIT.features.signal import RFfilter, analytic_signal
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.mv_bf import mv_beamformer
+from dasIT.data.synthetic import point_scatterer_rf
+
+from resolution import point_resolution
+
+
+def beamform(signals, dasIT_transducer, dasIT_medium, args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        delays = planewave_delays(medium=dasIT_medium.medium,
+                                  sos=dasIT_medium.speed_of_sound,
+                                  fsampling=dasIT_transducer.sampling_frequency,
+                                  angles=dasIT_transducer.planewave_angles(),
+                                  elements=dasIT_transducer.lateral_transducer_spacing,
+                                  nsamples=dasIT_medium.rx_echo_totalnr_samples).sample_delays
+    apodization_table = None
+    if args.fnumber_apodization:
+        apodization_table = apodization(medium=dasIT_medium.medium,
+                                        transducer=dasIT_transducer,
+                                        apo='rec',
+                                        angles=dasIT_transducer.planewave_angles()).table
+
+    start_timing = datetime.now()
+    das_frame = RXbeamformer(signals=signals, delays=delays, apodization=apodization_table).frame
+    das_time = (datetime.now() - start_timing).total_seconds()
+
+    start_timing = datetime.now()
+    mv_frame = mv_beamformer(signals=signals,
+                             delays=delays,
+                             apodization=apodization_table,
+                             subarray=args.subarray,
+                             diagonal_loading=args.loading,
+                             axial_kernel=args.axial_kernel,
+                             workers=args.workers).frame
+    mv_time = (datetime.now() - start_timing).total_seconds()
+    return das_frame, mv_frame, das_time, mv_time
+
+
+def compare(signals, dasIT_transducer, build_medium, targets, args):
+    # runtime on the full image grid
+    dasIT_medium = build_medium()
+    das_frame, mv_frame, das_time, mv_time = beamform(signals, dasIT_transducer, dasIT_medium, args)
+    print(f'Grid {das_frame.shape[0]} x {das_frame.shape[1]} pixels, '
+          f'{dasIT_transducer.transducer_elements} elements, subarray {args.subarray}')
+    print(f'Runtime DAS: {das_time:.3f} [s]   MV: {mv_time:.3f} [s]   ratio: {mv_time / das_time:.1f}x')
+
+    # resolution on a fine region of interest around each target (the full grid samples laterally at the
+    # element pitch, too coarse to resolve the MV main lobe)
+    print('Target (x, z) [mm]     DAS axial / lateral [mm]    MV axial / lateral [mm]')
+    for x_s, z_s in targets:
+        roi_medium = build_medium(roi=[[x_s - 1.5e-3, x_s + 1.5e-3], [z_s - 0.75e-3, z_s + 0.75e-3]],
+                                  roi_spacing=[args.roi_spacing, args.roi_spacing])
+        das_roi, mv_roi, _, _ = beamform(signals, dasIT_transducer, roi_medium, args)
+        (das_res,), (mv_res,) = (point_resolution(das_roi, roi_medium.medium, [(x_s, z_s)], window=1.5e-3),
+                                 point_resolution(mv_roi, roi_medium.medium, [(x_s, z_s)], window=1.5e-3))
+        print(f'({x_s * 1e3:6.2f}, {z_s * 1e3:6.2f})      '
+              f'{das_res[0] * 1e3:5.3f} / {das_res[1] * 1e3:5.3f}               '
+              f'{mv_res[0] * 1e3:5.3f} / {mv_res[1] * 1e3:5.3f}')
+
+
+def two_point_dip(frame, grid, x_pair, z):
+    # intensity dip between the peaks of two laterally separated scatterers [dB] (0 dB: not resolved)
+    lateral = np.ravel(grid[0])
+    z_idx = np.argmin(np.abs(np.ravel(grid[1]) - z))
+    mid_x = np.argmin(np.abs(lateral - np.mean(x_pair)))
+    half_width = np.argmin(np.abs(lateral - x_pair[1])) - mid_x
+    profile = np.amax(np.abs(frame[max(z_idx - 2, 0):z_idx + 3, mid_x - 2 * half_width:mid_x + 2 * half_width + 1]), axis=0)
+    center = profile.size // 2
+    left_peak = np.argmax(profile[:center])
+    right_peak = center + np.argmax(profile[center:])
+    return 20 * np.log10(np.amin(profile[left_peak:right_peak + 1]) / min(profile[left_peak], profile[right_peak]))
+
+
+def synthetic(args):
+    sos = 1540
+    dasIT_transducer = transducer(center_frequency_hz=5e6,
+                                  bandwidth_hz=[3e6, 7e6],
+                                  adc_ratio=4,
+                                  transducer_elements_nr=args.elements,
+                                  element_pitch_m=3e-4,
+                                  pinmap=np.arange(1, args.elements + 1),
+                                  focus_number=1.0,
+                                  totalnr_planewaves=1,
+                                  planewave_angle_interval=[0, 0],
+                                  speed_of_sound_ms=sos)
+    def build_medium(roi=None, roi_spacing=None):
+        return medium(speed_of_sound_ms=sos,
+                      center_frequency=dasIT_transducer.center_frequency,
+                      sampling_frequency=dasIT_transducer.sampling_frequency,
+                      max_depth_wavelength=100,
+                      lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing,
+                      roi=roi,
+                      roi_spacing=roi_spacing)
+    dasIT_medium = build_medium()
+    depth_m = 100 * dasIT_transducer.wavelength
+    scatterers = [(x, z) for z in (0.3 * depth_m, 0.6 * depth_m) for x in (-0.006, 0.0)]
+    pair = (0.006 - 0.2e-3, 0.006 + 0.2e-3)
+    signals = point_scatterer_rf(transducer=dasIT_transducer,
+                                 nsamples=dasIT_medium.rx_echo_totalnr_samples,
+                                 scatterers=scatterers + [(x, 0.6 * depth_m) for x in pair],
+                                 angles=dasIT_transducer.planewave_angles(),
+                                 sos=sos,
+                                 noise=0.01,
+                                 seed=0)
+
+    print('--- synthetic point scatterers ---')
+    compare(signals, dasIT_transducer, build_medium, scatterers, args)
+
+    pair_medium = build_medium(roi=[[0.006 - 1e-3, 0.006 + 1e-3], [0.6 * depth_m - 0.5e-3, 0.6 * depth_m + 0.5e-3]],
+                               roi_spacing=[args.roi_spacing / 2, args.roi_spacing])
+    das_pair, mv_pair, _, _ = beamform(signals, dasIT_transducer, pair_medium, args)
+    print(f'Two scatterers {abs(pair[1] - pair[0]) * 1e3:.2f} mm apart: dip DAS '
+          f'{two_point_dip(das_pair, pair_medium.medium, pair, 0.6 * depth_m):.1f} [dB]   '
+          f'MV {two_point_dip(mv_pair, pair_medium.medium, pair, 0.6 * depth_m):.1f} [dB]')
+
+
+def cirs(args):
+    # CIRS phantom acquisition of the notebook (GE 9LD, Verasonics Vantage)
+    physical_transducer = TDloader(os.path.join(args.cirs, 'transducer.csv'))
+    dasIT_transducer = transducer(center_frequency_hz=physical_transducer.transducer['center frequency'].dropna().to_numpy()[0],
+                                  bandwidth_hz=physical_transducer.transducer['bandwidth'].dropna().to_numpy(dtype='float'),
+                                  adc_ratio=4,
+                                  transducer_elements_nr=physical_transducer.transducer['number of elements'].dropna().to_numpy()[0],
+                                  element_pitch_m=physical_transducer.transducer['element pitch'].dropna().to_numpy()[0],
+                                  pinmap=physical_transducer.transducer['pinmap'].dropna().to_numpy(dtype='int'),
+                                  pinmapbase=1,
+                                  elevation_focus=0.028,
+                                  totalnr_planewaves=1,
+                                  planewave_angle_interval=[0, 0],
+                                  axial_cutoff_wavelength=5,
+                                  speed_of_sound_ms=1540)
+    def build_medium(roi=None, roi_spacing=None):
+        return medium(speed_of_sound_ms=1540,
+                      center_frequency=dasIT_transducer.center_frequency,
+                      sampling_frequency=dasIT_transducer.sampling_frequency,
+                      max_depth_wavelength=177,
+                      lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing,
+                      axial_extrapolation_coef=1.05,
+                      attenuation_coefficient=0.75,
+                      attenuation_power=1.5,
+                      roi=roi,
+                      roi_spacing=roi_spacing)
+    dasIT_medium = build_medium()
+
+    rf = RFDataloader(os.path.join(args.cirs, 'CIRS_phantom.h5')).signal
+    rf[:dasIT_transducer.start_depth_rec_samples] = 0
+    rf = rf[:dasIT_medium.rx_echo_totalnr_samples, dasIT_transducer.transducer_pinmap, :1]
+    rf = tg_compensation(signals=rf,
+                         medium=dasIT_medium,
+                         center_frequency=dasIT_transducer.center_frequency,
+                         cntrl_points=TGCloader(os.path.join(args.cirs, 'tgc_cntrl_pt.csv')),
+                         mode='points').signals
+    rf = RFfilter(signals=rf, fcutoff_band=dasIT_transducer.bandwidth,
+                  fsampling=dasIT_transducer.sampling_frequency, type='gaussian', order=10).signal
+    signals = analytic_signal(rf)
+
+    # brightest target below the first recorded echo (located in a reference DAS image)
+    with contextlib.redirect_stdout(io.StringIO()):
+        delays = planewave_delays(medium=dasIT_medium.medium, sos=1540,
+                                  fsampling=dasIT_transducer.sampling_frequency,
+                                  angles=dasIT_transducer.planewave_angles(),
+                                  nsamples=dasIT_medium.rx_echo_totalnr_samples).sample_delays
+    envelope = np.abs(RXbeamformer(signals=signals, delays=delays).frame)
+    axial = np.ravel(dasIT_medium.medium[1])
+    envelope[axial < 2 * dasIT_transducer.start_depth_rec_m] = 0
+    z_idx, x_idx = np.unravel_index(np.argmax(envelope), envelope.shape)
+    target = [(np.ravel(dasIT_medium.medium[0])[x_idx], axial[z_idx])]
+
+    print('--- CIRS phantom ---')
+    compare(signals, dasIT_transducer, build_medium, target, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='minimum variance vs. delay-and-sum benchmark')
+    parser.add_argument('--elements', type=int, default=128, help='synthetic transducer elements')
+    parser.add_argument('--subarray', type=int, default=32)
+    parser.add_argument('--loading', type=float, default=1e-2, help='diagonal loading (fraction of trace / L)')
+    parser.add_argument('--axial-kernel', type=int, default=1, help='axial averaging [+/- depth pixels]')
+    parser.add_argument('--workers', type=int, default=None, help='threads (default: all cores)')
+    parser.add_argument('--fnumber-apodization', action='store_true', help='F-number receive aperture (default: full aperture)')
+    parser.add_argument('--roi-spacing', type=float, default=5e-5, help='pixel spacing of the resolution ROIs [m]')
+    parser.add_argument('--cirs', default=None, help='directory of the CIRS phantom data')
+    args = parser.parse_args()
+
+    synthetic(args)
+    if args.cirs is not None:
+        cirs(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Resolution helpers of the benchmarks: -6 dB (FWHM) axial and lateral widths of point targets
+
+
+import numpy as np
+
+
+def fwhm(profile, spacing):
+    # -6 dB width of a (peak centered) profile with linear interpolation of the crossings
+    profile = profile / np.amax(profile)
+    peak = np.argmax(profile)
+    above = profile >= 0.5
+    left = peak
+    while left > 0 and above[left - 1]:
+        left -= 1
+    right = peak
+    while right < profile.size - 1 and above[right + 1]:
+        right += 1
+    left_edge = left - (profile[left] - 0.5) / (profile[left] - profile[left - 1]) if left > 0 else left
+    right_edge = right + (profile[right] - 0.5) / (profile[right] - profile[right + 1]) if right < profile.size - 1 else right
+    return (right_edge - left_edge) * spacing
+
+
+def point_resolution(frame, grid, scatterers, window=None, max_window=3e-3):
+    # window: half width [m] of the search patch around each scatterer. By default half the distance to the
+    # nearest other scatterer (at most max_window), so the patch never contains a neighbouring target.
+    envelope = np.abs(frame)
+    lateral = np.ravel(grid[0])
+    axial = np.ravel(grid[1])
+    lateral_spacing = np.mean(np.diff(lateral))
+    axial_spacing = np.mean(np.diff(axial))
+    positions = np.asarray(scatterers, dtype=np.float64).reshape(-1, 2)
+    results = []
+    for x_s, z_s in positions:
+        half_width = window
+        if half_width is None:
+            distances = np.hypot(positions[:, 0] - x_s, positions[:, 1] - z_s)
+            distances = distances[distances > 0]
+            half_width = min(max_window, np.amin(distances) / 2) if distances.size else max_window
+        z_window = max(int(half_width / axial_spacing), 1)
+        x_window = max(int(half_width / lateral_spacing), 1)
+        z_idx = np.argmin(np.abs(axial - z_s))
+        x_idx = np.argmin(np.abs(lateral - x_s))
+        z_slice = slice(max(z_idx - z_window, 0), z_idx + z_window + 1)
+        x_slice = slice(max(x_idx - x_window, 0), x_idx + x_window + 1)
+        patch = envelope[z_slice, x_slice]
+        peak_z, peak_x = np.unravel_index(np.argmax(patch), patch.shape)
+        results.append((fwhm(patch[:, peak_x], axial_spacing),
+                        fwhm(patch[peak_z, :], lateral_spacing)))
+    return results
@@ -0,0 +1,164 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Command line interface
+#
+# python -m dasIT plan --elements 128 --pitch 3e-4 --center-frequency 5e6 --angles 11 --angle-interval -10 10
+#                      --depth 120 --frames 8 --memory-budget 8G --calibration calibration.json [--json]
+#
+# python -m dasIT serve --socket /tmp/dasIT.sock --elements 128 --pitch 3e-4 --center-frequency 5e6 --angles 11
+#                       --angle-interval -10 10 --depth 120 [--apodization rec --max-batch 8 --batch-window 0.005]
+#
+# plan: resource estimate of a configuration (see src/planner.py). With --calibration the micro-benchmark result
+# is read from the file, or measured and stored there if the file does not exist yet.
+#
+# serve: local daemon mode of the beamforming service (see service/beamforming_service.py). The delay and
+# apodization tables of the setup are built once, clients connect to the Unix socket. Stopped with Ctrl+C.
+
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization
+from dasIT.src.planner import resource_planner, calibrate, load_calibration, save_calibration, parse_bytes
+from dasIT.service.beamforming_service import beamforming_server
+
+
+def setup(args):
+    dasIT_transducer = transducer(center_frequency_hz=args.center_frequency,
+                                  bandwidth_hz=[0, 0],
+                                  adc_ratio=args.adc_ratio,
+                                  transducer_elements_nr=args.elements,
+                                  element_pitch_m=args.pitch,
+                                  pinmap=np.arange(1, args.elements + 1),
+                                  focus_number=args.fnumber,
+                                  totalnr_planewaves=args.angles,
+                                  planewave_angle_interval=args.angle_interval,
+                                  speed_of_sound_ms=args.sos)
+    dasIT_medium = medium(speed_of_sound_ms=args.sos,
+                          center_frequency=dasIT_transducer.center_frequency,
+                          sampling_frequency=dasIT_transducer.sampling_frequency,
+                          max_depth_wavelength=args.depth,
+                          lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing)
+    return dasIT_transducer, dasIT_medium
+
+
+def plan(args):
+    dasIT_transducer, dasIT_medium = setup(args)
+
+    calibration = None
+    if args.calibration is not None:
+        if os.path.exists(args.calibration):
+            calibration = load_calibration(args.calibration)
+        else:
+            calibration = calibrate()
+            save_calibration(calibration, args.calibration)
+
+    planner = resource_planner(transducer=dasIT_transducer,
+                               medium=dasIT_medium,
+                               frames=args.frames,
+                               signal_dtype=args.dtype,
+                               backend=args.backend,
+                               memory_budget=parse_bytes(args.memory_budget) if args.memory_budget else None,
+                               calibration=calibration)
+    if args.json:
+        print(json.dumps(planner.to_dict(), indent=2))
+    else:
+        print(planner.report())
+    # exit code 1 if the configuration does not fit into the memory budget
+    return 1 if planner.recommendation['fits'] is False else 0
+
+
+def serve(args):
+    dasIT_transducer, dasIT_medium = setup(args)
+    angles = dasIT_transducer.planewave_angles()
+    nsamples = dasIT_medium.rx_echo_totalnr_samples
+    delays = planewave_delays(medium=dasIT_medium.medium,
+                              sos=dasIT_medium.speed_of_sound,
+                              fsampling=dasIT_transducer.sampling_frequency,
+                              angles=angles,
+                              elements=dasIT_transducer.lateral_transducer_spacing,
+                              nsamples=nsamples).sample_delays
+    apodization_table = apodization(delays=None,
+                                    medium=dasIT_medium.medium,
+                                    transducer=dasIT_transducer,
+                                    apo=args.apodization,
+                                    angles=angles).table
+
+    server = beamforming_server(socket_path=args.socket,
+                                delays=delays,
+                                apodization=apodization_table,
+                                nsamples=nsamples,
+                                max_batch=args.max_batch,
+                                batch_window=args.batch_window)
+    print(f'Serving frames of {list(server.frame_shape)} pixels from {nsamples} samples on {args.socket}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def add_setup_arguments(parser):
+    parser.add_argument('--elements', type=int, default=128)
+    parser.add_argument('--pitch', type=float, default=3e-4, help='element pitch [m]')
+    parser.add_argument('--center-frequency', type=float, default=5e6, help='[Hz]')
+    parser.add_argument('--adc-ratio', type=int, default=4, help='samples per wavelength')
+    parser.add_argument('--fnumber', type=float, default=1.0)
+    parser.add_argument('--angles', type=int, default=1, help='number of plane waves')
+    parser.add_argument('--angle-interval', type=float, nargs=2, default=[0, 0], help='[deg]')
+    parser.add_argument('--depth', type=float, default=60, help='imaging depth [wavelengths]')
+    parser.add_argument('--sos', type=float, default=1540, help='speed of sound [m/s]')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='dasIT')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help='estimate memory and runtime of a configuration')
+    add_setup_arguments(plan_parser)
+    plan_parser.add_argument('--frames', type=int, default=1, help='frames beamformed in one batch')
+    plan_parser.add_argument('--dtype', default='complex128', help='dtype of the channel data')
+    plan_parser.add_argument('--backend', choices=('numpy', 'numba'), default='numpy')
+    plan_parser.add_argument('--memory-budget', default=None, help='e.g. 8G')
+    plan_parser.add_argument('--calibration', default=None, help='calibration file (JSON)')
+    plan_parser.add_argument('--json', action='store_true', help='machine readable output')
+    plan_parser.set_defaults(function=plan)
+
+    serve_parser = subparsers.add_parser('serve', help='run the local beamforming service for a configuration')
+    add_setup_arguments(serve_parser)
+    serve_parser.add_argument('--socket', required=True, help='path of the Unix domain socket')
+    serve_parser.add_argument('--apodization', default='rec', help='apodization window (see src/apodization.py)')
+    serve_parser.add_argument('--max-batch', type=int, default=8, help='maximum number of frames per batch')
+    serve_parser.add_argument('--batch-window', type=float, default=0.005, help='batch collection window [s]')
+    serve_parser.set_defaults(function=serve)
+
+    args = parser.parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
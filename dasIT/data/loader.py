@@ -21,6 +21,8 @@ Author: Christoph Leitner, Date: Aug. 2022
 
 
 
+import queue
+import threading
 import numpy as np
 import pandas as pd
 import h5py
@@ -45,6 +47,112 @@ class RFDataloader():
 
         return frames
 
+class RFprefetchloader():
+    # Double-buffered RF data reader:
+    # A background thread reads chunk N+1 (a number of frames) from the HDF5 file while chunk N is being
+    # processed (tg_compensation, RFfilter, RXbeamformer, ...). Chunks are read directly into a fixed pool of
+    # preallocated buffers that are recycled, and a bounded queue limits how far the reader runs ahead.
+    #
+    # Iterating yields (index of the first frame, signals) with
+    # shape signals: [samples, channels, chunk frames * shots] (same layout as RFDataloader.signal)
+    #
+    # The yielded signals are a view of a recycled buffer: they are valid until the next chunk is requested.
+    # Copy them if they need to be kept.
+    #
+    # Reading starts at frame `start` (e.g. to resume an interrupted job, see writer.py).
+    def __init__(self, path, chunk=1, queue_size=2, dtype=np.float64, start=0):
+        self._path = path
+        self._chunk = int(chunk)
+        self._start = int(start)
+        self._queue_size = int(queue_size)
+        self._dtype = dtype
+
+        with h5py.File(self._path, 'r') as file:
+            self._nbr_frames = len(file.keys())
+            self._nbr_shots = len(file[f'frame0000'].keys())
+            self._shot_shape = file[f'frame0000/shot0000'].shape
+
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def _read_chunks(self, free_buffers, ready_chunks):
+        try:
+            with h5py.File(self._path, 'r') as file:
+                for frame_start in range(self._start, self._nbr_frames, self._chunk):
+                    nbr_chunk_frames = min(self._chunk, self._nbr_frames - frame_start)
+
+                    buffer = None
+                    while buffer is None:
+                        if self._stop.is_set():
+                            return
+                        try:
+                            buffer = free_buffers.get(timeout=0.1)
+                        except queue.Empty:
+                            pass
+
+                    # shape buffer: [chunk frames, shots, samples, channels]
+                    for f in range(nbr_chunk_frames):
+                        for s in range(self._nbr_shots):
+                            file[f'frame{frame_start + f:04}/shot{s:04}'].read_direct(buffer, dest_sel=np.s_[f, s])
+
+                    self._put(ready_chunks, (frame_start, nbr_chunk_frames, buffer))
+        except Exception as error:
+            self._put(ready_chunks, error)
+        self._put(ready_chunks, None)
+
+
+    def _put(self, ready_chunks, item):
+        while not self._stop.is_set():
+            try:
+                ready_chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+    def __iter__(self):
+        # buffers: one being read, queue_size waiting in the queue and one being processed
+        free_buffers = queue.Queue()
+        for _ in range(self._queue_size + 2):
+            free_buffers.put(np.empty((self._chunk, self._nbr_shots) + tuple(self._shot_shape), dtype=self._dtype))
+        ready_chunks = queue.Queue(maxsize=self._queue_size)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._read_chunks, args=(free_buffers, ready_chunks), daemon=True)
+        self._thread.start()
+
+        try:
+            while True:
+                item = ready_chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                frame_start, nbr_chunk_frames, buffer = item
+                signals = buffer[:nbr_chunk_frames].reshape((-1,) + tuple(self._shot_shape))
+                yield frame_start, np.moveaxis(signals, 0, -1)
+                free_buffers.put(buffer)
+        finally:
+            self.close()
+
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+    def __len__(self):
+        return int(np.ceil(max(self._nbr_frames - self._start, 0) / self._chunk))
+
+    @property
+    def nbr_frames(self):
+        return self._nbr_frames
+
+
 class TDloader():
     def __init__(self, transducer_path=None):
         self.transducer = pd.read_csv(transducer_path)
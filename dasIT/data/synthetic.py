@@ -0,0 +1,109 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Synthetic plane wave channel data:
+# Point scatterers (x, z) [m] insonified by tilted plane waves. The echo of each scatterer arrives at element x
+# after the two-way travel time (same geometry as delays.py)
+#
+# t(x) = (z_s * cos(alpha) + x_s * sin(alpha) + sqrt(z_s^2 + (x - x_s)^2)) / c
+#
+# The pulse is a Gaussian modulated sinusoid at the transducer center frequency.
+#
+# shape signals: [samples, td_element, nbr of angles]
+
+
+import numpy as np
+from scipy.signal import hilbert
+
+
+def point_scatterer_rf(transducer=None,
+                       nsamples=None,
+                       scatterers=None,
+                       angles=0,
+                       sos=1540,
+                       pulse_cycles=1.5,
+                       noise=0,
+                       analytic=True,
+                       seed=None):
+
+    fsampling = transducer.sampling_frequency
+    fcenter = transducer.center_frequency
+    elements = np.ravel(transducer.lateral_transducer_spacing)
+    angles = np.ravel(angles)
+
+    time = (np.arange(nsamples) / fsampling).reshape(-1, 1)
+    # Gaussian envelope with a -6 dB duration of pulse_cycles periods
+    envelope_sigma = pulse_cycles / fcenter / (2 * np.sqrt(2 * np.log(2)))
+
+    signals = np.zeros((nsamples, elements.size, angles.size))
+    for angle_idx, angle in enumerate(angles):
+        for x_s, z_s in scatterers:
+            travel_time = (z_s * np.cos(angle) + x_s * np.sin(angle) + np.sqrt(z_s ** 2 + (elements - x_s) ** 2)) / sos
+            delayed_time = time - travel_time.reshape(1, -1)
+            signals[:, :, angle_idx] += np.cos(2 * np.pi * fcenter * delayed_time) * \
+                                        np.exp(-delayed_time ** 2 / (2 * envelope_sigma ** 2))
+
+    if noise:
+        signals += noise * np.random.default_rng(seed).standard_normal(signals.shape)
+
+    if analytic:
+        return hilbert(signals, axis=0)
+    return signals
+
+
+# Row-column addressed array (see rowcolumn_bf.py):
+# Point scatterers (x, y, z) [m] insonified by plane waves of the rows (steered in the y-z plane) and received
+# by the columns. A column integrates along y, its echo arrives after
+#
+# t(x_c) = (z_s * cos(alpha) + y_s * sin(alpha) + sqrt(z_s^2 + (x_c - x_s)^2)) / c
+#
+# shape signals: [samples, columns, nbr of angles]
+def rowcolumn_point_scatterer_rf(transducer=None,
+                                 nsamples=None,
+                                 scatterers=None,
+                                 angles=0,
+                                 sos=1540,
+                                 pulse_cycles=1.5,
+                                 noise=0,
+                                 analytic=True,
+                                 seed=None):
+
+    fsampling = transducer.sampling_frequency
+    fcenter = transducer.center_frequency
+    columns = np.ravel(transducer.column_positions)
+    angles = np.ravel(angles)
+
+    time = (np.arange(nsamples) / fsampling).reshape(-1, 1)
+    envelope_sigma = pulse_cycles / fcenter / (2 * np.sqrt(2 * np.log(2)))
+
+    signals = np.zeros((nsamples, columns.size, angles.size))
+    for angle_idx, angle in enumerate(angles):
+        for x_s, y_s, z_s in scatterers:
+            travel_time = (z_s * np.cos(angle) + y_s * np.sin(angle) + np.sqrt(z_s ** 2 + (columns - x_s) ** 2)) / sos
+            delayed_time = time - travel_time.reshape(1, -1)
+            signals[:, :, angle_idx] += np.cos(2 * np.pi * fcenter * delayed_time) * \
+                                        np.exp(-delayed_time ** 2 / (2 * envelope_sigma ** 2))
+
+    if noise:
+        signals += noise * np.random.default_rng(seed).standard_normal(signals.shape)
+
+    if analytic:
+        return hilbert(signals, axis=0)
+    return signals
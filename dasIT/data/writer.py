@@ -0,0 +1,157 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Out-of-core frame sink:
+# Beamformed (or compressed) frames are written batch by batch into a pre-sized, chunked HDF5 dataset as they
+# are produced, so the [depth, lateral, frames] cube of a long recording never has to fit into memory.
+#
+# File layout:
+#   frames          [depth, lateral, frames] chunked along frames (chunk_frames per chunk), optionally compressed
+#   lateral_mm      lateral axis vector [mm] (dimension scale of frames axis 1, see interp_lateral.imagegrid_mm)
+#   axial_mm        axial axis vector [mm] (dimension scale of frames axis 0)
+#   frames.attrs    acquisition parameters and the progress marker `completed_frames`
+#
+# The progress marker is updated (and the file flushed) after every written batch. An interrupted job is resumed
+# by opening the same file again: writing restarts at the beginning of the chunk that holds the first missing
+# frame (next_frame), so a chunk that was only partially written is rewritten completely.
+#
+# with frame_writer(path, frame_shape=(depth, lateral), nr_frames=loader.nbr_frames, imagegrid_mm=grid) as sink:
+#     for frame_start, signals in RFprefetchloader(rf_path, chunk=8, start=sink.next_frame):
+#         sink.write(beamform(signals), start=frame_start)
+
+
+import os
+import numpy as np
+import h5py
+
+
+def acquisition_attributes(transducer=None, medium=None):
+    # Scalar acquisition parameters of the transducer and medium for the dataset attributes
+    attributes = {}
+    if transducer is not None:
+        attributes.update({'center_frequency_hz': transducer.center_frequency,
+                           'sampling_frequency_hz': transducer.sampling_frequency,
+                           'transducer_elements': transducer.transducer_elements,
+                           'element_pitch_m': transducer.element_pitch,
+                           'planewave_angles_rad': np.ravel(transducer.planewave_angles())})
+        if transducer.fnumber is not None:
+            attributes['fnumber'] = transducer.fnumber
+    if medium is not None:
+        attributes.update({'speed_of_sound_ms': medium.speed_of_sound,
+                           'recorded_depth_wavelength': medium.recorded_depth,
+                           'rx_echo_samples': medium.rx_echo_totalnr_samples})
+    return attributes
+
+
+class frame_writer():
+    def __init__(self,
+                 path=None,
+                 frame_shape=None,
+                 nr_frames=None,
+                 dtype=np.float64,
+                 chunk_frames=8,
+                 compression=None,
+                 imagegrid_mm=None,
+                 attributes=None,
+                 resume=True):
+
+        self._path = path
+        self._frame_shape = tuple(int(size) for size in frame_shape)
+        self._nr_frames = int(nr_frames)
+        self._dtype = np.dtype(dtype)
+        self._chunk_frames = int(min(chunk_frames, self._nr_frames))
+
+        if resume and os.path.exists(self._path):
+            self._file = h5py.File(self._path, 'a')
+            self._dataset = self._file['frames']
+            stored_shape, stored_dtype = self._dataset.shape, self._dataset.dtype
+            if stored_shape != self._frame_shape + (self._nr_frames,) or stored_dtype != self._dtype:
+                self._file.close()
+                raise ValueError(f'Cannot resume {self._path}: stored frames {stored_shape} {stored_dtype} '
+                                 f'do not match {self._frame_shape + (self._nr_frames,)} {self._dtype}')
+            self._chunk_frames = self._dataset.chunks[2]
+        else:
+            self._file = h5py.File(self._path, 'w')
+            self._dataset = self._file.create_dataset('frames',
+                                                      shape=self._frame_shape + (self._nr_frames,),
+                                                      dtype=self._dtype,
+                                                      chunks=self._frame_shape + (self._chunk_frames,),
+                                                      compression=compression)
+            self._dataset.attrs['completed_frames'] = 0
+            for key, value in (attributes or {}).items():
+                self._dataset.attrs[key] = value
+            if imagegrid_mm is not None:
+                self._attach_axes(imagegrid_mm)
+            self._file.flush()
+
+
+    def _attach_axes(self, imagegrid_mm):
+        for axis, name, vector in ((0, 'axial_mm', imagegrid_mm[1]), (1, 'lateral_mm', imagegrid_mm[0])):
+            scale = self._file.create_dataset(name, data=np.ravel(vector))
+            scale.make_scale(name)
+            self._dataset.dims[axis].attach_scale(scale)
+
+
+    def write(self, frames, start=None):
+        # shape frames: [depth, lateral, batch frames] (or [depth, lateral] for a single frame)
+        frames = np.asarray(frames)
+        if frames.ndim == 2:
+            frames = frames[:, :, np.newaxis]
+        start = self.completed_frames if start is None else int(start)
+        stop = start + frames.shape[2]
+        if stop > self._nr_frames:
+            print(r'ERROR MESSAGE: Frame batch exceeds the size of the output cube. Check \textit{nr_frames}.')
+            return
+
+        self._dataset[:, :, start:stop] = frames.astype(self._dtype, copy=False)
+        # the marker only advances over contiguously written frames
+        if start <= self.completed_frames:
+            self._dataset.attrs['completed_frames'] = max(stop, self.completed_frames)
+        self._file.flush()
+
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    @property
+    def completed_frames(self):
+        return int(self._dataset.attrs['completed_frames'])
+
+    @property
+    def next_frame(self):
+        # first frame of the chunk that holds the first missing frame
+        return self.completed_frames // self._chunk_frames * self._chunk_frames
+
+    @property
+    def done(self):
+        return self.completed_frames >= self._nr_frames
+
+    @property
+    def dataset(self):
+        return self._dataset
@@ -0,0 +1,134 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Ultrafast Doppler ensemble processing:
+# Beamformed IQ frames of a plane wave ensemble are rearranged into a Casorati matrix [pixels, frames].
+# Tissue clutter is spatio-temporally coherent and concentrates in the first (largest) singular components,
+# blood signal in the following ones and noise in the last ones. The clutter filter removes the tissue
+# subspace (and optionally the noise subspace) and returns the blood signal.
+#
+# blood = X - U[:, :low] S[:low] V^H[:low]                   (cutoff = low)
+# blood = U[:, low:high] S[low:high] V^H[low:high]           (cutoff = [low, high])
+#
+# Only the first `high` (or `low`) singular components are needed. They are estimated with a randomized SVD
+# (Halko et al.) instead of a full SVD of the Casorati matrix:
+#   [1] N. Halko, P. G. Martinsson and J. A. Tropp, Finding structure with randomness: Probabilistic algorithms
+#   for constructing approximate matrix decompositions, SIAM Review, vol. 53, 2, pp. 217-288, 2011.
+#   doi: https://doi.org/10.1137/090771806
+#
+# The cube is processed in spatial blocks so that the memory of the decomposition stays bounded.
+#
+# shape signals: [depth, lateral, frames] (beamformed IQ)
+# shape power doppler: [depth, lateral]
+
+
+import numpy as np
+
+class svd_clutterfilter():
+    def __init__(self,
+                 signals=None,
+                 cutoff=10,
+                 block_size=(64, 64),
+                 method='randomized',
+                 oversampling=10,
+                 power_iterations=2,
+                 keep_signals=False,
+                 seed=None):
+
+        self._signals = signals
+        self._cutoff = np.atleast_1d(cutoff).astype(int)
+        self._block_size = block_size
+        self._method = method
+        self._oversampling = oversampling
+        self._power_iterations = power_iterations
+        self._keep_signals = keep_signals
+        self._rng = np.random.default_rng(seed)
+
+        if self._method not in ('randomized', 'full'):
+            print(r'ERROR MESSAGE: Selected svd method does not exist. Choose either \textit{randomized} or \textit{full}.')
+
+        self._filtered_signals, self._power_doppler = self.filter_ensemble()
+
+
+    def randomized_svd(self, casorati, rank):
+        # Randomized range finder with power iterations [1]
+        nr_frames = casorati.shape[1]
+        nr_samples = min(rank + self._oversampling, nr_frames)
+
+        test_matrix = self._rng.standard_normal((nr_frames, nr_samples))
+        range_basis, _ = np.linalg.qr(casorati @ test_matrix)
+        for _ in range(self._power_iterations):
+            range_basis, _ = np.linalg.qr(casorati.conj().T @ range_basis)
+            range_basis, _ = np.linalg.qr(casorati @ range_basis)
+
+        u_small, s, vh = np.linalg.svd(range_basis.conj().T @ casorati, full_matrices=False)
+        u = range_basis @ u_small
+        return u[:, :rank], s[:rank], vh[:rank]
+
+
+    def truncated_svd(self, casorati, rank):
+        if self._method == 'randomized':
+            return self.randomized_svd(casorati, rank)
+        u, s, vh = np.linalg.svd(casorati, full_matrices=False)
+        return u[:, :rank], s[:rank], vh[:rank]
+
+
+    def filter_block(self, casorati):
+        # shape casorati: [pixels, frames]
+        low = self._cutoff[0]
+        high = self._cutoff[1] if self._cutoff.size > 1 else None
+        rank = min(high if high is not None else low, min(casorati.shape))
+
+        u, s, vh = self.truncated_svd(casorati, rank)
+        if high is None:
+            return casorati - (u[:, :low] * s[:low]) @ vh[:low]
+        return (u[:, low:high] * s[low:high]) @ vh[low:high]
+
+
+    def filter_ensemble(self):
+        nr_depth, nr_lateral, nr_frames = self._signals.shape
+        block_depth, block_lateral = self._block_size
+
+        power_doppler = np.zeros((nr_depth, nr_lateral))
+        filtered_signals = np.zeros(self._signals.shape, dtype=self._signals.dtype) if self._keep_signals else None
+
+        for depth_start in range(0, nr_depth, block_depth):
+            for lateral_start in range(0, nr_lateral, block_lateral):
+                block = self._signals[depth_start:depth_start + block_depth,
+                                      lateral_start:lateral_start + block_lateral]
+                casorati = block.reshape(-1, nr_frames)
+
+                blood = self.filter_block(casorati).reshape(block.shape)
+                power_doppler[depth_start:depth_start + block.shape[0],
+                              lateral_start:lateral_start + block.shape[1]] = np.mean(np.abs(blood) ** 2, axis=2)
+                if self._keep_signals:
+                    filtered_signals[depth_start:depth_start + block.shape[0],
+                                     lateral_start:lateral_start + block.shape[1]] = blood
+
+        return filtered_signals, power_doppler
+
+
+    @property
+    def signals(self):
+        return self._filtered_signals
+
+    @property
+    def power_doppler(self):
+        return self._power_doppler
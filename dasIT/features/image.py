@@ -29,6 +29,8 @@ class interp_lateral():
         self._interpolation_factor = scale
         self._active_aperture_size = transducer._pw_active_aperture
         self._recorded_depth = medium.recorded_depth * transducer.wavelength_m()
+        # region of interest grid (None if the medium covers the full transducer aperture and depth)
+        self._roi_grid = medium.medium if medium.roi is not None else None
 
         self._axial_spacing_idx = np.arange(0, self._signals.shape[0], 1)
         self._axial_spacing = self._signals.shape[0]
@@ -64,6 +66,14 @@ class interp_lateral():
 
 
     def px2mm_mesh(self):
+        if self._roi_grid is not None:
+            # axis vectors span the lateral and axial extent of the ROI grid
+            lateral_grid_m = np.ravel(self._roi_grid[0])
+            axial_grid_m = np.ravel(self._roi_grid[1])
+            vector_x = np.linspace(lateral_grid_m[0], lateral_grid_m[-1], self._lateral_spacing) * self._m2mm_conversion_factor
+            vector_z = np.linspace(axial_grid_m[0], axial_grid_m[-1], self._axial_spacing) * self._m2mm_conversion_factor
+            return [vector_x, vector_z]
+
         aperture_x_mm = (self._active_aperture_size * self._m2mm_conversion_factor)
         grid_x_conversion_px2mm = aperture_x_mm / self._lateral_spacing
         vector_x = np.arange(0, aperture_x_mm, grid_x_conversion_px2mm)
@@ -27,6 +27,12 @@ Author: Christoph Leitner, Date: Aug. 2022
 #
 # size of the medium = (type list) = [[1, transducer number of elements], [Number of RX echos (one-way), 1]]
 #
+# Region of interest (ROI):
+# Optionally an explicit imaging region can be given, independent of the transducer element grid:
+# roi = [[lateral start, lateral stop], [axial start, axial stop]] in [m] and
+# roi_spacing = [lateral pixel spacing, axial pixel spacing] in [m].
+# The medium grid then only covers the ROI: size = [[1, lateral ROI pixels], [axial ROI pixels, 1]]
+#
 
 import numpy as np
 
@@ -39,7 +45,9 @@ class medium():
                  lateral_transducer_element_spacing=None,
                  axial_extrapolation_coef=1,
                  attenuation_coefficient=None,
-                 attenuation_power=None):
+                 attenuation_power=None,
+                 roi=None,
+                 roi_spacing=None):
 
 
         self._speed_of_sound = float(speed_of_sound_ms)
@@ -53,7 +61,12 @@ class medium():
 
         self._lateral_grid_spacing = lateral_transducer_element_spacing
         self._axial_extrapolation_coefficient = axial_extrapolation_coef
-        self._imaging_medium = self.__imaging_medium()
+        self._roi = roi
+        self._roi_spacing = roi_spacing
+        if self._roi is None:
+            self._imaging_medium = self.__imaging_medium()
+        else:
+            self._imaging_medium = self.__roi_medium()
 
         self._attenuation_coefficient = attenuation_coefficient
         self._attenuation_power = attenuation_power
@@ -87,6 +100,28 @@ class medium():
         imaging_medium_grid = np.meshgrid(lateral_grid_points_m, axial_grid_points_m, sparse=True)
         return imaging_medium_grid
 
+    def __roi_medium(self):
+        # EXPLANATION:
+        # The ROI grid is defined by its lateral (x) and axial (z) extents and the pixel spacing.
+        # If no spacing is given the spacing of the full grid is used: the element pitch in lateral
+        # direction and the spacing of the sampling points (one-way) in axial direction.
+        if self._roi_spacing is None:
+            lateral_spacing = np.mean(np.diff(np.ravel(self._lateral_grid_spacing)))
+            axial_spacing = (self._wavelength_m * self._recorded_penetration_depth) / round(self._rx_echo_samples / 2)
+        else:
+            lateral_spacing, axial_spacing = self._roi_spacing
+
+        lateral_grid_points_m = self.__roi_axis(self._roi[0], lateral_spacing)
+        axial_grid_points_m = self.__roi_axis(self._roi[1], axial_spacing)
+        imaging_medium_grid = np.meshgrid(lateral_grid_points_m, axial_grid_points_m, sparse=True)
+        return imaging_medium_grid
+
+    @staticmethod
+    def __roi_axis(extent, spacing):
+        # grid points from start to stop (both included) with a fixed spacing
+        nr_points = int(np.floor((extent[1] - extent[0]) / spacing + 1e-9)) + 1
+        return extent[0] + np.arange(nr_points) * spacing
+
     @property
     def speed_of_sound(self):
         return self._speed_of_sound
@@ -103,6 +138,18 @@ class medium():
     def medium(self):
         return self._imaging_medium
 
+    @property
+    def elements(self):
+        return self._lateral_grid_spacing
+
+    @property
+    def roi(self):
+        return self._roi
+
+    @property
+    def roi_spacing(self):
+        return self._roi_spacing
+
     @property
     def alpha(self):
         return self._attenuation_coefficient
@@ -111,3 +158,26 @@ class medium():
     def alpha_power(self):
         return self._attenuation_power
 
+
+# Volume Class:
+# Extends the medium by an elevation (y) axis for volumetric imaging with 2-D (row-column) arrays.
+# The lateral (x) and axial (z) grid are the same as for the medium; the elevation grid points default to the
+# row element positions. The volume is imaged slice by slice (one x-z slice per elevation grid point).
+#
+# volume = [x (1, lateral pixels), y (elevation pixels,), z (axial pixels, 1)]
+class volume_medium(medium):
+    def __init__(self, elevation_element_spacing=None, elevation_roi=None, elevation_spacing=None, **medium_args):
+        super().__init__(**medium_args)
+        if elevation_roi is None:
+            self._elevation_grid = np.ravel(elevation_element_spacing)
+        else:
+            nr_points = int(np.floor((elevation_roi[1] - elevation_roi[0]) / elevation_spacing + 1e-9)) + 1
+            self._elevation_grid = elevation_roi[0] + np.arange(nr_points) * elevation_spacing
+
+    @property
+    def elevation(self):
+        return self._elevation_grid
+
+    @property
+    def volume(self):
+        return [self.medium[0], self._elevation_grid, self.medium[1]]
@@ -0,0 +1,195 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Block-matching speckle tracking:
+# Every frame is divided into (overlapping) kernel blocks. Each block of the reference frame is searched in a
+# window of the next frame (+/- search range) and the displacement is the position of the maximum of the
+# zero-normalised cross-correlation (NCC)
+#
+# NCC(k) = sum(T0 * S(n + k)) / sqrt(sum(T0^2) * (sum(S(n + k)^2) - sum(S(n + k))^2 / N))
+#
+# T0: zero-mean kernel block, S: search window, N: number of kernel pixels
+#
+# The numerators of all blocks (and all frame pairs of a batch) are computed at once as circular FFT
+# correlations of the zero padded kernel with its search window; the lags 0 ... 2 * search range do not wrap.
+# The local sums of the denominator are read from integral images (cumulative sums) of the search windows.
+# Frame pairs are processed in batches (batch=None: all pairs at once) to bound the memory of the FFTs.
+# The integer peak is refined to sub-pixel precision with a parabolic fit along each axis.
+#
+# shape signals: [depth, lateral, frames] (beamformed RF, IQ or envelope; IQ is tracked on its envelope)
+# shape displacements: [depth blocks, lateral blocks, frame pairs] in pixels (or in units of spacing)
+
+
+import numpy as np
+from scipy import fft
+from numpy.lib.stride_tricks import sliding_window_view
+
+class speckle_tracking():
+    def __init__(self,
+                 signals=None,
+                 block_size=(32, 16),
+                 block_step=(16, 8),
+                 search_range=(8, 4),
+                 reference=None,
+                 batch=8,
+                 envelope=True,
+                 spacing=None):
+
+        self._signals = np.abs(signals) if (envelope and np.iscomplexobj(signals)) else np.real(signals)
+        self._block_size = tuple(int(size) for size in block_size)
+        self._block_step = tuple(int(step) for step in block_step)
+        self._search_range = tuple(int(search) for search in search_range)
+        self._spacing = np.ones(2) if spacing is None else np.asarray(spacing, dtype=np.float64)
+
+        # frame pairs: consecutive frames (reference=None) or every frame against a fixed reference frame
+        nr_frames = self._signals.shape[2]
+        if reference is None:
+            self._frame_pairs = np.stack((np.arange(nr_frames - 1), np.arange(1, nr_frames)), axis=1)
+        else:
+            self._frame_pairs = np.stack((np.full(nr_frames, int(reference)), np.arange(nr_frames)), axis=1)
+        self._batch = len(self._frame_pairs) if batch is None else max(int(batch), 1)
+
+        # without a valid search window nothing is tracked and the displacements are None
+        self._axial_displacement = self._lateral_displacement = self._correlation = None
+        window_shape = (self._block_size[0] + 2 * self._search_range[0],
+                        self._block_size[1] + 2 * self._search_range[1])
+        if window_shape[0] > self._signals.shape[0] or window_shape[1] > self._signals.shape[1]:
+            print(r'ERROR MESSAGE: Block size and search range exceed the frame size. Choose a smaller \textit{block_size} or \textit{search_range}.')
+            return
+
+        self._axial_displacement, self._lateral_displacement, self._correlation = self.track()
+
+
+    def _search_windows(self, frames):
+        # shape frames: [depth, lateral, pairs] -> [pairs, depth blocks, lateral blocks, window depth, window lateral]
+        window_shape = (self._block_size[0] + 2 * self._search_range[0],
+                        self._block_size[1] + 2 * self._search_range[1])
+        windows = sliding_window_view(np.moveaxis(frames, 2, 0), window_shape, axis=(1, 2))
+        return windows[:, ::self._block_step[0], ::self._block_step[1]]
+
+
+    def _local_sums(self, windows):
+        # sums over all kernel sized sub-windows of the search windows (integral image)
+        # shape [..., 2 * search range + 1 (axial), 2 * search range + 1 (lateral)]
+        integral = np.pad(np.cumsum(np.cumsum(windows, axis=-2), axis=-1),
+                          [(0, 0)] * (windows.ndim - 2) + [(1, 0), (1, 0)])
+        block_z, block_x = self._block_size
+        return integral[..., block_z:, block_x:] - integral[..., :-block_z, block_x:] - \
+               integral[..., block_z:, :-block_x] + integral[..., :-block_z, :-block_x]
+
+
+    def normalized_crosscorrelation(self, reference_frames, moving_frames):
+        search_z, search_x = self._search_range
+        block_z, block_x = self._block_size
+
+        search_windows = self._search_windows(moving_frames)
+        kernels = self._search_windows(reference_frames)[..., search_z:search_z + block_z, search_x:search_x + block_x]
+        kernels = kernels - np.mean(kernels, axis=(-2, -1), keepdims=True)
+
+        # numerator for all lags (FFT correlation)
+        window_shape = search_windows.shape[-2:]
+        correlation = fft.irfft2(np.conj(fft.rfft2(kernels, s=window_shape, workers=-1)) *
+                                 fft.rfft2(search_windows, workers=-1),
+                                 s=window_shape, workers=-1)
+        correlation = correlation[..., :2 * search_z + 1, :2 * search_x + 1]
+
+        # denominator
+        nr_pixels = block_z * block_x
+        window_energy = self._local_sums(search_windows ** 2) - self._local_sums(search_windows) ** 2 / nr_pixels
+        kernel_energy = np.sum(kernels ** 2, axis=(-2, -1), keepdims=True)
+        denominator = np.sqrt(np.maximum(kernel_energy * window_energy, 0))
+        # flat blocks (e.g. zero padded regions) have no defined correlation
+        valid = denominator > np.finfo(np.float64).eps * np.amax(denominator, initial=0)
+        return np.divide(correlation, denominator, out=np.zeros_like(correlation), where=valid)
+
+
+    @staticmethod
+    def subpixel_peak(ncc):
+        # integer maximum of the NCC surfaces and parabolic refinement along both axes
+        # shape ncc: [..., lags axial, lags lateral]
+        nr_lags_z, nr_lags_x = ncc.shape[-2:]
+        peak_idx = np.argmax(ncc.reshape(ncc.shape[:-2] + (-1,)), axis=-1)
+        peak_z, peak_x = np.unravel_index(peak_idx, (nr_lags_z, nr_lags_x))
+        peak_value = np.take_along_axis(ncc.reshape(ncc.shape[:-2] + (-1,)), peak_idx[..., np.newaxis], axis=-1)[..., 0]
+
+        def parabolic_offset(center, axis_length, axis):
+            # neighbours are clamped to the lag range; peaks at the border are not refined
+            low = np.clip(center - 1, 0, axis_length - 1)
+            high = np.clip(center + 1, 0, axis_length - 1)
+            flat = ncc.reshape(ncc.shape[:-2] + (-1,))
+            index = (lambda z, x: z * nr_lags_x + x)
+            if axis == 0:
+                y_low, y_high = index(low, peak_x), index(high, peak_x)
+            else:
+                y_low, y_high = index(peak_z, low), index(peak_z, high)
+            y_low = np.take_along_axis(flat, y_low[..., np.newaxis], axis=-1)[..., 0]
+            y_high = np.take_along_axis(flat, y_high[..., np.newaxis], axis=-1)[..., 0]
+            curvature = y_low - 2 * peak_value + y_high
+            with np.errstate(invalid='ignore', divide='ignore'):
+                offset = np.where(curvature < 0, 0.5 * (y_low - y_high) / curvature, 0)
+            interior = (center > 0) & (center < axis_length - 1)
+            return np.where(interior, np.clip(offset, -0.5, 0.5), 0)
+
+        subpixel_z = peak_z + parabolic_offset(peak_z, nr_lags_z, 0)
+        subpixel_x = peak_x + parabolic_offset(peak_x, nr_lags_x, 1)
+        return subpixel_z, subpixel_x, peak_value
+
+
+    def track(self):
+        axial, lateral, correlation = [], [], []
+        for batch_start in range(0, len(self._frame_pairs), self._batch):
+            pairs = self._frame_pairs[batch_start:batch_start + self._batch]
+            ncc = self.normalized_crosscorrelation(self._signals[:, :, pairs[:, 0]], self._signals[:, :, pairs[:, 1]])
+            peak_z, peak_x, peak_value = self.subpixel_peak(ncc)
+            axial.append((peak_z - self._search_range[0]) * self._spacing[0])
+            lateral.append((peak_x - self._search_range[1]) * self._spacing[1])
+            correlation.append(peak_value)
+
+        # [pairs, depth blocks, lateral blocks] -> [depth blocks, lateral blocks, pairs]
+        return (np.moveaxis(np.concatenate(axial, axis=0), 0, -1),
+                np.moveaxis(np.concatenate(lateral, axis=0), 0, -1),
+                np.moveaxis(np.concatenate(correlation, axis=0), 0, -1))
+
+
+    @property
+    def frame_pairs(self):
+        return self._frame_pairs
+
+    @property
+    def block_centers(self):
+        # pixel indices [axial, lateral] of the kernel block centers
+        if self._axial_displacement is None:
+            return None
+        nr_blocks_z, nr_blocks_x = self._axial_displacement.shape[:2]
+        center_z = self._search_range[0] + self._block_size[0] // 2 + self._block_step[0] * np.arange(nr_blocks_z)
+        center_x = self._search_range[1] + self._block_size[1] // 2 + self._block_step[1] * np.arange(nr_blocks_x)
+        return [center_z, center_x]
+
+    @property
+    def axial_displacement(self):
+        return self._axial_displacement
+
+    @property
+    def lateral_displacement(self):
+        return self._lateral_displacement
+
+    @property
+    def correlation(self):
+        return self._correlation
@@ -0,0 +1,185 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Per-channel RF quality control:
+# Screens a whole acquisition for dead, weak, noisy and saturated transducer channels before beamforming.
+# All metrics are computed in one vectorized pass over [samples, channels, frames]:
+#
+#   spectrum:     Welch power spectral density of every channel and frame (along the sample axis)
+#   SNR:          in-band power (signal band) / out-of-band power of each channel and frame [dB]
+#   RMS:          root mean square amplitude of each channel and frame
+#   saturation:   number of samples at (or beyond) the ADC full scale of each channel and frame
+#
+# The ADC full scale is given (full_scale) or taken from the range of an integer dtype (np.iinfo). For floating
+# point signals without a full scale the saturation metric is skipped (saturation is None, no channel is flagged).
+#
+# A channel is flagged
+#   dead:         median RMS (over frames) below dead_threshold_db relative to the median channel
+#   noisy:        median SNR more than noisy_threshold_db below the median channel
+#   saturated:    more than max_saturation (fraction) of its samples are clipped
+#
+# shape signals: [samples, channels, frames] (raw RF, e.g. RFDataloader.signal)
+
+
+import json
+import numpy as np
+from scipy.signal import welch
+
+class channel_quality():
+    def __init__(self,
+                 signals=None,
+                 fsampling=None,
+                 fband=None,
+                 nperseg=256,
+                 full_scale=None,
+                 dead_threshold_db=-20,
+                 noisy_threshold_db=10,
+                 max_saturation=0.001):
+
+        self._signals = signals if signals.ndim == 3 else signals.reshape(signals.shape[0], signals.shape[1], -1)
+        self._sampling_frequency = fsampling
+        self._fband = fband
+        self._nperseg = min(int(nperseg), self._signals.shape[0])
+        self._full_scale = self.adc_full_scale(full_scale)
+        self._dead_threshold_db = dead_threshold_db
+        self._noisy_threshold_db = noisy_threshold_db
+        self._max_saturation = max_saturation
+
+        self._frequencies, self._spectra = welch(self._signals, fs=self._sampling_frequency,
+                                                 nperseg=self._nperseg, axis=0)
+        # squares in double precision (squares of integer samples overflow their dtype)
+        power = np.abs(self._signals) ** 2 if np.iscomplexobj(self._signals) else \
+                np.square(self._signals, dtype=np.float64)
+        self._rms = np.sqrt(np.mean(power, axis=0))
+        self._saturation = self.saturated_samples()
+        self._snr = self.signal_to_noise()
+        self._flags = self.flag_channels()
+
+
+    def adc_full_scale(self, full_scale=None):
+        # given full scale or the largest value of an integer dtype, None for floating point signals
+        if full_scale is not None:
+            return full_scale
+        if np.issubdtype(self._signals.dtype, np.integer):
+            return np.iinfo(self._signals.dtype).max
+        return None
+
+
+    def saturated_samples(self):
+        # shape: [channels, frames] (None without a full scale)
+        if self._full_scale is None:
+            return None
+        if np.iscomplexobj(self._signals):
+            return np.count_nonzero(np.abs(self._signals) >= self._full_scale, axis=0)
+        # no abs of integer signals (abs of the most negative value overflows)
+        return np.count_nonzero((self._signals >= self._full_scale) | (self._signals <= -self._full_scale), axis=0)
+
+
+    def signal_band(self):
+        # Frequency band of the signal: the given band or the -6 dB band of the median channel spectrum
+        if self._fband is not None:
+            return (self._frequencies >= self._fband[0]) & (self._frequencies <= self._fband[1])
+        median_spectrum = np.median(np.mean(self._spectra, axis=2), axis=1)
+        return median_spectrum >= np.amax(median_spectrum) / 4
+
+
+    def signal_to_noise(self):
+        # shape: [channels, frames] in [dB]
+        in_band = self.signal_band()
+        signal_power = np.sum(self._spectra[in_band], axis=0)
+        noise_power = np.sum(self._spectra[~in_band], axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 10 * np.log10(signal_power / noise_power)
+
+
+    def flag_channels(self):
+        channel_rms = np.median(self._rms, axis=1)
+        channel_snr = np.median(self._snr, axis=1)
+
+        dead = channel_rms <= np.median(channel_rms) * 10 ** (self._dead_threshold_db / 20)
+        noisy = ~dead & ~(channel_snr >= np.nanmedian(channel_snr) - self._noisy_threshold_db)
+        if self._saturation is None:
+            saturated = np.zeros(self._signals.shape[1], dtype=bool)
+        else:
+            saturation_fraction = np.sum(self._saturation, axis=1) / (self._signals.shape[0] * self._signals.shape[2])
+            saturated = saturation_fraction > self._max_saturation
+        return {'dead': dead, 'noisy': noisy, 'saturated': saturated}
+
+
+    @property
+    def frequencies(self):
+        return self._frequencies
+
+    @property
+    def spectra(self):
+        # shape: [frequencies, channels, frames]
+        return self._spectra
+
+    @property
+    def snr(self):
+        return self._snr
+
+    @property
+    def rms(self):
+        return self._rms
+
+    @property
+    def saturation(self):
+        return self._saturation
+
+    @property
+    def flags(self):
+        return self._flags
+
+    @property
+    def passed(self):
+        # gate before beamforming: no dead or saturated channel
+        return not (np.any(self._flags['dead']) or np.any(self._flags['saturated']))
+
+    @staticmethod
+    def json_values(values):
+        # non-finite values (e.g. the SNR of dead channels) are reported as null, NaN is not valid JSON
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 0:
+            return float(values) if np.isfinite(values) else None
+        return [float(value) if np.isfinite(value) else None for value in values]
+
+    @property
+    def report(self):
+        # compact summary (channel indices are zero based data channels)
+        band = self._frequencies[self.signal_band()]
+        snr = np.where(np.isfinite(self._snr), self._snr, np.nan)
+        return {'channels': int(self._signals.shape[1]),
+                'frames': int(self._signals.shape[2]),
+                'signal_band_hz': [float(band[0]), float(band[-1])] if band.size else None,
+                'full_scale': None if self._full_scale is None else float(self._full_scale),
+                'median_rms': self.json_values(np.median(self._rms)),
+                'median_snr_db': self.json_values(np.nanmedian(snr)) if np.any(np.isfinite(snr)) else None,
+                'dead_channels': np.flatnonzero(self._flags['dead']).tolist(),
+                'noisy_channels': np.flatnonzero(self._flags['noisy']).tolist(),
+                'saturated_channels': np.flatnonzero(self._flags['saturated']).tolist(),
+                'channel_snr_db': self.json_values(np.round(np.median(self._snr, axis=1), 2)),
+                'channel_rms': self.json_values(np.median(self._rms, axis=1)),
+                'passed': self.passed}
+
+    def save_report(self, path):
+        with open(path, 'w') as report_file:
+            json.dump(self.report, report_file, indent=2, allow_nan=False)
+        return path
@@ -41,25 +41,29 @@ class RFfilter():
         return signal
 
     def bandpass_firwin(self):
-        # Define Gaussian Window
-        std = 2.5 # MATLAB Standard
-        win = get_window((self._ftype, std), self._forder)
-
-        # Create Filter Coefficients
-        filCoeff = firwin(self._forder,
-                          [self._fcutoff_band[0], self._fcutoff_band[1]],
-                          window=(self._ftype, win),
-                          pass_zero=False,
-                          scale=False,
-                          fs=self._fsampling)
-        filCoeff = np.broadcast_to(filCoeff[:, np.newaxis, np.newaxis], (self._forder, 1, 1)) # Broadcast Filter it in Original Data Shape
-        return filCoeff
+        return bandpass_coefficients(self._fcutoff_band, self._fsampling, self._ftype, self._forder)
 
     @property
     def signal(self):
         return self._signal_filtered
 
 
+def bandpass_coefficients(fcutoff_band, fsampling, type='gaussian', order=None):
+    # Define Gaussian Window
+    std = 2.5 # MATLAB Standard
+    win = get_window((type, std), order)
+
+    # Create Filter Coefficients
+    filCoeff = firwin(order,
+                      [fcutoff_band[0], fcutoff_band[1]],
+                      window=(type, win),
+                      pass_zero=False,
+                      scale=False,
+                      fs=fsampling)
+    filCoeff = np.broadcast_to(filCoeff[:, np.newaxis, np.newaxis], (order, 1, 1)) # Broadcast Filter it in Original Data Shape
+    return filCoeff
+
+
 def fftsignal(signal, f_sampling):
     f_spec, Pwr_den = welch(signal, f_sampling, nperseg=1024)
     return f_spec / 10**6, Pwr_den / 1000
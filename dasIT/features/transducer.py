@@ -160,4 +160,100 @@ class transducer():
 
     @property
     def start_depth_rec_m(self):
-        return self._start_depth_m
\ No newline at end of file
+        return self._start_depth_m
+
+    @property
+    def axial_cutoff_wavelength(self):
+        return self._initial_axial_cutoff_wavelength
+
+
+# Row-column addressed (RCA) 2-D array:
+# Two orthogonal 1-D arrays on the same aperture. The row elements are long in x and arranged along y (elevation),
+# the column elements are long in y and arranged along x (lateral). Plane waves are transmitted on the rows
+# (steered in the y-z plane) and the echoes are received on the columns.
+#
+# Like the linear array, both element axes are centered on the origin of the coordinate system (x, y, z).
+class rowcolumn_transducer():
+    def __init__(self,
+                 center_frequency_hz=0,
+                 bandwidth_hz=0,
+                 adc_ratio=1,
+                 rows_nr=1,
+                 columns_nr=1,
+                 row_pitch_m=None,
+                 column_pitch_m=None,
+                 focus_number=None,
+                 totalnr_planewaves=1,
+                 planewave_angle_interval=[0,0],
+                 speed_of_sound_ms=None):
+
+        self._f_center = float(center_frequency_hz)
+        self._bandwidth = bandwidth_hz
+        self._samples_per_wavelength = adc_ratio
+        self._f_sampling = self._samples_per_wavelength * self._f_center
+        self._rows = int(rows_nr)
+        self._columns = int(columns_nr)
+        self._row_pitch = float(row_pitch_m)
+        self._column_pitch = float(column_pitch_m if column_pitch_m is not None else row_pitch_m)
+        self._focus_number = focus_number
+        self._nr_planewaves = int(totalnr_planewaves)
+        self._planewave_interval = planewave_angle_interval
+        self._speed_of_sound = speed_of_sound_ms
+        self._wavelength = self._speed_of_sound / self._f_center
+
+        self._row_positions = self.element_positions(self._rows, self._row_pitch)
+        self._column_positions = self.element_positions(self._columns, self._column_pitch)
+
+
+    @staticmethod
+    def element_positions(nr_elements, pitch):
+        return np.linspace((pitch * nr_elements / 2) * -1, (pitch * nr_elements / 2), nr_elements)
+
+
+    def planewave_angles(self):
+        # steering angles of the row transmissions (y-z plane) [rad]
+        angles = np.linspace(self._planewave_interval[0], self._planewave_interval[1], self._nr_planewaves)
+        return np.radians(angles).reshape(-1,1)
+
+
+    @property
+    def center_frequency(self):
+        return self._f_center
+
+    @property
+    def bandwidth(self):
+        return self._bandwidth
+
+    @property
+    def sampling_frequency(self):
+        return self._f_sampling
+
+    @property
+    def wavelength(self):
+        return self._wavelength
+
+    @property
+    def rows_nr(self):
+        return self._rows
+
+    @property
+    def columns_nr(self):
+        return self._columns
+
+    @property
+    def row_positions(self):
+        # elevation (y) positions of the row elements [m]
+        return self._row_positions
+
+    @property
+    def column_positions(self):
+        # lateral (x) positions of the column elements [m]
+        return self._column_positions
+
+    @property
+    def fnumber(self):
+        return self._focus_number
+
+    @property
+    def planewaves_nr(self):
+        return self._nr_planewaves
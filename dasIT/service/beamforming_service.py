@@ -0,0 +1,321 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Local beamforming service:
+# A daemon owns one geometry setup (delay and apodization tables) and serves beamforming requests of several
+# processes on the same host, so the (multi-GB) tables are held only once per host.
+#
+# Protocol (one JSON object per line over a Unix domain socket):
+#   {"cmd": "info"}                                   -> {"status": "ok", "frame_shape": [depth, lateral]}
+#   {"cmd": "beamform", "rf": <shm name>, "shape": [samples, td_element, angles], "dtype": <dtype>,
+#    "out": <shm name>}                               -> {"status": "ok"} or {"status": "error", "message": ...}
+#
+# Malformed lines (no JSON object) are answered with {"status": "error", ...}, the connection keeps being served.
+#
+# RF frames and images are handed over in shared memory created by the client. The client allocates the output
+# block with shape frame_shape and dtype result_type(rf dtype, float64).
+#
+# Requests are validated against the delay table (record length, elements, angles and dtype) before they are
+# queued, an invalid request only fails for its own client. The socket file is removed on shutdown (and a stale
+# one before binding).
+#
+# Concurrent requests are collected for a short batch window (or until max_batch requests are waiting) and
+# beamformed together in one batched RXbeamformer call.
+#
+# Daemon mode: python -m dasIT serve --socket /tmp/dasIT.sock --elements 128 ... (see __main__.py)
+
+
+import os
+import json
+import time
+import queue
+import socket
+import threading
+import socketserver
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from dasIT.src.das_bf import RXbeamformer
+
+
+def _attach_shared_memory(name):
+    # Attach to an existing shared memory block without handing it to the resource tracker of this process.
+    # Otherwise the tracker unlinks blocks owned by the other process when this process exits.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _read_shared_array(name, shape, dtype):
+    block = _attach_shared_memory(name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+    finally:
+        block.close()
+
+
+def _write_shared_array(name, array):
+    block = _attach_shared_memory(name)
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    finally:
+        block.close()
+
+
+def _remove_stale_socket(path):
+    # A socket file left behind by a server that did not shut down cleanly blocks the bind. It is only removed
+    # if no server accepts connections on it.
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+    finally:
+        probe.close()
+
+
+class _request():
+    def __init__(self, message):
+        self.message = message
+        self.key = (tuple(message['shape']), message['dtype'])
+        self.response = None
+        self.done = threading.Event()
+
+
+class _request_handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            response = self.respond(line)
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+    def respond(self, line):
+        service = self.server.service
+        try:
+            message = json.loads(line)
+        except ValueError as error:
+            return {'status': 'error', 'message': f'invalid request: {error}'}
+        if not isinstance(message, dict):
+            return {'status': 'error', 'message': 'invalid request: expected a JSON object'}
+
+        if message.get('cmd') == 'info':
+            return {'status': 'ok', 'frame_shape': list(service.frame_shape)}
+        if message.get('cmd') == 'beamform':
+            error = service.validate(message)
+            if error is not None:
+                return {'status': 'error', 'message': error}
+            request = _request(message)
+            service.requests.put(request)
+            request.done.wait()
+            return request.response
+        return {'status': 'error', 'message': 'unknown command'}
+
+
+class beamforming_server():
+    def __init__(self, socket_path=None, delays=None, apodization=None, nsamples=None, max_batch=8,
+                 batch_window=0.005):
+        # nsamples: record length the delay table was built for (sentinel), the table is scanned once if not given
+        self._socket_path = socket_path
+        self._delays = delays
+        self._nr_samples = int(np.amax(delays)) if nsamples is None else int(nsamples)
+        self._apodization = apodization
+        self._max_batch = int(max_batch)
+        self._batch_window = batch_window
+
+        self.requests = queue.Queue()
+        self._stop = threading.Event()
+        self._batches = 0
+
+        _remove_stale_socket(self._socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(self._socket_path, _request_handler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self._batcher = threading.Thread(target=self._batch_loop, daemon=True)
+
+
+    def validate(self, message):
+        # check a beamform request against the delay table, returns an error message or None
+        nr_elements, nr_angles = self._delays.shape[2], self._delays.shape[3]
+        expected = f'[{self._nr_samples}, {nr_elements}, {nr_angles}]' + \
+                   (f' or [{self._nr_samples}, {nr_elements}]' if nr_angles == 1 else '')
+        try:
+            shape = [int(size) for size in message['shape']]
+            dtype = np.dtype(message['dtype'])
+            str(message['rf']), str(message['out'])
+        except (KeyError, TypeError, ValueError) as error:
+            return f'invalid request: {error}'
+        if dtype.kind not in 'iufc':
+            return f'unsupported dtype {dtype}'
+        valid_shape = len(shape) in (2, 3) and shape[0] == self._nr_samples and shape[1] == nr_elements and \
+                      (shape[2] == nr_angles if len(shape) == 3 else nr_angles == 1)
+        if not valid_shape:
+            return f'shape {shape} does not match the delay table, expected {expected}'
+        return None
+
+
+    def _collect_batch(self):
+        # wait for a first request, then collect further requests during the batch window
+        try:
+            first_request = self.requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first_request]
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            # requests with the same RF shape and dtype are beamformed together
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+            for group in groups.values():
+                self._beamform_group(group)
+
+
+    def _beamform_group(self, group):
+        # requests whose shared memory cannot be read or written fail individually, the rest of the group
+        # is beamformed
+        shape, dtype = group[0].key
+        signals = []
+        valid_requests = []
+        for request in group:
+            try:
+                signals.append(_read_shared_array(request.message['rf'], shape, dtype))
+                valid_requests.append(request)
+            except Exception as error:
+                request.response = {'status': 'error', 'message': str(error)}
+                request.done.set()
+        if not valid_requests:
+            return
+
+        try:
+            nr_angles = self._delays.shape[3]
+            signals = np.stack(signals, axis=-1)
+            frames = RXbeamformer(signals=signals.reshape(shape[0], shape[1], nr_angles, len(valid_requests)),
+                                  delays=self._delays,
+                                  apodization=self._apodization,
+                                  batch=True,
+                                  nsamples=self._nr_samples).frame
+            self._batches += 1
+        except Exception as error:
+            frames = None
+            batch_error = {'status': 'error', 'message': str(error)}
+
+        for idx, request in enumerate(valid_requests):
+            if frames is None:
+                request.response = batch_error
+            else:
+                try:
+                    _write_shared_array(request.message['out'], frames[:, :, idx].astype(np.result_type(dtype, np.float64)))
+                    request.response = {'status': 'ok'}
+                except Exception as error:
+                    request.response = {'status': 'error', 'message': str(error)}
+            request.done.set()
+
+
+    def serve_forever(self):
+        self._batcher.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._batcher.join()
+            self._server.server_close()
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+
+
+    def shutdown(self):
+        self._server.shutdown()
+
+
+    @property
+    def frame_shape(self):
+        return self._delays.shape[:2]
+
+    @property
+    def nsamples(self):
+        return self._nr_samples
+
+    @property
+    def batches(self):
+        return self._batches
+
+
+class beamforming_client():
+    def __init__(self, socket_path=None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._stream = self._socket.makefile('rwb')
+        self._frame_shape = tuple(self._send({'cmd': 'info'})['frame_shape'])
+
+
+    def _send(self, message):
+        self._stream.write((json.dumps(message) + '\n').encode())
+        self._stream.flush()
+        return json.loads(self._stream.readline())
+
+
+    def beamform(self, signals):
+        # shape signals: [samples, td_element, nbr of angles] (or [samples, td_element])
+        # returns the beamformed frame [depth, lateral pixel]
+        signals = np.ascontiguousarray(signals)
+        out_dtype = np.result_type(signals.dtype, np.float64)
+        out_nbytes = int(np.prod(self._frame_shape)) * out_dtype.itemsize
+
+        rf_block = shared_memory.SharedMemory(create=True, size=max(signals.nbytes, 1))
+        out_block = shared_memory.SharedMemory(create=True, size=max(out_nbytes, 1))
+        try:
+            np.ndarray(signals.shape, dtype=signals.dtype, buffer=rf_block.buf)[...] = signals
+            response = self._send({'cmd': 'beamform',
+                                   'rf': rf_block.name,
+                                   'shape': list(signals.shape),
+                                   'dtype': signals.dtype.str,
+                                   'out': out_block.name})
+            if response['status'] != 'ok':
+                raise RuntimeError(f"Beamforming service error: {response['message']}")
+            frame = np.ndarray(self._frame_shape, dtype=out_dtype, buffer=out_block.buf).copy()
+        finally:
+            for block in (rf_block, out_block):
+                block.close()
+                block.unlink()
+        return frame
+
+
+    def close(self):
+        self._stream.close()
+        self._socket.close()
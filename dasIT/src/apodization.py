@@ -29,6 +29,7 @@ class apodization():
         self._pwangles = transducer.planewaves_nr
         self._pitch = transducer.element_pitch
         self._nr_elements = transducer.transducer_elements
+        self._elements = np.ravel(transducer.lateral_transducer_spacing)
         self._pw_active_aperture = transducer.pw_aperture
         self._angles = angles
 
@@ -41,15 +42,24 @@ class apodization():
             self._fnumber = 1.7
 
         self._apodization_type = apo
+        if self._apodization_type not in ('rec', 'blackman', 'mask'):
+            print(r'ERROR MESSAGE: Selected aodization type does not exist. Choose either \textit{rec} or \textit{blackman}.')
+
+        # The apodization table is only built on first access. Fused beamforming kernels evaluate
+        # the aperture on the fly from the per-depth aperture size and never need the full table.
+        self._apo_table = None
+
+
+    def _build_table(self):
         if self._apodization_type == 'rec':
-            self._apo_table = self.single_channel_apodization()
+            if np.ravel(self._medium[0]).size == self._elements.size and np.allclose(np.ravel(self._medium[0]), self._elements):
+                return self.single_channel_apodization()
+            return self.grid_apodization()
         elif self._apodization_type == 'blackman':
-            self._apo_table = self.blackman_apodization()
             # this still needs to be implemented
+            return self.blackman_apodization()
         elif self._apodization_type == 'mask':
-            self._apo_table = self.rectangular_masking()
-        else:
-            print(r'ERROR MESSAGE: Selected aodization type does not exist. Choose either \textit{rec} or \textit{blackman}.')
+            return self.rectangular_masking()
 
 
     def _round_elements(self, elements=None, type='odd'):
@@ -63,6 +73,17 @@ class apodization():
         else:
             print(r'ERROR MESSAGE: Wrong rounding argument in apodization.')
 
+    def aperture_elements(self):
+        # Number of active (odd) receive elements for each imaging depth
+        # shape: [depth, 1]
+        px_grid_depth = self._medium[1]
+        # active aperture = z / (2 * f)
+        directive_aperture = (px_grid_depth / (2 * self._fnumber))
+        # calculate how many elements are in this active aperture
+        directive_aperture = (directive_aperture * self._nr_elements) / self._pw_active_aperture
+        # round to integer to get the number of active elements for each depth
+        return self._round_elements(elements=directive_aperture, type='odd')
+
     def single_channel_apodization(self):
         # adapted from:
         # [1] C.L.Palmer and O.M.H.Rindal, Wireless, real - time plane - wave coherent compounding on an iphone - a
@@ -71,13 +92,7 @@ class apodization():
         # Calculate the array directivity based on the focus number of the transducer:
 
 
-        px_grid_depth = self._medium[1]
-        # active aperture = z / (2 * f)
-        directive_aperture = (px_grid_depth / (2 * self._fnumber))
-        # calculate how many elements are in this active aperture
-        directive_aperture = (directive_aperture * self._medium[0].size) / self._pw_active_aperture
-        # round to integer to get the number of active elements for each depth
-        directive_aperture = self._round_elements(elements=directive_aperture, type='odd')
+        directive_aperture = self.aperture_elements()
         # find the ceter of the active aperture
         directive_centre = int(np.amax(directive_aperture) / 2)
 
@@ -109,7 +124,17 @@ class apodization():
         # Bring apodization mask into a standardized shape
         apo_mask = np.expand_dims(np.moveaxis(apo_mask, 0, -1), axis=3)
 
-        return apo_mask.astype(np.int)
+        return apo_mask.astype(int)
+
+
+    def grid_apodization(self):
+        # Rectangular F-number aperture for an arbitrary pixel grid (e.g. a region of interest).
+        # An element is active for a pixel if its lateral distance to the pixel is within the
+        # active aperture (in elements) of the pixel depth.
+        # shape: [depth, lateral pixel, td_element, 1]
+        lateral_distance = np.abs(np.reshape(self._medium[0], (1, -1, 1)) - np.reshape(self._elements, (1, 1, -1)))
+        apo_mask = lateral_distance <= self.aperture_m.reshape(-1, 1, 1)
+        return np.expand_dims(apo_mask, axis=3).astype(int)
 
 
     def blackman_apodization(self):
@@ -144,9 +169,29 @@ class apodization():
         apo_mask = np.repeat(np.expand_dims(apo_mask, axis=2), self._nr_elements, axis=2)
         apo_mask = np.tile(np.expand_dims(apo_mask, axis=3), self._angles.size)
 
-        return apo_mask.astype(np.int)
+        return apo_mask.astype(int)
 
 
+    @property
+    def type(self):
+        return self._apodization_type
+
+    @property
+    def aperture_halfwidth(self):
+        # Number of active elements on each side of the aperture centre for each depth ('rec' apodization)
+        # shape: [depth]
+        return ((np.ravel(self.aperture_elements()) - 1) // 2).astype(np.int32)
+
+    @property
+    def aperture_m(self):
+        # Lateral half-width of the active receive aperture for each depth [m] ('rec' apodization)
+        # Half an element is added so that comparisons are robust against floating point spacing errors.
+        # shape: [depth]
+        element_spacing = np.abs(np.mean(np.diff(self._elements)))
+        return (self.aperture_halfwidth + 0.5) * element_spacing
+
     @property
     def table(self):
+        if self._apo_table is None:
+            self._apo_table = self._build_table()
         return self._apo_table
\ No newline at end of file
@@ -22,14 +22,71 @@ Author: Christoph Leitner, Date: Aug. 2022
 
 import numpy as np
 
+
+def zero_pad_samples(signals, delays, nsamples=None):
+    # Append zero samples so that every entry of the delay table (including the sentinel of invalid
+    # taps, see delays.py) addresses a sample. Invalid taps therefore read zero and do not contribute.
+    # nsamples: number of samples the delay table was built for (sentinel = nsamples). If it is given the
+    # table is not scanned, otherwise the largest table entry is taken as the sentinel (pass nsamples for
+    # tables without invalid taps).
+    # The result always has sentinel + 1 samples with a zero sample at index sentinel: longer signals are
+    # cropped to the record length of the table, shorter ones are zero padded. Signals that already hold the
+    # zero sentinel sample are returned unchanged (no copy), callers beamforming repeatedly can therefore
+    # allocate the padded buffer once (see padded_signals).
+    sentinel = int(np.amax(delays)) if nsamples is None else int(nsamples)
+    if signals.shape[0] == sentinel + 1 and not np.any(signals[sentinel]):
+        return signals
+    signals = signals[:sentinel]
+    return padded_signals(signals, sentinel + 1 - signals.shape[0])
+
+
+def padded_signals(signals, nr_samples=1):
+    # Copy of the signals with nr_samples zero samples appended (axis 0)
+    padded = np.zeros((signals.shape[0] + nr_samples,) + signals.shape[1:], dtype=signals.dtype)
+    padded[:signals.shape[0]] = signals
+    return padded
+
+
+def delayed_channels(signals, delays, apodization=None, depth_start=0, depth_stop=None):
+    # Delayed, apodized and angle compounded channel signals of the depth rows depth_start ... depth_stop
+    # (input of the adaptive / coherence based beamformers, see slsc.py and mv_bf.py)
+    # shape signals: [samples, td_element, nbr of angles] (zero padded, see zero_pad_samples)
+    # shape: [depth rows, lateral pixel, td_element]
+    delays = delays[depth_start:depth_stop]
+    nr_rows, nr_lateral, nr_elements, nr_angles = delays.shape
+    angle_selector = np.arange(nr_angles).reshape(1, 1, -1)
+
+    channels = np.empty((nr_rows, nr_lateral, nr_elements), dtype=np.result_type(signals.dtype, np.complex64))
+    for element_idx in range(nr_elements):
+        element_signals = signals[delays[:, :, element_idx, :], element_idx, angle_selector]
+        if apodization is not None:
+            element_signals = element_signals * apodization[depth_start:depth_stop, :, element_idx, :]
+        channels[:, :, element_idx] = np.sum(element_signals, axis=2)
+    return channels
+
+
 class RXbeamformer():
-    def __init__(self, signals=None, delays=None, apodization=None):
-        self._signals = signals
+    def __init__(self, signals=None, delays=None, apodization=None, coherence=None, gcf_order=1, batch=False,
+                 nsamples=None):
+        self._signals = zero_pad_samples(signals, delays, nsamples)
+        self._batch = batch
         self._apodization = apodization
         self._delays = delays
+        self._coherence = coherence
+        self._gcf_order = gcf_order
+        self._coherence_factor = None
+
+        if self._coherence not in (None, 'cf', 'gcf'):
+            print(r'ERROR MESSAGE: Selected coherence type does not exist. Choose either \textit{cf} or \textit{gcf}.')
+        if self._coherence is not None and not self._batch and self._signals.ndim == 4:
+            print(r'ERROR MESSAGE: The coherence factor is not available for delayed 4D signals. Pass the channel signals \textit{[samples, td_element, nbr of angles]}.')
+
         self._frame = self.beamform()
 
     def beamform(self):
+        if self._batch or self._signals.ndim < 4:
+            return self.beamform_channels()
+
         delays_depth_shape, delays_tdelement_px_shape, delays_tdelement_shape, delays_angles_shape = self._delays.shape
         _, tdelement_px_selector, tdelement_selector, angle_selector = np.ogrid[:0, :delays_tdelement_px_shape,:delays_tdelement_shape, :delays_angles_shape]
 
@@ -47,8 +104,84 @@ class RXbeamformer():
 
         return frame
 
+    def beamform_channels(self):
+        # Channel data input:
+        # shape signals: [samples, td_element, nbr of angles] (or [samples, td_element] for a single plane wave)
+        # batch=True: [samples, td_element, nbr of angles, frames]
+        #
+        # The delay table [depth, lateral pixel, td_element, angles] selects the sample of every element and
+        # plane wave for each pixel. Contributions are weighted by the apodization and compounded over
+        # elements and angles. The result has the shape [depth, lateral pixel] ([depth, lateral pixel, frames]).
+        #
+        # The channels are accumulated one element at a time, the delayed-signal tensor is never materialised.
+        # In the same pass the incoherent energy (and for the GCF the low spatial frequencies of the aperture)
+        # are accumulated for the coherence factor:
+        #
+        # CF = |sum_e(c_e)|^2 / (N * sum_e(|c_e|^2))                N: number of active elements
+        # GCF = sum_|k|<=M0(|C_k|^2) / (N_e * sum_e(|c_e|^2))        C_k: spatial DFT over all N_e elements
+        #
+        # with c_e the (angle compounded) delayed signal of element e.
+        # [1] R. Mallart and M. Fink, Adaptive focusing in scattering media through sound-speed inhomogeneities:
+        # The van Cittert Zernike approach and focusing criterion, JASA, vol. 96, 6, pp. 3721-3732, 1994.
+        # [2] P.-C. Li and M.-L. Li, Adaptive imaging using the generalized coherence factor, IEEE Transactions on
+        # Ultrasonics, Ferroelectrics, and Frequency Control, vol. 50, 2, pp. 128-141, 2003.
+        nr_depth, nr_lateral, nr_elements, nr_angles = self._delays.shape
+        # shape signals: [samples, td_element, nbr of angles, frames]
+        signals = self._signals.reshape(self._signals.shape[0], self._signals.shape[1], nr_angles, -1)
+        nr_frames = signals.shape[3]
+        angle_selector = np.arange(nr_angles).reshape(1, 1, -1)
+
+        frame = np.zeros((nr_depth, nr_lateral, nr_frames), dtype=np.result_type(signals.dtype, np.float64))
+        if self._coherence is not None:
+            incoherent_energy = np.zeros((nr_depth, nr_lateral, nr_frames))
+            nr_active = np.zeros((nr_depth, nr_lateral, 1))
+            spatial_frequencies = np.arange(-self._gcf_order, self._gcf_order + 1) if self._coherence == 'gcf' else []
+            spatial_spectrum = np.zeros((len(spatial_frequencies), nr_depth, nr_lateral, nr_frames), dtype=np.complex128)
+
+        for element_idx in range(nr_elements):
+            # shape element signals: [depth, lateral pixel, nbr of angles, frames]
+            element_signals = signals[self._delays[:, :, element_idx, :], element_idx, angle_selector]
+            if self._apodization is not None:
+                element_apodization = self._apodization[:, :, element_idx, :, np.newaxis]
+                element_signals = element_signals * element_apodization
+            channel = np.sum(element_signals, axis=2)
+            frame += channel
+
+            if self._coherence is not None:
+                incoherent_energy += np.abs(channel) ** 2
+                if self._apodization is not None:
+                    nr_active += np.any(element_apodization != 0, axis=2)
+                else:
+                    nr_active += 1
+                for k_idx, k in enumerate(spatial_frequencies):
+                    spatial_spectrum[k_idx] += channel * np.exp(-2j * np.pi * k * element_idx / nr_elements)
+
+        if self._coherence == 'cf':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._coherence_factor = np.nan_to_num(np.abs(frame) ** 2 / (nr_active * incoherent_energy))
+        elif self._coherence == 'gcf':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._coherence_factor = np.nan_to_num(np.sum(np.abs(spatial_spectrum) ** 2, axis=0) /
+                                                       (nr_elements * incoherent_energy))
+
+        if not self._batch:
+            frame = frame[:, :, 0]
+            if self._coherence_factor is not None:
+                self._coherence_factor = self._coherence_factor[:, :, 0]
+        return frame
 
     @property
     def frame(self):
         return self._frame
 
+    @property
+    def coherence_factor(self):
+        return self._coherence_factor
+
+    @property
+    def weighted_frame(self):
+        # DAS frame weighted by the (generalized) coherence factor
+        if self._coherence_factor is None:
+            return self._frame
+        return self._frame * self._coherence_factor
+
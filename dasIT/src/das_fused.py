@@ -0,0 +1,165 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Fused delay-and-sum beamformer:
+# Instead of gathering the signals through a precomputed delay table (see delays.py and das_bf.py) the
+# TX + RX delay of every pixel / element / angle combination is evaluated on the fly inside a single kernel.
+# The kernel runs in parallel over all pixels, applies the apodization and accumulates directly into the
+# output frame. Neither a delay table nor the delayed-signal tensor is ever written to memory.
+#
+# Every delay is rounded to the nearest sample (np.rint) and the sample is read without interpolation between
+# neighbouring samples. This is the sample selection of the integer delay table (planewave_delays.delays_by_sample),
+# so the fused kernel reproduces the frame of the table path; taps outside of the recording are skipped like the
+# sentinel taps of the table.
+#
+# The kernel is compiled with numba (optional dependency). If numba is not installed the beamformer falls
+# back to the NumPy delay table implementation (planewave_delays + RXbeamformer).
+#
+# shape signals: [samples, td_element, nbr of angles]
+# shape frame: [depth, lateral pixel]
+
+
+import numpy as np
+
+from dasIT.src.delays import planewave_delays
+from dasIT.src.das_bf import RXbeamformer
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _das_kernel(signals, px_lateral, px_axial, element_lateral, angles, aperture, sos, fsampling, frame):
+        nr_samples, nr_elements, nr_angles = signals.shape
+        nr_lateral = px_lateral.size
+
+        # All delay arithmetic is carried out in single precision (and rounded after every operation) to
+        # reproduce the sample indices of the float32 delay tables exactly.
+        sos = np.float32(sos)
+        fsampling = np.float32(fsampling)
+
+        for px_idx in prange(px_axial.size * nr_lateral):
+            z_idx = px_idx // nr_lateral
+            x_idx = px_idx % nr_lateral
+            z = px_axial[z_idx]
+            x = px_lateral[x_idx]
+
+            acc = signals[0, 0, 0] * 0
+            for angle_idx in range(nr_angles):
+                dist_tx = np.float32(z * np.cos(angles[angle_idx]) + x * np.sin(angles[angle_idx]))
+                for element_idx in range(nr_elements):
+                    dx = x - element_lateral[element_idx]
+                    if abs(dx) > aperture[z_idx]:
+                        continue
+                    dist_rx = np.float32(np.sqrt(z * z + dx * dx))
+                    delay = np.float32(np.float32(np.float32(dist_tx + dist_rx) / sos) * fsampling)
+                    sample = int(np.rint(delay))
+                    if sample < 0 or sample >= nr_samples:
+                        continue
+                    acc += signals[sample, element_idx, angle_idx]
+            frame[z_idx, x_idx] = acc
+
+
+class fused_beamformer():
+    def __init__(self,
+                 signals=None,
+                 medium=None,
+                 sos=1540,
+                 fsampling=1,
+                 angles=0,
+                 elements=None,
+                 apodization=None,
+                 backend='auto'):
+
+        self._signals = signals.reshape(signals.shape[0], signals.shape[1], -1)
+        self._medium = medium
+        self._speed_of_sound = sos
+        self._sampling_frequency = fsampling
+        self._angles = np.ravel(np.asarray(angles, dtype=np.float64))
+        # Element positions default to the lateral pixel grid (one pixel per transducer element, see medium.py)
+        self._elements = np.ravel(medium[0]) if elements is None else np.ravel(elements)
+        self._apodization = apodization
+
+        if backend == 'auto':
+            backend = 'numba' if NUMBA_AVAILABLE else 'numpy'
+        elif backend == 'numba' and not NUMBA_AVAILABLE:
+            print(r'ERROR MESSAGE: numba is not installed. Falling back to the \textit{numpy} backend.')
+            backend = 'numpy'
+        elif backend not in ('numba', 'numpy'):
+            print(r'ERROR MESSAGE: Selected backend does not exist. Choose either \textit{numba} or \textit{numpy}.')
+            backend = 'numpy'
+
+        # Only the rectangular F-number aperture can be evaluated inside the kernel
+        if backend == 'numba' and (apodization is not None) and apodization.type != 'rec':
+            backend = 'numpy'
+        self._backend = backend
+
+        if self._backend == 'numba':
+            self._frame = self.beamform_fused()
+        else:
+            self._frame = self.beamform_table()
+
+
+    def _aperture_m(self):
+        # Lateral half-width of the active receive aperture for each depth [m]
+        if self._apodization is None:
+            return np.full(np.ravel(self._medium[1]).size, np.inf)
+        return self._apodization.aperture_m
+
+
+    def beamform_fused(self):
+        frame = np.zeros((np.ravel(self._medium[1]).size, np.ravel(self._medium[0]).size), dtype=self._signals.dtype)
+        _das_kernel(np.ascontiguousarray(self._signals),
+                    np.ravel(self._medium[0]).astype(np.float64),
+                    np.ravel(self._medium[1]).astype(np.float64),
+                    self._elements.astype(np.float64),
+                    self._angles,
+                    self._aperture_m().astype(np.float64),
+                    float(self._speed_of_sound),
+                    float(self._sampling_frequency),
+                    frame)
+        return frame
+
+
+    def beamform_table(self):
+        delays = planewave_delays(medium=self._medium,
+                                  sos=self._speed_of_sound,
+                                  fsampling=self._sampling_frequency,
+                                  angles=self._angles.reshape(-1, 1),
+                                  elements=self._elements,
+                                  nsamples=self._signals.shape[0])
+
+        apodization = self._apodization.table if self._apodization is not None else None
+        return RXbeamformer(signals=self._signals,
+                            delays=delays.sample_delays,
+                            apodization=apodization).frame
+
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def frame(self):
+        return self._frame
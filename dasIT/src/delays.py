@@ -27,19 +27,36 @@ Author: Christoph Leitner, Date: Aug. 2022
 # 2nd Dimension: Distance/Time from one element to all other elements
 # 3rd Dimension: 2. for all elements
 # 4th Dimension: number of angles
+#
+# By default the lateral pixel coordinates coincide with the transducer elements. For an arbitrary pixel grid
+# (e.g. a region of interest, see medium.py) the lateral element positions are passed separately and the
+# 2nd dimension holds the lateral pixel coordinates of the grid.
+#
+# Sample delays are stored in the narrowest integer type (int16 or int32) that can hold the number of recorded
+# samples. Taps outside of the recording (delay < 0 or delay >= number of recorded samples) are marked with the
+# sentinel value `number of recorded samples`. The beamformer zero-pads the signals by one sample, so invalid taps
+# do not contribute to the image. A bit-packed validity mask is available through `valid_mask`.
 
 
 import numpy as np
 from datetime import datetime
 
 class planewave_delays():
-    def __init__(self, medium=None, sos=1540, fsampling=1, angles=0):
+    def __init__(self, medium=None, sos=1540, fsampling=1, angles=0, elements=None, nsamples=None, keep_path_length=False,
+                 sample_table=True):
         self._medium = medium
+        self._nr_samples = nsamples
+        self._elements = self._medium[0] if elements is None else np.reshape(elements, (1, -1))
         self._speed_of_sound = sos
         self._sampling_frequency = fsampling
         self._angles = angles
         self._axial_pos_first_active_element()
-        self._delay_table = self.delays_by_sample()
+        # The two-way travel distances only depend on the geometry. They can be kept to derive the delay
+        # tables for other speeds of sound without recomputing the geometry (see sos_sweep.py).
+        self._path_length = self.path_length() if keep_path_length else None
+        # sample_table=False: geometry only (path lengths), no sample delay table for sos
+        self._sentinel = self._nr_samples
+        self._delay_table = self.delays_by_sample() if sample_table else None
 
     def _axial_pos_first_active_element(self):
         axial_position = np.sign(self._angles) * np.max(self._medium[0])
@@ -69,28 +86,27 @@ class planewave_delays():
         # dist_tx_element2echo = np.moveaxis(dist_tx_element2echo, 2, -1)
         ###--->
         echo_coords_axial = np.expand_dims(np.tile(self._medium[1], self._medium[0].size), axis=2)
-        echo_coords_axial = np.repeat(echo_coords_axial, self._medium[0].size, axis=2)
+        echo_coords_axial = np.repeat(echo_coords_axial, self._elements.size, axis=2)
 
         echo_coords_lateral = np.expand_dims(np.tile(self._medium[0].T, self._medium[1].size).T, axis=2)
-        echo_coords_lateral = np.repeat(echo_coords_lateral, self._medium[0].size, axis=2)
+        echo_coords_lateral = np.repeat(echo_coords_lateral, self._elements.size, axis=2)
 
-        dist_tx_element2echo = echo_coords_axial * np.cos(self._angles) + echo_coords_lateral * np.sin(self._angles)
-
-        # broadcast values to the total number of angles (rx delays are not affected by angle)
+        # evaluate the distance for each angle in the fourth dimension
         # shape [depth, td_element (or lateral pixel coordinates), td_element, nbr of angles]
-        dist_tx_element2echo = np.tile(np.expand_dims(dist_tx_element2echo, axis=3), self._angles.size)
+        angles = np.ravel(self._angles).reshape(1, 1, 1, -1)
+        dist_tx_element2echo = np.expand_dims(echo_coords_axial, axis=3) * np.cos(angles) + \
+                               np.expand_dims(echo_coords_lateral, axis=3) * np.sin(angles)
         return dist_tx_element2echo.astype(np.float32)
 
     def rx_dist2echo(self):
 
         echo_coords_axial = np.expand_dims(np.tile(self._medium[1], self._medium[0].size), axis=2)
-        echo_coords_axial = np.repeat(echo_coords_axial, self._medium[0].size, axis=2)
+        echo_coords_axial = np.repeat(echo_coords_axial, self._elements.size, axis=2)
 
         echo_coords_lateral = np.expand_dims(np.tile(self._medium[0].T, self._medium[1].size).T, axis=2)
 
-        transducer_element_coords_lateral = np.expand_dims(np.tile(self._medium[0].T, self._medium[0].size), axis=0)
-        transducer_element_coords_lateral = np.repeat(transducer_element_coords_lateral, self._medium[1].size, axis=0)
-        transducer_element_coords_lateral = np.moveaxis(transducer_element_coords_lateral,1,-1)
+        # shape [1, 1, td_element]: broadcasted over depth and lateral pixel coordinates
+        transducer_element_coords_lateral = np.reshape(self._elements, (1, 1, -1))
 
         dist_rx_echo2element = np.sqrt(echo_coords_axial ** 2 + (echo_coords_lateral - transducer_element_coords_lateral) ** 2)
 
@@ -101,19 +117,54 @@ class planewave_delays():
         return dist_rx_echo2element.astype(np.float32)
 
 
-    def delays_by_sample(self):
+    def path_length(self):
+        # Two-way (TX + RX) travel distance [m]
+        # shape [depth, td_element (or lateral pixel coordinates), td_element, nbr of angles]
+        return self.tx_dist2echo() + self.rx_dist2echo()
+
+
+    def delays_by_sample(self, sos=None):
         start_timing = datetime.now()
 
-        delays_time = ((self.tx_dist2echo() + self.rx_dist2echo()) / self._speed_of_sound)
+        sos = self._speed_of_sound if sos is None else sos
+        path_length = self._path_length if self._path_length is not None else self.path_length()
+        delays_time = (path_length / sos)
         delays_sample = np.rint(np.multiply(delays_time, self._sampling_frequency))
-        delays_sample[delays_sample > 1360] = 0
+
+        # Without a known record length every tap is kept; the sentinel lies behind the longest delay
+        if self._nr_samples is None:
+            self._nr_samples = int(np.amax(delays_sample)) + 1
+        self._sentinel = int(self._nr_samples)
+        delays_sample[(delays_sample < 0) | (delays_sample >= self._nr_samples)] = self._sentinel
 
         end_timing = datetime.now()
         timing_delta_delaytable = end_timing - start_timing
         print(f'Time to initialize delay tables: {timing_delta_delaytable.total_seconds()} [s]')
-        return delays_sample.astype(np.int)
+        return delays_sample.astype(self.table_dtype(self._sentinel))
+
+
+    @staticmethod
+    def table_dtype(nsamples):
+        # narrowest integer type that holds all sample indices including the sentinel
+        if nsamples <= np.iinfo(np.int16).max:
+            return np.int16
+        return np.int32
 
 
     @property
     def sample_delays(self):
-        return self._delay_table
\ No newline at end of file
+        return self._delay_table
+
+    @property
+    def path_lengths(self):
+        return self._path_length
+
+    @property
+    def sentinel(self):
+        return self._sentinel
+
+    @property
+    def valid_mask(self):
+        # bit-packed validity of each tap (packed along the td_element dimension)
+        # shape: [depth, lateral pixel, ceil(td_element / 8), nbr of angles]
+        return np.packbits(self._delay_table != self._sentinel, axis=2)
\ No newline at end of file
@@ -0,0 +1,183 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Fourier-domain (f-k / Stolt) plane wave migration:
+# Alternative reconstruction engine to the pixel-wise delay-and-sum beamformer (das_bf.py). The cost is
+# dominated by 2-D FFTs and one interpolation in the frequency domain, i.e. O(N log N) per angle instead of
+# O(pixels x elements) per angle.
+#
+# Adapted from:
+# [1] L. Garcia, L. Le Tarnec, S. Muth, E. Montagnon, J. Poree and G. Cloutier, Stolt's f-k migration for
+# plane wave ultrasound imaging, IEEE Transactions on Ultrasonics, Ferroelectrics, and Frequency Control,
+# vol. 60, 9, pp. 1853-1867, 2013. doi: https://doi.org/10.1109/TUFFC.2013.2771
+#
+# The echo of a point (x_s, z_s) for a plane wave with angle alpha arrives at element x at
+# t(x) = (z_s * cos(alpha) + x_s * sin(alpha) + sqrt(z_s^2 + (x - x_s)^2)) / c
+#
+# After removing the steering delay x * sin(alpha) / c from every trace, the diffraction curve is approximated
+# by an exploding reflector (ERM) hyperbola sqrt(z_e^2 + (x - x_e)^2) / v_e that matches value, slope and
+# curvature at x = x_s [1]:
+# v_e = c / sqrt(1 + cos(alpha) + sin(alpha)^2)
+# z_e = beta * z_s,  beta = (1 + cos(alpha))^(3/2) / (1 + cos(alpha) + sin(alpha)^2)
+# x_e = x_s + gamma * z_s,  gamma = sin(alpha) * (1 + cos(alpha)) / (1 + cos(alpha) + sin(alpha)^2)
+#
+# The ERM data is migrated with Stolt's mapping f(kz) = sqrt(f_out^2 + v_e^2 * kx^2) (f_out = v_e * kz) and
+# the migrated image (t_e = z_e / v_e, x_e) is resampled onto the medium grid (x, z) and compounded over all angles.
+# The migrated spectrum is zero padded (band limited upsampling) to the pixel spacing of the medium grid.
+#
+# Removing the steering delay shifts the spectrum by f * sin(alpha) / c in kx. At element pitches of about one
+# wavelength this shift wraps around the spatial sampling band, so the wavenumbers are unwrapped around
+# f * sin(alpha) / c before the Stolt mapping.
+#
+# The ERM fit is exact for echoes arriving at normal incidence. For wide receive angles (full aperture at shallow
+# depths) its phase error broadens the lateral point spread function. With a focus number F the receive angles are
+# limited to |tan(theta)| <= 1 / (2 * F) in the (f, kx) domain, i.e. the receive aperture |x - x_element| <= z / (2 * F).
+# The FFTs and the Stolt interpolation run in single precision.
+#
+# shape signals: [samples, td_element, nbr of angles] (RF or analytic signal; only positive frequencies are used)
+# shape frame: [depth, lateral pixel] (complex, analytic)
+
+
+import numpy as np
+from scipy import fft
+from scipy.ndimage import map_coordinates
+
+class fk_migration():
+    def __init__(self,
+                 signals=None,
+                 transducer=None,
+                 medium=None,
+                 angles=0,
+                 sos=1540,
+                 fsampling=None,
+                 padding=2,
+                 fnumber=None,
+                 max_upsampling=8):
+
+        self._signals = signals.reshape(signals.shape[0], signals.shape[1], -1)
+        self._medium = medium
+        self._angles = np.ravel(np.asarray(angles, dtype=np.float64))
+        self._speed_of_sound = float(sos)
+        self._sampling_frequency = transducer.sampling_frequency if fsampling is None else fsampling
+        self._elements = np.ravel(transducer.lateral_transducer_spacing)
+        self._element_spacing = np.mean(np.diff(self._elements))
+        self._padding = padding
+        self._fnumber = fnumber
+        self._max_upsampling = int(max_upsampling)
+
+        self._frame = self.migrate()
+
+
+    def _migrate_angle(self, signals, angle):
+        nr_samples, nr_elements = signals.shape
+        nr_f = int(2 ** np.ceil(np.log2(self._padding * nr_samples)))
+        nr_kx = int(2 ** np.ceil(np.log2(self._padding * nr_elements)))
+        c = self._speed_of_sound
+        erm_factor = 1 + np.cos(angle) + np.sin(angle) ** 2
+        v_erm = c / np.sqrt(erm_factor)
+        beta = (1 + np.cos(angle)) ** 1.5 / erm_factor
+        gamma = np.sin(angle) * (1 + np.cos(angle)) / erm_factor
+
+        # Temporal FFT, only the positive frequencies are kept (analytic signal)
+        spectrum = fft.fft(signals.astype(np.complex64), n=nr_f, axis=0, workers=-1)[:nr_f // 2]
+        f = np.fft.fftfreq(nr_f, d=1 / self._sampling_frequency)[:nr_f // 2].reshape(-1, 1).astype(np.float32)
+
+        # Remove the steering delay of every trace: s(t + x * sin(alpha) / c)
+        steering_delay = (self._elements * np.sin(angle) / c).reshape(1, -1)
+        spectrum = spectrum * np.exp(2j * np.pi * f * steering_delay).astype(np.complex64)
+
+        # Spatial FFT
+        spectrum = fft.fft(spectrum, n=nr_kx, axis=1, workers=-1)
+
+        # Lateral wavenumbers of the migrated image (band limited upsampling to the medium grid)
+        axial_upsampling, lateral_upsampling = self.upsampling(v_erm / beta, angle)
+        kx = np.fft.fftfreq(lateral_upsampling * nr_kx, d=self._element_spacing / lateral_upsampling).reshape(1, -1).astype(np.float32)
+        # Removing the steering delay shifts the spectrum by f * sin(alpha) / c, so a column of the sampled
+        # spectrum holds the wavenumbers kx + m / pitch. Each wavenumber is read from its (aliased) column and
+        # only kept within half a sampling period around f * sin(alpha) / c (unwrapping of the shift).
+        kx_idx = np.round(kx * nr_kx * self._element_spacing).astype(int) % nr_kx
+
+        # Stolt mapping (linear interpolation along the frequency axis)
+        f_in = np.sqrt(f ** 2 + (v_erm * kx) ** 2)
+        f_idx = f_in / (self._sampling_frequency / nr_f)
+        f_idx_low = np.floor(f_idx).astype(int)
+        weight = f_idx - f_idx_low
+        valid = f_idx_low < (nr_f // 2 - 1)
+        kx_offset = (kx - f_in * np.sin(angle) / c) * self._element_spacing
+        valid &= (kx_offset >= -0.5) & (kx_offset < 0.5)
+
+        # Receive angle theta of the echoes: kx = f * (sin(alpha) - sin(theta)) / c, evanescent components and
+        # (with a focus number F) receive angles beyond |tan(theta)| <= 1 / (2 * F) are removed
+        sin_receive_max = 1 if self._fnumber is None else 1 / np.sqrt(1 + 4 * self._fnumber ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sin_receive = np.sin(angle) - c * kx / f_in
+        valid &= np.abs(sin_receive) <= sin_receive_max
+
+        # Only the valid bins (about 1 / lateral upsampling of the spectrum) are interpolated
+        f_out_idx, kx_out_idx = np.nonzero(valid)
+        f_idx_low = f_idx_low[f_out_idx, kx_out_idx]
+        weight = weight[f_out_idx, kx_out_idx]
+        kx_in_idx = kx_idx[0, kx_out_idx]
+        migrated = np.zeros(valid.shape, dtype=spectrum.dtype)
+        # Jacobian (obliquity factor) of the mapping
+        migrated[f_out_idx, kx_out_idx] = ((1 - weight) * spectrum[f_idx_low, kx_in_idx] +
+                                           weight * spectrum[f_idx_low + 1, kx_in_idx]) * \
+                                          (f[f_out_idx, 0] / f_in[f_out_idx, kx_out_idx])
+
+        # Back to the (t_e, x_e) domain
+        migrated = fft.ifft(migrated, axis=1, workers=-1)
+        image = fft.ifft(migrated, n=axial_upsampling * nr_f, axis=0, workers=-1)
+
+        # Resample onto the medium grid: t_e = beta * z / v_e,  x_e = x + gamma * z
+        # The lateral padding of the spatial FFT is kept, x_e beyond the aperture edges wraps into it.
+        px_lateral = np.ravel(self._medium[0]).reshape(1, -1)
+        px_axial = np.ravel(self._medium[1]).reshape(-1, 1)
+        t_idx = (beta * px_axial / v_erm) * self._sampling_frequency * axial_upsampling
+        x_idx = (px_lateral + gamma * px_axial - self._elements[0]) / self._element_spacing * lateral_upsampling
+        coordinates = np.stack(np.broadcast_arrays(t_idx, x_idx))
+
+        frame = map_coordinates(image.real, coordinates, order=1, mode='grid-wrap') + \
+                1j * map_coordinates(image.imag, coordinates, order=1, mode='grid-wrap')
+        return np.where((t_idx >= 0) & (t_idx < nr_f * axial_upsampling // 2), frame, 0)
+
+
+    def upsampling(self, velocity, angle):
+        # Upsampling factors of the migrated image (axial, lateral) so that its sampling is at least as fine as
+        # the medium grid. The migrated image is sampled with velocity / fsampling (depth) and the element pitch.
+        # Laterally the unwrapped wavenumbers (up to fsampling / 2 * |sin(alpha)| / c + 1 / (2 * pitch)) have to
+        # fit into the upsampled spectrum as well.
+        lateral_spacing = np.mean(np.diff(np.ravel(self._medium[0]))) if np.size(self._medium[0]) > 1 else np.inf
+        axial_spacing = np.mean(np.diff(np.ravel(self._medium[1]))) if np.size(self._medium[1]) > 1 else np.inf
+        axial_upsampling = int(np.clip(np.ceil(velocity / self._sampling_frequency / axial_spacing), 1, self._max_upsampling))
+        lateral_upsampling = int(np.clip(np.ceil(self._element_spacing / lateral_spacing), 1, self._max_upsampling))
+        steering_upsampling = int(np.ceil(1 + self._element_spacing * self._sampling_frequency * np.abs(np.sin(angle)) / self._speed_of_sound))
+        return axial_upsampling, max(lateral_upsampling, steering_upsampling)
+
+
+    def migrate(self):
+        frame = np.zeros((np.ravel(self._medium[1]).size, np.ravel(self._medium[0]).size), dtype=np.complex128)
+        for angle_idx, angle in enumerate(self._angles):
+            frame += self._migrate_angle(self._signals[:, :, angle_idx], angle)
+        return frame
+
+
+    @property
+    def frame(self):
+        return self._frame
@@ -0,0 +1,169 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Minimum variance (Capon) beamformer:
+# The fixed delay-and-sum weights are replaced by data adaptive weights that minimize the output power while
+# passing the focal point undistorted (w^H a = 1, steering vector a = ones after delay compensation):
+#
+# w = R^-1 a / (a^H R^-1 a)
+#
+# The covariance matrix R of every pixel is estimated by subarray averaging (spatial smoothing) over the
+# K = N - L + 1 subarrays of length L of the N delayed channel signals x, optionally averaged over an axial kernel
+# of +/- axial_kernel depth pixels, and diagonally loaded for robustness:
+#
+# R = 1 / K * sum_l x_l x_l^H + delta * trace(R) / L * I
+# y = 1 / K * sum_l w^H x_l
+#
+# Adapted from:
+# [1] J.-F. Synnevag, A. Austeng and S. Holm, Adaptive beamforming applied to medical ultrasound imaging, IEEE
+# Transactions on Ultrasonics, Ferroelectrics, and Frequency Control, vol. 54, 8, pp. 1606-1613, 2007.
+# doi: https://doi.org/10.1109/TUFFC.2007.431
+#
+# The delayed channel data is gathered for a tile of depth rows at a time (see das_bf.delayed_channels). The
+# subarray sums of R are read from cumulative sums of the lag products along the aperture (L lags instead of K outer
+# products), and the weights of all pixels of the tile are obtained with one batched np.linalg.solve call.
+# Tiles are processed in a thread pool (the gathers and LAPACK solves release the GIL).
+#
+# The subarray length is fixed for the whole image. Elements outside an apodization aperture are zero, so the
+# active aperture should span more elements than the subarray (e.g. beamform with the full aperture).
+#
+# shape signals: [samples, td_element, nbr of angles] (analytic signal)
+# shape frame: [depth, lateral pixel]
+
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from dasIT.src.das_bf import zero_pad_samples, delayed_channels
+
+class mv_beamformer():
+    def __init__(self,
+                 signals=None,
+                 delays=None,
+                 apodization=None,
+                 subarray=None,
+                 diagonal_loading=1e-2,
+                 axial_kernel=0,
+                 depth_tile=16,
+                 workers=None,
+                 nsamples=None):
+
+        self._signals = zero_pad_samples(signals.reshape(signals.shape[0], signals.shape[1], -1), delays, nsamples)
+        self._delays = delays
+        self._apodization = apodization
+        nr_elements = delays.shape[2]
+        self._subarray = nr_elements // 4 if subarray is None else int(subarray)
+        self._diagonal_loading = diagonal_loading
+        self._axial_kernel = int(axial_kernel)
+        self._depth_tile = int(depth_tile)
+        self._workers = workers
+
+        if not 1 <= self._subarray <= nr_elements:
+            print(r'ERROR MESSAGE: Subarray length must be between 1 and the number of elements. Check \textit{subarray}.')
+
+        self._frame = self.beamform()
+
+
+    def _axial_sum(self, values, rows):
+        # sum over the axial kernel around the given rows (cumulative sums along depth)
+        if self._axial_kernel == 0:
+            return values[rows]
+        cumulative = np.concatenate((np.zeros((1,) + values.shape[1:], dtype=values.dtype), np.cumsum(values, axis=0)))
+        low = np.maximum(rows - self._axial_kernel, 0)
+        high = np.minimum(rows + self._axial_kernel + 1, values.shape[0])
+        return cumulative[high] - cumulative[low]
+
+
+    @staticmethod
+    def _subarray_sums(values, length, nr_subarrays):
+        # sums of values[..., l + i] over the subarrays l = 0 ... nr_subarrays - 1 for i = 0 ... length - 1
+        cumulative = np.concatenate((np.zeros(values.shape[:-1] + (1,), dtype=values.dtype),
+                                     np.cumsum(values, axis=-1)), axis=-1)
+        return cumulative[..., nr_subarrays:nr_subarrays + length] - cumulative[..., :length]
+
+
+    def covariance(self, channels, rows):
+        # subarray averaged (and axially averaged) covariance matrices, shape [rows, lateral pixel, L, L]
+        nr_elements = channels.shape[2]
+        length = self._subarray
+        nr_subarrays = nr_elements - length + 1
+
+        # diagonals[..., lag, i] = R[i, i + lag] = 1 / K * sum_l x[l + i] x*[l + i + lag]
+        diagonals = np.zeros((rows.size, channels.shape[1], length, length), dtype=channels.dtype)
+        for lag in range(length):
+            products = channels[:, :, :nr_elements - lag] * np.conj(channels[:, :, lag:])
+            diagonals[:, :, lag, :length - lag] = self._axial_sum(self._subarray_sums(products, length - lag, nr_subarrays), rows)
+        diagonals /= nr_subarrays
+
+        # R[i, j] = diagonals[j - i, i] (upper triangle), R[j, i] = conj(R[i, j])
+        row_idx, column_idx = np.meshgrid(np.arange(length), np.arange(length), indexing='ij')
+        flat_idx = np.abs(column_idx - row_idx) * length + np.minimum(row_idx, column_idx)
+        covariance = np.take(diagonals.reshape(diagonals.shape[:2] + (-1,)), flat_idx, axis=-1)
+        np.conjugate(covariance, out=covariance, where=(row_idx > column_idx))
+        return covariance
+
+
+    def beamform_tile(self, depth_start, depth_stop):
+        nr_depth = self._delays.shape[0]
+        halo_start = max(depth_start - self._axial_kernel, 0)
+        halo_stop = min(depth_stop + self._axial_kernel, nr_depth)
+        channels = delayed_channels(self._signals, self._delays, self._apodization, halo_start, halo_stop)
+        rows = np.arange(depth_start, depth_stop) - halo_start
+
+        length = self._subarray
+        nr_subarrays = channels.shape[2] - length + 1
+        covariance = self.covariance(channels, rows)
+
+        # diagonal loading (pixels without signal get the identity)
+        trace = np.real(np.trace(covariance, axis1=2, axis2=3))
+        loading = self._diagonal_loading * trace / length
+        loading = np.where(trace > 0, loading, 1)
+        covariance[:, :, np.arange(length), np.arange(length)] += loading[:, :, np.newaxis]
+
+        # w = R^-1 a / (a^H R^-1 a)
+        steering = np.ones(covariance.shape[:-1] + (1,), dtype=covariance.dtype)
+        inverse_steering = np.linalg.solve(covariance, steering)[..., 0]
+        weights = inverse_steering / np.sum(inverse_steering, axis=-1, keepdims=True)
+
+        subarray_sum = self._subarray_sums(channels[rows], length, nr_subarrays)
+        return np.sum(np.conj(weights) * subarray_sum, axis=-1) / nr_subarrays
+
+
+    def beamform(self):
+        nr_depth, nr_lateral = self._delays.shape[:2]
+        frame = np.zeros((nr_depth, nr_lateral), dtype=np.result_type(self._signals.dtype, np.complex64))
+        tiles = [(depth_start, min(depth_start + self._depth_tile, nr_depth))
+                 for depth_start in range(0, nr_depth, self._depth_tile)]
+
+        def run(tile):
+            frame[tile[0]:tile[1]] = self.beamform_tile(*tile)
+
+        if self._workers == 1:
+            for tile in tiles:
+                run(tile)
+        else:
+            with ThreadPoolExecutor(max_workers=self._workers) as pool:
+                list(pool.map(run, tiles))
+        return frame
+
+
+    @property
+    def frame(self):
+        return self._frame
@@ -0,0 +1,300 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Memoized stage graph:
+# The processing chain is a directed acyclic graph of stages. Every stage output is cached in memory under a key
+# that combines the stage name, a fingerprint of its parameters and the keys of its input stages:
+#
+# key(stage) = hash(name, fingerprint(parameters), key(input_1), ..., key(input_n))
+#
+# Keys only depend on parameters, never on the computed data, so they are evaluated without running anything.
+# Changing a parameter changes the key of that stage and of all downstream stages; upstream results are served
+# from the cache. The cache evicts the least recently used results once its byte budget is exceeded.
+#
+# beamforming_pipeline builds the graph of the notebook workflow:
+#
+#   rf -> channels -> tgc -> filter -> analytic ----\
+#                                 delays ------------> beamform -> interpolate -> compress
+#                                 apodization ------/
+#
+# pipeline = beamforming_pipeline(rf=RFdata.signal, transducer=dasIT_transducer, medium=dasIT_medium)
+# image = pipeline.get('compress')
+# pipeline.set('compress', dbrange=40)      # only the log compression is recomputed
+# image = pipeline.get('compress')
+
+
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+from dasIT.features.tgc import tg_compensation
+from dasIT.features.signal import RFfilter, analytic_signal, logcompression
+from dasIT.features.image import interp_lateral
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization as dasIT_apodization
+from dasIT.src.das_bf import RXbeamformer, padded_signals
+
+
+def fingerprint(value, digest=None):
+    # Stable hash of (nested) parameters: scalars, strings, arrays, containers and plain objects
+    root = digest is None
+    digest = hashlib.blake2b(digest_size=16) if root else digest
+    if isinstance(value, np.ndarray):
+        digest.update(f'ndarray{value.shape}{value.dtype.str}'.encode())
+        digest.update(np.ascontiguousarray(value).view(np.uint8).data)
+    elif isinstance(value, dict):
+        digest.update(b'dict')
+        for key in sorted(value, key=str):
+            fingerprint(key, digest)
+            fingerprint(value[key], digest)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            fingerprint(item, digest)
+    elif value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        digest.update(f'{type(value).__name__}:{value!r}'.encode())
+    elif hasattr(value, 'to_numpy'):
+        # pandas objects (e.g. TGCloader control points)
+        fingerprint(value.to_numpy(), digest)
+    elif hasattr(value, '__dict__'):
+        digest.update(type(value).__name__.encode())
+        fingerprint(vars(value), digest)
+    else:
+        digest.update(repr(value).encode())
+    return digest.hexdigest() if root else digest
+
+
+def result_nbytes(value):
+    # memory held by a stage result (arrays, containers of arrays and objects holding arrays)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(result_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_nbytes(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return result_nbytes(vars(value))
+    return 0
+
+
+class lru_cache():
+    def __init__(self, max_bytes=2 * 1024 ** 3):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key][0]
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+        nbytes = result_nbytes(value)
+        if nbytes > self._max_bytes:
+            # larger than the whole budget: not cached
+            return
+        if key in self._entries:
+            self._nbytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self._nbytes += nbytes
+        while self._nbytes > self._max_bytes:
+            _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= evicted_nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._nbytes = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+
+class stage_graph():
+    def __init__(self, max_bytes=2 * 1024 ** 3):
+        self._stages = OrderedDict()
+        self._cache = lru_cache(max_bytes)
+        self._computed = []
+
+
+    def add(self, name, function, inputs=(), **params):
+        # function(*input results, **params) -> result
+        for input_name in inputs:
+            if input_name not in self._stages:
+                print(rf'ERROR MESSAGE: Input stage \textit{{{input_name}}} of \textit{{{name}}} does not exist.')
+        self._stages[name] = {'function': function,
+                              'inputs': tuple(inputs),
+                              'params': dict(params),
+                              'fingerprint': fingerprint(params)}
+
+
+    def set(self, name, **params):
+        # update parameters of a stage; the parameter fingerprint is evaluated once here
+        stage = self._stages[name]
+        stage['params'].update(params)
+        stage['fingerprint'] = fingerprint(stage['params'])
+
+
+    def params(self, name):
+        return dict(self._stages[name]['params'])
+
+
+    def key(self, name):
+        stage = self._stages[name]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(name.encode())
+        digest.update(stage['fingerprint'].encode())
+        for input_name in stage['inputs']:
+            digest.update(self.key(input_name).encode())
+        return digest.hexdigest()
+
+
+    def _evaluate(self, name):
+        key = self.key(name)
+        found, result = self._cache.get(key)
+        if found:
+            return result
+        stage = self._stages[name]
+        inputs = [self._evaluate(input_name) for input_name in stage['inputs']]
+        result = stage['function'](*inputs, **stage['params'])
+        self._cache.put(key, result)
+        self._computed.append(name)
+        return result
+
+
+    def get(self, name):
+        self._computed = []
+        return self._evaluate(name)
+
+
+    def stale(self, name):
+        # stages that would be recomputed by get(name)
+        stale_stages = []
+
+        def visit(stage_name):
+            if self.key(stage_name) in self._cache or stage_name in stale_stages:
+                return
+            for input_name in self._stages[stage_name]['inputs']:
+                visit(input_name)
+            stale_stages.append(stage_name)
+
+        visit(name)
+        return stale_stages
+
+
+    @property
+    def stages(self):
+        return list(self._stages)
+
+    @property
+    def computed(self):
+        # stages computed by the last get call
+        return list(self._computed)
+
+    @property
+    def cache(self):
+        return self._cache
+
+
+# Stage functions of the beamforming pipeline
+
+def _channels(rf, transducer=None, medium=None, frame=0):
+    # crop to the recorded depth, sort the channels (pinmap), select the shots of one frame and blank the
+    # samples before the first recorded echo
+    # shape: [samples, td_element, nbr of angles]
+    nr_angles = transducer.planewaves_nr
+    signals = rf[:medium.rx_echo_totalnr_samples, transducer.transducer_pinmap, frame * nr_angles:(frame + 1) * nr_angles]
+    signals = np.array(signals, dtype=np.float64)
+    signals[:transducer.start_depth_rec_samples] = 0
+    return signals
+
+
+def _tgc(signals, medium=None, transducer=None, cntrl_points=None, mode='points'):
+    if cntrl_points is None:
+        return signals
+    return tg_compensation(signals=signals,
+                           medium=medium,
+                           center_frequency=transducer.center_frequency,
+                           cntrl_points=cntrl_points,
+                           mode=mode).signals
+
+
+def _filter(signals, fcutoff_band=None, fsampling=None, type='gaussian', order=10):
+    return RFfilter(signals=signals, fcutoff_band=fcutoff_band, fsampling=fsampling, type=type, order=order).signal
+
+
+def _analytic(signals):
+    # analytic signal with the zero sentinel sample of the delay table appended (see das_bf.zero_pad_samples),
+    # padded once here so that the beamform stage does not copy the cached signals on every evaluation
+    return padded_signals(analytic_signal(signals))
+
+
+def _delays(medium=None, sos=1540, fsampling=None, angles=0, nsamples=None):
+    return planewave_delays(medium=medium.medium, sos=sos, fsampling=fsampling, angles=angles,
+                            nsamples=nsamples).sample_delays
+
+
+def _apodization(medium=None, transducer=None, apo='rec', angles=0):
+    return dasIT_apodization(delays=None, medium=medium.medium, transducer=transducer, apo=apo, angles=angles).table
+
+
+def _beamform(signals, delays, apodization, coherence=None, nsamples=None):
+    return RXbeamformer(signals=signals, delays=delays, apodization=apodization, coherence=coherence,
+                        nsamples=nsamples).frame
+
+
+def _interpolate(frame, transducer=None, medium=None, scale=2):
+    interpolated = interp_lateral(signals=np.abs(frame), transducer=transducer, medium=medium, scale=scale)
+    return {'signals': interpolated.signals_lateral_interp, 'imagegrid_mm': interpolated.imagegrid_mm}
+
+
+def _compress(interpolated, dbrange=50):
+    return logcompression(interpolated['signals'], dbrange)
+
+
+def beamforming_pipeline(rf=None, transducer=None, medium=None, tgc=None, frame=0, max_bytes=2 * 1024 ** 3):
+    # shape rf: [samples, channels, frames * shots] (e.g. RFDataloader.signal)
+    angles = transducer.planewave_angles()
+    pipeline = stage_graph(max_bytes=max_bytes)
+    pipeline.add('rf', lambda rf: rf, rf=rf)
+    pipeline.add('channels', _channels, inputs=('rf',), transducer=transducer, medium=medium, frame=frame)
+    pipeline.add('tgc', _tgc, inputs=('channels',), medium=medium, transducer=transducer, cntrl_points=tgc)
+    pipeline.add('filter', _filter, inputs=('tgc',), fcutoff_band=transducer.bandwidth,
+                 fsampling=transducer.sampling_frequency, type='gaussian', order=10)
+    pipeline.add('analytic', _analytic, inputs=('filter',))
+    pipeline.add('delays', _delays, medium=medium, sos=medium.speed_of_sound, fsampling=transducer.sampling_frequency,
+                 angles=angles, nsamples=medium.rx_echo_totalnr_samples)
+    pipeline.add('apodization', _apodization, medium=medium, transducer=transducer, apo='rec', angles=angles)
+    pipeline.add('beamform', _beamform, inputs=('analytic', 'delays', 'apodization'),
+                 nsamples=medium.rx_echo_totalnr_samples)
+    pipeline.add('interpolate', _interpolate, inputs=('beamform',), transducer=transducer, medium=medium, scale=2)
+    pipeline.add('compress', _compress, inputs=('interpolate',), dbrange=50)
+    return pipeline
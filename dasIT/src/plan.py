@@ -0,0 +1,332 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Beamforming plan:
+# A plan is built once from a frozen, hashable geometry specification (transducer + medium + plane wave angles +
+# processing settings) and owns every static table of the pipeline
+#
+#   channel selection (pinmap) -> blanking -> TGC -> band pass filter -> analytic signal -> delay and sum
+#   -> envelope -> lateral interpolation -> (log compression)
+#
+# i.e. the TGC waveform, the filter coefficients, the Hilbert multiplier, the gather index table (delay table with
+# the binary apodization folded in), the lateral interpolation weights and all intermediate / output buffers.
+# execute(rf) runs the pipeline into these buffers; apart from the FFT work arrays of the analytic signal nothing
+# is allocated per frame.
+#
+# The specification is the natural cache key (equal settings -> equal hash) and the plan can be pickled to worker
+# processes and reused for any number of frames.
+#
+# shape rf: [samples, channels, nbr of angles] (raw RF of one frame, channels in acquisition order)
+# shape output: [depth, lateral pixel * interp_scale] (envelope or log compressed image)
+
+
+import numpy as np
+from scipy import fft
+from scipy.ndimage import convolve1d
+from dataclasses import dataclass, asdict
+
+from dasIT.features.transducer import transducer as dasIT_transducer
+from dasIT.features.medium import medium as dasIT_medium
+from dasIT.features.tgc import tg_compensation
+from dasIT.features.signal import bandpass_coefficients
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization as dasIT_apodization
+
+
+def _as_tuple(values):
+    return None if values is None else tuple(float(value) for value in np.ravel(values))
+
+
+@dataclass(frozen=True)
+class geometry_spec():
+    # transducer
+    center_frequency: float
+    bandwidth: tuple
+    adc_ratio: int
+    nr_elements: int
+    element_pitch: float
+    pinmap: tuple
+    elevation_focus: float = None
+    fnumber: float = None
+    axial_cutoff_wavelength: float = 5
+    # plane waves [rad]
+    angles: tuple = (0.0,)
+    # medium
+    speed_of_sound: float = 1540
+    max_depth_wavelength: float = 60
+    attenuation_coefficient: float = None
+    attenuation_power: float = None
+    roi: tuple = None
+    roi_spacing: tuple = None
+    # processing
+    apodization: str = 'rec'
+    filter_type: str = 'gaussian'
+    filter_order: int = 10
+    tgc_control_points: tuple = None
+    interp_scale: int = 1
+    dbrange: float = None
+
+    @classmethod
+    def from_setup(cls, transducer=None, medium=None, angles=None, apo='rec', filter_order=10, filter_type='gaussian',
+                   tgc=None, interp_scale=1, dbrange=None):
+        # tgc: TGCloader (control points) or None
+        roi = medium.roi
+        return cls(center_frequency=float(transducer.center_frequency),
+                   bandwidth=_as_tuple(transducer.bandwidth),
+                   adc_ratio=int(transducer.samples_per_wavelength),
+                   nr_elements=int(transducer.transducer_elements),
+                   element_pitch=float(transducer.element_pitch),
+                   pinmap=tuple(int(pin) for pin in np.ravel(transducer.transducer_pinmap)),
+                   elevation_focus=transducer.elevation_focus,
+                   fnumber=transducer.fnumber,
+                   axial_cutoff_wavelength=float(transducer.axial_cutoff_wavelength),
+                   angles=_as_tuple(transducer.planewave_angles() if angles is None else angles),
+                   speed_of_sound=float(medium.speed_of_sound),
+                   max_depth_wavelength=float(medium.recorded_depth),
+                   attenuation_coefficient=medium.alpha,
+                   attenuation_power=medium.alpha_power,
+                   roi=None if roi is None else tuple(_as_tuple(extent) for extent in roi),
+                   roi_spacing=_as_tuple(medium.roi_spacing),
+                   apodization=apo,
+                   filter_type=filter_type,
+                   filter_order=int(filter_order),
+                   tgc_control_points=None if tgc is None else _as_tuple(tgc.tgc_control_points),
+                   interp_scale=int(interp_scale),
+                   dbrange=dbrange)
+
+    def transducer(self):
+        angles_deg = np.degrees(self.angles)
+        return dasIT_transducer(center_frequency_hz=self.center_frequency,
+                                bandwidth_hz=np.asarray(self.bandwidth),
+                                adc_ratio=self.adc_ratio,
+                                transducer_elements_nr=self.nr_elements,
+                                element_pitch_m=self.element_pitch,
+                                pinmap=np.asarray(self.pinmap),
+                                pinmapbase=0,
+                                elevation_focus=self.elevation_focus,
+                                focus_number=self.fnumber,
+                                totalnr_planewaves=len(self.angles),
+                                planewave_angle_interval=[angles_deg[0], angles_deg[-1]],
+                                axial_cutoff_wavelength=self.axial_cutoff_wavelength,
+                                speed_of_sound_ms=self.speed_of_sound)
+
+    def medium(self, transducer=None):
+        transducer = self.transducer() if transducer is None else transducer
+        return dasIT_medium(speed_of_sound_ms=self.speed_of_sound,
+                            center_frequency=transducer.center_frequency,
+                            sampling_frequency=transducer.sampling_frequency,
+                            max_depth_wavelength=self.max_depth_wavelength,
+                            lateral_transducer_element_spacing=transducer.lateral_transducer_spacing,
+                            attenuation_coefficient=self.attenuation_coefficient,
+                            attenuation_power=self.attenuation_power,
+                            roi=self.roi,
+                            roi_spacing=self.roi_spacing)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class _control_points():
+    # minimal TGCloader replacement for the control points stored in the specification
+    def __init__(self, control_points):
+        self.tgc_control_points = np.asarray(control_points).reshape(1, -1)
+
+
+class BeamformingPlan():
+    def __init__(self, spec=None):
+        self._spec = spec
+        self._transducer = spec.transducer()
+        self._medium = spec.medium(self._transducer)
+        self._angles = np.asarray(spec.angles).reshape(-1, 1)
+
+        self._nr_samples = self._medium.rx_echo_totalnr_samples
+        self._nr_elements = spec.nr_elements
+        self._nr_angles = len(spec.angles)
+        self._pinmap = np.asarray(spec.pinmap, dtype=np.intp)
+        self._blank_samples = min(self._transducer.start_depth_rec_samples, self._nr_samples)
+
+        self._tgc_waveform = self.tgc_waveform()
+        self._filter = np.ascontiguousarray(bandpass_coefficients(self._transducer.bandwidth,
+                                                                  self._transducer.sampling_frequency,
+                                                                  spec.filter_type,
+                                                                  spec.filter_order)[:, 0, 0])
+        self._filter_origin = -1 if spec.filter_order % 2 == 0 else 0
+        self._hilbert = self.hilbert_multiplier()
+        self._gather_index, self._gather_weights = self.gather_tables()
+        self._interp_index, self._interp_weights = self.interpolation_weights()
+
+        # buffers
+        nr_depth, nr_lateral = self._gather_index.shape[1:3]
+        self._signals = np.empty((self._nr_samples, self._nr_elements, self._nr_angles))
+        self._filtered = np.empty_like(self._signals)
+        # flattened analytic signals with one trailing zero sample (target of invalid / apodized taps)
+        self._analytic = np.zeros((self._nr_samples + 1) * self._nr_elements * self._nr_angles, dtype=np.complex128)
+        self._gathered = np.empty((nr_depth, nr_lateral, self._nr_angles), dtype=np.complex128)
+        self._channel = np.empty((nr_depth, nr_lateral), dtype=np.complex128)
+        self._frame = np.empty((nr_depth, nr_lateral), dtype=np.complex128)
+        self._envelope = np.empty((nr_depth, nr_lateral))
+        self._interp_left = np.empty((nr_depth, self._interp_index.size))
+        self._image = np.empty((nr_depth, self._interp_index.size))
+
+
+    def tgc_waveform(self):
+        # TGC weights per sample (same interpolation as tg_compensation), shape [samples, 1, 1]
+        if self._spec.tgc_control_points is None:
+            return None
+        return tg_compensation(signals=np.ones((self._nr_samples, 1, 1)),
+                               medium=self._medium,
+                               center_frequency=self._transducer.center_frequency,
+                               cntrl_points=_control_points(self._spec.tgc_control_points),
+                               mode='points').signals
+
+
+    def hilbert_multiplier(self):
+        # frequency domain multiplier of the analytic signal (scipy.signal.hilbert), shape [samples, 1, 1]
+        multiplier = np.zeros(self._nr_samples)
+        if self._nr_samples % 2 == 0:
+            multiplier[0] = multiplier[self._nr_samples // 2] = 1
+            multiplier[1:self._nr_samples // 2] = 2
+        else:
+            multiplier[0] = 1
+            multiplier[1:(self._nr_samples + 1) // 2] = 2
+        return multiplier.reshape(-1, 1, 1)
+
+
+    def gather_tables(self):
+        # Flat indices into the zero padded analytic signals [samples + 1, td_element, nbr of angles] for every
+        # pixel, element and angle. Taps outside of the recording and (binary) apodized taps address the zero
+        # sample. Non-binary apodization weights are kept separately.
+        # shape: [td_element, depth, lateral pixel, nbr of angles] (contiguous per element)
+        delays = planewave_delays(medium=self._medium.medium,
+                                  sos=self._spec.speed_of_sound,
+                                  fsampling=self._transducer.sampling_frequency,
+                                  angles=self._angles,
+                                  elements=self._transducer.lateral_transducer_spacing,
+                                  nsamples=self._nr_samples).sample_delays
+        apodization = dasIT_apodization(delays=None,
+                                        medium=self._medium.medium,
+                                        transducer=self._transducer,
+                                        apo=self._spec.apodization,
+                                        angles=self._angles).table
+        apodization = np.broadcast_to(apodization, delays.shape)
+
+        nr_flat = (self._nr_samples + 1) * self._nr_elements * self._nr_angles
+        index_dtype = np.int32 if nr_flat <= np.iinfo(np.int32).max else np.int64
+        zero_sample = self._nr_samples
+        element_selector = np.arange(self._nr_elements).reshape(1, 1, -1, 1)
+        angle_selector = np.arange(self._nr_angles).reshape(1, 1, 1, -1)
+
+        binary = np.all((apodization == 0) | (apodization == 1))
+        samples = np.where(apodization != 0, delays, zero_sample) if binary else delays
+        index = (samples.astype(index_dtype) * self._nr_elements + element_selector) * self._nr_angles + angle_selector
+        weights = None if binary else np.ascontiguousarray(np.moveaxis(apodization, 2, 0), dtype=np.float64)
+        return np.ascontiguousarray(np.moveaxis(index, 2, 0)).astype(index_dtype, copy=False), weights
+
+
+    def interpolation_weights(self):
+        # Linear interpolation onto a lateral grid with interp_scale points per pixel (see interp_lateral).
+        # Points beyond the last pixel keep the value of the last pixel.
+        nr_lateral = np.ravel(self._medium.medium[0]).size
+        position = np.minimum(np.arange(0, nr_lateral, 1 / self._spec.interp_scale), nr_lateral - 1)
+        left = np.minimum(np.floor(position).astype(np.intp), max(nr_lateral - 2, 0))
+        weight = position - left
+        return left, weight
+
+
+    def execute(self, rf):
+        # channel selection and blanking of the samples before the first recorded echo
+        rf = rf.reshape(rf.shape[0], rf.shape[1], -1)
+        np.take(rf[:self._nr_samples], self._pinmap, axis=1, out=self._signals)
+        self._signals[:self._blank_samples] = 0
+
+        # TGC and band pass filter
+        if self._tgc_waveform is not None:
+            np.multiply(self._signals, self._tgc_waveform, out=self._signals)
+        convolve1d(self._signals, self._filter, axis=0, output=self._filtered, mode='constant',
+                   origin=self._filter_origin)
+
+        # analytic signal
+        spectrum = fft.fft(self._filtered, axis=0, workers=-1)
+        np.multiply(spectrum, self._hilbert, out=spectrum)
+        analytic = self._analytic[:-self._nr_elements * self._nr_angles].reshape(self._signals.shape)
+        analytic[...] = fft.ifft(spectrum, axis=0, overwrite_x=True, workers=-1)
+
+        # delay and sum
+        self._frame.fill(0)
+        for element_idx in range(self._nr_elements):
+            np.take(self._analytic, self._gather_index[element_idx], out=self._gathered)
+            if self._gather_weights is not None:
+                np.multiply(self._gathered, self._gather_weights[element_idx], out=self._gathered)
+            np.sum(self._gathered, axis=2, out=self._channel)
+            np.add(self._frame, self._channel, out=self._frame)
+
+        # envelope and lateral interpolation
+        np.abs(self._frame, out=self._envelope)
+        np.take(self._envelope, self._interp_index, axis=1, out=self._interp_left)
+        np.take(self._envelope, self._interp_index + 1, axis=1, out=self._image)
+        np.subtract(self._image, self._interp_left, out=self._image)
+        np.multiply(self._image, self._interp_weights, out=self._image)
+        np.add(self._image, self._interp_left, out=self._image)
+
+        # log compression (see features.signal.logcompression)
+        if self._spec.dbrange is not None:
+            dbrange = self._spec.dbrange
+            with np.errstate(divide='ignore'):
+                np.log10(self._image, out=self._image)
+            np.multiply(self._image, 20, out=self._image)
+            np.subtract(self._image, np.nanmax(self._image), out=self._image)
+            np.fmax(self._image, -dbrange, out=self._image)
+            np.add(self._image, dbrange, out=self._image)
+            np.multiply(self._image, 255, out=self._image)
+            np.divide(self._image, dbrange, out=self._image)
+            np.rint(self._image, out=self._image)
+
+        return self._image
+
+
+    @property
+    def spec(self):
+        return self._spec
+
+    @property
+    def transducer(self):
+        return self._transducer
+
+    @property
+    def medium(self):
+        return self._medium
+
+    @property
+    def frame(self):
+        # beamformed (complex) frame of the last execute call
+        return self._frame
+
+    @property
+    def imagegrid_mm(self):
+        lateral_m = np.ravel(self._medium.medium[0])
+        axial_m = np.ravel(self._medium.medium[1])
+        lateral_mm = np.linspace(lateral_m[0], lateral_m[-1], self._interp_index.size) * 1000
+        return [lateral_mm, axial_m * 1000]
+
+    @property
+    def nbytes(self):
+        tables = [self._gather_index, self._gather_weights, self._signals, self._filtered, self._analytic,
+                  self._gathered, self._channel, self._frame, self._envelope, self._interp_left, self._image]
+        return int(sum(table.nbytes for table in tables if table is not None))
@@ -0,0 +1,335 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Resource planner:
+# Estimates the arrays (shape, dtype, bytes) that each stage of the plane wave pipeline allocates, the peak
+# working set and (with a calibration) the runtime of a configuration. Only the transducer / medium description
+# is evaluated, no table is built.
+#
+# Stages (numpy backend):    signals -> delay table -> apodization table -> beamformed frames -> lateral interpolation
+# Stages (numba backend):    signals -> beamformed frames -> lateral interpolation       (fused kernel, see das_fused.py)
+#
+# The transient memory of the table stages was measured (tracemalloc) for the implementations in delays.py,
+# apodization.py and das_bf.py:
+#   planewave_delays:           16 bytes per [depth, lateral pixel, td_element] + 16 bytes per table tap
+#   apodization ('rec'):        48 bytes per [depth, lateral pixel, td_element]
+#   RXbeamformer (channels):    zero padded signals + 2.5 x delayed signals of one element + one channel sum
+# with V3 = depth x lateral pixel x td_element and V4 = V3 x nbr of angles.
+#
+# The runtime is estimated from a calibration micro-benchmark (seconds per table tap of each stage on this host).
+# If the peak working set exceeds the memory budget, the planner recommends a depth tile (number of depth rows per
+# region of interest, see medium.py) or the fused backend.
+
+
+import io
+import json
+import contextlib
+import numpy as np
+from datetime import datetime
+
+from dasIT.features.transducer import transducer as dasIT_transducer
+from dasIT.features.medium import medium as dasIT_medium
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization as dasIT_apodization
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.das_fused import NUMBA_AVAILABLE
+
+
+DELAYS_BYTES_PER_V3 = 16
+DELAYS_BYTES_PER_V4 = 16
+APODIZATION_BYTES_PER_V3 = 48
+GATHER_TRANSIENT_FACTOR = 2.5
+
+
+def calibrate(nr_elements=64, nr_angles=3, max_depth_wavelength=60, repeat=3):
+    # Micro-benchmark of all stages on a small configuration
+    # returns the seconds per unit of work: table taps (V4, V3) and gathered taps (V4 x frames)
+    cal_transducer = dasIT_transducer(center_frequency_hz=5e6,
+                                      bandwidth_hz=[3e6, 7e6],
+                                      adc_ratio=4,
+                                      transducer_elements_nr=nr_elements,
+                                      element_pitch_m=3e-4,
+                                      pinmap=np.arange(1, nr_elements + 1),
+                                      focus_number=1.0,
+                                      totalnr_planewaves=nr_angles,
+                                      planewave_angle_interval=[-10, 10],
+                                      speed_of_sound_ms=1540)
+    cal_medium = dasIT_medium(speed_of_sound_ms=1540,
+                              center_frequency=cal_transducer.center_frequency,
+                              sampling_frequency=cal_transducer.sampling_frequency,
+                              max_depth_wavelength=max_depth_wavelength,
+                              lateral_transducer_element_spacing=cal_transducer.lateral_transducer_spacing)
+    angles = cal_transducer.planewave_angles()
+    nr_samples = cal_medium.rx_echo_totalnr_samples
+    signals = np.random.default_rng(0).standard_normal((nr_samples, nr_elements, nr_angles)).astype(np.complex128)
+
+    def best_of(function):
+        timings = []
+        for _ in range(repeat):
+            start_timing = datetime.now()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = function()
+            timings.append((datetime.now() - start_timing).total_seconds())
+        return min(timings), result
+
+    delay_time, delays = best_of(lambda: planewave_delays(medium=cal_medium.medium,
+                                                          sos=1540,
+                                                          fsampling=cal_transducer.sampling_frequency,
+                                                          angles=angles,
+                                                          nsamples=nr_samples))
+    apodization_time, apodization = best_of(lambda: dasIT_apodization(delays=delays.sample_delays,
+                                                                      medium=cal_medium.medium,
+                                                                      transducer=cal_transducer,
+                                                                      apo='rec',
+                                                                      angles=angles).table)
+    gather_time, _ = best_of(lambda: RXbeamformer(signals=signals,
+                                                  delays=delays.sample_delays,
+                                                  apodization=apodization).frame)
+
+    nr_v3 = delays.sample_delays.size // nr_angles
+    calibration = {'delay_table': delay_time / (nr_v3 * nr_angles),
+                   'apodization': apodization_time / nr_v3,
+                   'gather': gather_time / (nr_v3 * nr_angles),
+                   'fused': None}
+
+    if NUMBA_AVAILABLE:
+        from dasIT.src.das_fused import fused_beamformer
+        apodization_aperture = dasIT_apodization(medium=cal_medium.medium, transducer=cal_transducer, apo='rec')
+
+        def fused():
+            return fused_beamformer(signals=signals,
+                                    medium=cal_medium.medium,
+                                    fsampling=cal_transducer.sampling_frequency,
+                                    angles=angles,
+                                    apodization=apodization_aperture,
+                                    backend='numba').frame
+        fused()  # compile
+        fused_time, _ = best_of(fused)
+        calibration['fused'] = fused_time / (nr_v3 * nr_angles)
+
+    return calibration
+
+
+def load_calibration(path):
+    with open(path, 'r') as calibration_file:
+        return json.load(calibration_file)
+
+
+def save_calibration(calibration, path):
+    with open(path, 'w') as calibration_file:
+        json.dump(calibration, calibration_file, indent=2)
+
+
+class resource_planner():
+    def __init__(self,
+                 transducer=None,
+                 medium=None,
+                 angles=None,
+                 frames=1,
+                 signal_dtype=np.complex128,
+                 backend='numpy',
+                 interp_scale=2,
+                 memory_budget=None,
+                 calibration=None):
+
+        self._angles = transducer.planewave_angles() if angles is None else np.ravel(angles)
+        self._nr_angles = np.ravel(self._angles).size
+        self._nr_samples = medium.rx_echo_totalnr_samples
+        self._nr_depth = np.ravel(medium.medium[1]).size
+        self._nr_lateral = np.ravel(medium.medium[0]).size
+        self._nr_elements = transducer.transducer_elements
+        self._nr_frames = int(frames)
+        self._signal_dtype = np.dtype(signal_dtype)
+        self._frame_dtype = np.result_type(self._signal_dtype, np.float64)
+        self._interp_scale = interp_scale
+        self._memory_budget = memory_budget
+        self._calibration = calibration
+
+        if backend not in ('numpy', 'numba'):
+            print(r'ERROR MESSAGE: Selected backend does not exist. Choose either \textit{numpy} or \textit{numba}.')
+        self._backend = backend
+
+        self._stages = self.stage_arrays(self._nr_depth, self._backend)
+        self._peak_bytes = max(stage['peak_bytes'] for stage in self._stages)
+        self._runtime = self.runtime(self._backend)
+        self._recommendation = self.recommend()
+
+
+    @staticmethod
+    def _array(name, shape, dtype):
+        shape = tuple(int(size) for size in shape)
+        return {'array': name, 'shape': shape, 'dtype': np.dtype(dtype).name,
+                'bytes': int(np.prod(shape)) * np.dtype(dtype).itemsize}
+
+
+    def stage_arrays(self, nr_depth, backend):
+        # Arrays allocated by each stage and the working set while the stage runs
+        # (all arrays that are alive + transient memory of the stage)
+        nr_lateral, nr_elements, nr_angles, nr_frames = self._nr_lateral, self._nr_elements, self._nr_angles, self._nr_frames
+        nr_v3 = nr_depth * nr_lateral * nr_elements
+        nr_v4 = nr_v3 * nr_angles
+
+        signals = self._array('signals', (self._nr_samples, nr_elements, nr_angles, nr_frames), self._signal_dtype)
+        frames = self._array('frames', (nr_depth, nr_lateral, nr_frames), self._frame_dtype)
+        interpolated = self._array('interpolated frames', (nr_depth, nr_lateral * self._interp_scale, nr_frames), np.float64)
+
+        stages = [dict(stage='signals', **signals, peak_bytes=signals['bytes'])]
+        live_bytes = signals['bytes']
+
+        if backend == 'numpy':
+            delay_table = self._array('delay table', (nr_depth, nr_lateral, nr_elements, nr_angles),
+                                      planewave_delays.table_dtype(self._nr_samples))
+            stages.append(dict(stage='planewave_delays', **delay_table,
+                               peak_bytes=live_bytes + DELAYS_BYTES_PER_V3 * nr_v3 + DELAYS_BYTES_PER_V4 * nr_v4))
+            live_bytes += delay_table['bytes']
+
+            apodization_table = self._array('apodization table', (nr_depth, nr_lateral, nr_elements, 1), np.int64)
+            stages.append(dict(stage='apodization', **apodization_table,
+                               peak_bytes=live_bytes + APODIZATION_BYTES_PER_V3 * nr_v3))
+            live_bytes += apodization_table['bytes']
+
+            padded_signals_bytes = signals['bytes'] // self._nr_samples * (self._nr_samples + 1)
+            gather_bytes = nr_depth * nr_lateral * nr_angles * nr_frames * self._frame_dtype.itemsize
+            stages.append(dict(stage='RXbeamformer', **frames,
+                               peak_bytes=live_bytes + padded_signals_bytes + 2 * frames['bytes'] +
+                                          int(GATHER_TRANSIENT_FACTOR * gather_bytes)))
+            # tables are released after beamforming
+            live_bytes = signals['bytes'] + frames['bytes']
+        else:
+            stages.append(dict(stage='fused_beamformer', **frames, peak_bytes=live_bytes + frames['bytes']))
+            live_bytes += frames['bytes']
+
+        stages.append(dict(stage='interp_lateral', **interpolated,
+                           peak_bytes=live_bytes + 2 * interpolated['bytes']))
+        return stages
+
+
+    def runtime(self, backend):
+        # Runtime estimate [s] per stage from the calibration (None without calibration)
+        if self._calibration is None:
+            return None
+        nr_v3 = self._nr_depth * self._nr_lateral * self._nr_elements
+        nr_v4 = nr_v3 * self._nr_angles
+        if backend == 'numba':
+            if self._calibration.get('fused') is None:
+                return None
+            return {'fused_beamformer': self._calibration['fused'] * nr_v4 * self._nr_frames}
+        return {'planewave_delays': self._calibration['delay_table'] * nr_v4,
+                'apodization': self._calibration['apodization'] * nr_v3,
+                'RXbeamformer': self._calibration['gather'] * nr_v4 * self._nr_frames}
+
+
+    def depth_tile(self, budget, backend):
+        # Largest number of depth rows per tile whose working set fits into the budget (0 if none fits).
+        # The working set grows linearly with the depth rows of a tile.
+        fixed_bytes = max(stage['peak_bytes'] for stage in self.stage_arrays(0, backend))
+        per_row_bytes = (max(stage['peak_bytes'] for stage in self.stage_arrays(self._nr_depth, backend)) - fixed_bytes) / self._nr_depth
+        if budget <= fixed_bytes:
+            return 0
+        return int(min((budget - fixed_bytes) // max(per_row_bytes, 1), self._nr_depth))
+
+
+    def recommend(self):
+        # backend: the fused kernel avoids all tables (numba), otherwise the calibrated faster backend
+        numpy_runtime = self.runtime('numpy')
+        numba_runtime = self.runtime('numba')
+        backend = 'numpy'
+        if NUMBA_AVAILABLE:
+            backend = 'numba'
+            if numpy_runtime is not None and numba_runtime is not None and \
+                    sum(numpy_runtime.values()) < sum(numba_runtime.values()):
+                backend = 'numpy'
+
+        if self._memory_budget is None:
+            return {'backend': backend, 'depth_tile': self._nr_depth, 'fits': None}
+
+        for candidate in (backend, 'numba' if backend == 'numpy' else 'numpy'):
+            if candidate == 'numba' and not NUMBA_AVAILABLE:
+                continue
+            depth_tile = self.depth_tile(self._memory_budget, candidate)
+            if depth_tile > 0:
+                return {'backend': candidate, 'depth_tile': depth_tile, 'fits': True}
+        return {'backend': backend, 'depth_tile': 0, 'fits': False}
+
+
+    def to_dict(self):
+        return {'configuration': {'samples': self._nr_samples,
+                                  'depth': self._nr_depth,
+                                  'lateral': self._nr_lateral,
+                                  'elements': self._nr_elements,
+                                  'angles': self._nr_angles,
+                                  'frames': self._nr_frames,
+                                  'backend': self._backend},
+                'stages': [dict(stage, shape=list(stage['shape'])) for stage in self._stages],
+                'peak_bytes': self._peak_bytes,
+                'runtime_s': self._runtime,
+                'memory_budget': self._memory_budget,
+                'recommendation': self._recommendation}
+
+
+    def report(self):
+        lines = [f"{'stage':<18}{'array':<22}{'shape':<28}{'dtype':<12}{'size':>12}{'working set':>14}"]
+        for stage in self._stages:
+            lines.append(f"{stage['stage']:<18}{stage['array']:<22}{str(stage['shape']):<28}{stage['dtype']:<12}"
+                         f"{format_bytes(stage['bytes']):>12}{format_bytes(stage['peak_bytes']):>14}")
+        lines.append(f'Peak working set: {format_bytes(self._peak_bytes)}')
+        if self._runtime is not None:
+            lines.append('Estimated runtime: ' + ', '.join(f'{stage} {seconds:.3f} [s]' for stage, seconds in self._runtime.items()))
+        recommendation = self._recommendation
+        if recommendation['fits'] is False:
+            lines.append(f'Recommendation: configuration does not fit into {format_bytes(self._memory_budget)}')
+        else:
+            lines.append(f"Recommendation: backend {recommendation['backend']}, depth tile {recommendation['depth_tile']} "
+                         f"of {self._nr_depth} rows")
+        return '\n'.join(lines)
+
+
+    @property
+    def stages(self):
+        return self._stages
+
+    @property
+    def peak_bytes(self):
+        return self._peak_bytes
+
+    @property
+    def runtime_s(self):
+        return self._runtime
+
+    @property
+    def recommendation(self):
+        return self._recommendation
+
+
+def format_bytes(nbytes):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(nbytes) < 1024:
+            return f'{nbytes:.1f} {unit}'
+        nbytes /= 1024
+    return f'{nbytes:.1f} TiB'
+
+
+def parse_bytes(size):
+    # '512M', '8G', '1.5GiB' or a plain number of bytes
+    size = str(size).strip().upper().replace('IB', '').rstrip('B')
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(float(size))
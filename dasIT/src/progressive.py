@@ -0,0 +1,143 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Progressive (coarse-to-fine) beamforming:
+# For interactive review a first image is returned after beamforming only a decimated pixel grid with a
+# subset of the plane wave angles (first angle group, by default the centre angle) and optionally a subset of
+# the elements (every element_stride-th element). Further passes refine the image by
+#   1. adding the remaining elements to the pixels of the decimated grid (element_stride > 1),
+#   2. beamforming the pixels of the next finer grid that have not been computed yet, and
+#   3. compounding the remaining angle groups (by default all other angles in one pass),
+# all accumulated into the same output buffer. After the last pass the frame contains every pixel
+# compounded over all elements and angles, i.e. the same image as RXbeamformer (up to the floating point
+# summation order).
+#
+# Preview frames fill pixels that have not been beamformed yet with their nearest computed neighbour
+# on the current (coarse) grid.
+#
+# shape signals: [samples, td_element, nbr of angles]
+# shape delays / apodization: [depth, lateral pixel, td_element, nbr of angles] (see delays.py / apodization.py)
+
+
+import numpy as np
+
+from dasIT.src.das_bf import zero_pad_samples
+
+class progressive_beamformer():
+    def __init__(self, signals=None, delays=None, apodization=None, strides=(4, 2, 1), angle_groups=None,
+                 element_stride=1, nsamples=None):
+        self._signals = zero_pad_samples(signals.reshape(signals.shape[0], signals.shape[1], -1), delays, nsamples)
+        self._delays = delays
+        self._apodization = apodization
+        self._strides = tuple(sorted(set(strides) | {1}, reverse=True))
+
+        nr_elements, nr_angles = self._delays.shape[2:]
+        # elements of the first preview and the elements added in the second pass
+        self._elements = np.arange(nr_elements)
+        self._preview_elements = self._elements[::max(int(element_stride), 1)]
+        self._remaining_elements = np.setdiff1d(self._elements, self._preview_elements)
+
+        if angle_groups is None:
+            center_angle = nr_angles // 2
+            angle_groups = [[center_angle], np.delete(np.arange(nr_angles), center_angle)]
+        angle_groups = [group for group in angle_groups if np.size(group) > 0]
+        self._angle_groups = [np.ravel(group).astype(int) for group in angle_groups]
+        if np.sort(np.concatenate(self._angle_groups)).tolist() != list(range(nr_angles)):
+            print('ERROR MESSAGE: Angle groups have to cover every plane wave angle exactly once.')
+
+        self._frame = np.zeros(self._delays.shape[:2], dtype=np.result_type(self._signals.dtype, np.float64))
+        self._computed = np.zeros(self._delays.shape[:2], dtype=bool)
+        self._compounded_groups = 1
+        self._passes = 0
+
+
+    def _beamform_pixels(self, axial_idx, lateral_idx, angles, elements=None):
+        # Delay and sum for a set of pixels, elements and angles
+        # shape delays: [pixel, td_element, angles]
+        elements = self._elements if elements is None else elements
+        pixel_selector = (axial_idx.reshape(-1, 1, 1), lateral_idx.reshape(-1, 1, 1))
+        element_selector = elements.reshape(1, -1, 1)
+        angle_selector = angles.reshape(1, 1, -1)
+        delays = self._delays[pixel_selector + (element_selector, angle_selector)]
+
+        delayed_signals = self._signals[delays, element_selector, angle_selector]
+        if self._apodization is not None:
+            apodization_angles = angle_selector if self._apodization.shape[3] > 1 else 0
+            apodization = self._apodization[pixel_selector + (element_selector, apodization_angles)]
+            delayed_signals = delayed_signals * apodization
+
+        return np.sum(delayed_signals, axis=(1, 2))
+
+
+    def _preview(self, stride):
+        # fill the pixels that have not been computed with the nearest pixel of the current grid
+        if stride == 1:
+            return self._frame.copy()
+        coarse = self._frame[::stride, ::stride]
+        preview = np.repeat(np.repeat(coarse, stride, axis=0), stride, axis=1)
+        return preview[:self._frame.shape[0], :self._frame.shape[1]]
+
+
+    def refine(self):
+        # Generator: yields a preview after each pass
+        # 1. coarse-to-fine pixel grids with the first angle group, the coarsest grid first with the element subset
+        first_group = self._angle_groups[0]
+        for stride_idx, stride in enumerate(self._strides):
+            grid = np.zeros_like(self._computed)
+            grid[::stride, ::stride] = True
+            axial_idx, lateral_idx = np.nonzero(grid & ~self._computed)
+
+            if stride_idx == 0 and self._remaining_elements.size:
+                self._frame[axial_idx, lateral_idx] = self._beamform_pixels(axial_idx, lateral_idx, first_group,
+                                                                            self._preview_elements)
+                self._passes += 1
+                yield self._preview(stride)
+                self._frame[axial_idx, lateral_idx] += self._beamform_pixels(axial_idx, lateral_idx, first_group,
+                                                                             self._remaining_elements)
+            else:
+                self._frame[axial_idx, lateral_idx] = self._beamform_pixels(axial_idx, lateral_idx, first_group)
+            self._computed[axial_idx, lateral_idx] = True
+            self._passes += 1
+            yield self._preview(stride)
+
+        # 2. compound the remaining angle groups on the full grid
+        axial_idx, lateral_idx = np.nonzero(self._computed)
+        while self._compounded_groups < len(self._angle_groups):
+            angles = self._angle_groups[self._compounded_groups]
+            self._frame[axial_idx, lateral_idx] += self._beamform_pixels(axial_idx, lateral_idx, angles)
+            self._compounded_groups += 1
+            self._passes += 1
+            yield self._preview(1)
+
+
+    def run(self):
+        # Run all remaining passes and return the final frame
+        for _ in self.refine():
+            pass
+        return self._frame
+
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def passes(self):
+        return self._passes
@@ -0,0 +1,186 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Row-column addressed (RCA) volumetric plane wave beamforming:
+# Plane waves are transmitted on the row elements (steered in the elevation y-z plane) and received on the
+# column elements (arranged along the lateral x axis, each column integrates along y). The two-way travel
+# distance of a voxel (x, y, z) for angle alpha and column x_c separates into a transmit and a receive part:
+#
+# path = tx(z, y, alpha) + rx(z, x, x_c)
+# tx = z * cos(alpha) + y * sin(alpha)              (plane wave of the rows)
+# rx = sqrt(z^2 + (x - x_c)^2)                      (column element, independent of y)
+#
+# Only the transmit distances are stored (float32):
+# shape transmit distances: [depth, elevation pixel, nbr of angles]
+# The receive distances of a column [depth, lateral pixel] are computed when the column is beamformed, they
+# cost depth x lateral pixels per column and batch of slices against depth x lateral pixels x slices x angles for
+# the gather. The table memory is therefore depth x elevation pixels x angles (plus the element coordinates),
+# i.e. it grows with (rows + columns) x depth instead of depth x lateral x elevation pixels x columns x angles for
+# a dense table. The plane wave transmit does not depend on the individual rows.
+# Sample delays are formed on the fly for a batch of elevation slices and one column at a time:
+#
+# delays_sample = rint((tx + rx) / sos * fsampling)  (single precision, as in planewave_delays.delays_by_sample)
+#
+# The receive aperture is limited by the f-number of the transducer (|x - x_c| <= z / (2 * F)), the mask of a
+# column is formed together with its receive distances.
+#
+# The volume is beamformed slice by slice (x-z slices along the elevation axis). With a sink (frame_writer from
+# dasIT.data.writer with frame_shape=(depth, lateral pixel) and nr_frames=elevation pixel) every batch of slices
+# is written as soon as it is beamformed and the volume is never held in memory. An interrupted job is resumed
+# at sink.next_frame.
+#
+# shape signals: [samples, columns, nbr of angles] (RF or analytic)
+# shape volume: [depth, lateral pixel, elevation pixel]
+
+
+import numpy as np
+
+from dasIT.src.delays import planewave_delays
+from dasIT.src.das_bf import zero_pad_samples
+
+class rowcolumn_delays():
+    def __init__(self,
+                 volume=None,
+                 sos=1540,
+                 fsampling=1,
+                 angles=0,
+                 columns=None,
+                 fnumber=None,
+                 nsamples=None):
+
+        self._lateral = np.ravel(volume[0]).astype(np.float32)
+        self._elevation = np.ravel(volume[1]).astype(np.float32)
+        self._axial = np.ravel(volume[2]).astype(np.float32)
+        self._speed_of_sound = float(sos)
+        self._sampling_frequency = fsampling
+        self._angles = np.ravel(np.asarray(angles, dtype=np.float64))
+        self._columns = np.ravel(columns).astype(np.float32)
+        self._fnumber = fnumber
+        self._nr_samples = nsamples
+
+        self._tx_distances = self.transmit_distances()
+
+
+    def transmit_distances(self):
+        # shape [depth, elevation pixel, nbr of angles]
+        cos_angles = np.cos(self._angles).astype(np.float32).reshape(1, 1, -1)
+        sin_angles = np.sin(self._angles).astype(np.float32).reshape(1, 1, -1)
+        return self._axial.reshape(-1, 1, 1) * cos_angles + self._elevation.reshape(1, -1, 1) * sin_angles
+
+
+    def receive_distances(self, column):
+        # shape [depth, lateral pixel]
+        lateral_offset = self._lateral.reshape(1, -1) - self._columns[column]
+        return np.sqrt(self._axial.reshape(-1, 1) ** 2 + lateral_offset ** 2)
+
+
+    def receive_aperture(self, column):
+        # shape [depth, lateral pixel] (None without f-number)
+        if self._fnumber is None:
+            return None
+        lateral_offset = np.abs(self._lateral.reshape(1, -1) - self._columns[column])
+        return lateral_offset <= self._axial.reshape(-1, 1) / (2 * self._fnumber)
+
+
+    def slice_delays(self, slices, column):
+        # sample delays of the elevation slices for one column
+        # shape [depth, lateral pixel, elevation slices, nbr of angles]
+        path = self._tx_distances[:, np.newaxis, slices, :] + self.receive_distances(column)[:, :, np.newaxis, np.newaxis]
+        delays_sample = np.rint(np.multiply(path / np.float32(self._speed_of_sound), np.float32(self._sampling_frequency)))
+        delays_sample[(delays_sample < 0) | (delays_sample >= self._nr_samples)] = self._nr_samples
+        return delays_sample.astype(planewave_delays.table_dtype(self._nr_samples))
+
+
+    @property
+    def transmit(self):
+        return self._tx_distances
+
+    @property
+    def fnumber(self):
+        return self._fnumber
+
+    @property
+    def nsamples(self):
+        return self._nr_samples
+
+    @property
+    def volume_shape(self):
+        return (self._axial.size, self._lateral.size, self._elevation.size)
+
+    @property
+    def nbytes(self):
+        return self._tx_distances.nbytes + self._lateral.nbytes + self._elevation.nbytes + self._axial.nbytes + \
+               self._columns.nbytes
+
+
+class rowcolumn_beamformer():
+    def __init__(self,
+                 signals=None,
+                 delays=None,
+                 slice_batch=8,
+                 sink=None):
+
+        self._signals = signals.reshape(signals.shape[0], signals.shape[1], -1)
+        self._delays = delays
+        self._slice_batch = int(slice_batch)
+        self._sink = sink
+
+        # sentinel delays (= nsamples) read the appended zero sample, signals longer than nsamples are cropped
+        self._signals_padded = zero_pad_samples(self._signals, None, self._delays.nsamples)
+
+        self._volume = self.beamform()
+
+
+    def beamform_slices(self, slices):
+        # shape [depth, lateral pixel, elevation slices]
+        nr_depth, nr_lateral, _ = self._delays.volume_shape
+        nr_angles = self._signals.shape[2]
+        angle_selector = np.arange(nr_angles)
+
+        block = np.zeros((nr_depth, nr_lateral, slices.stop - slices.start),
+                         dtype=np.result_type(self._signals.dtype, np.float64))
+        for column in range(self._signals.shape[1]):
+            delays_sample = self._delays.slice_delays(slices, column)
+            delayed_signals = np.sum(self._signals_padded[delays_sample, column, angle_selector], axis=3)
+            aperture = self._delays.receive_aperture(column)
+            if aperture is not None:
+                delayed_signals *= aperture[:, :, np.newaxis]
+            block += delayed_signals
+        return block
+
+
+    def beamform(self):
+        nr_slices = self._delays.volume_shape[2]
+        if self._sink is None:
+            volume = np.zeros(self._delays.volume_shape, dtype=np.result_type(self._signals.dtype, np.float64))
+            for slice_start in range(0, nr_slices, self._slice_batch):
+                slices = slice(slice_start, min(slice_start + self._slice_batch, nr_slices))
+                volume[:, :, slices] = self.beamform_slices(slices)
+            return volume
+
+        for slice_start in range(self._sink.next_frame, nr_slices, self._slice_batch):
+            slices = slice(slice_start, min(slice_start + self._slice_batch, nr_slices))
+            self._sink.write(self.beamform_slices(slices), start=slice_start)
+        return self._sink.dataset
+
+
+    @property
+    def volume(self):
+        return self._volume
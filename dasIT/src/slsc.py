@@ -0,0 +1,109 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Short-lag spatial coherence (SLSC) beamformer:
+# Instead of summing the delayed channel signals (delay-and-sum), SLSC images the spatial coherence of the
+# backscattered wavefield across the receive aperture. For every pixel the normalized correlation of element
+# pairs with lag m is averaged over the aperture and summed over the short lags 1 ... M:
+#
+# R(m) = 1 / (N - m) * sum_i Re(sum_k s_i(k) s*_{i+m}(k)) / sqrt(sum_k |s_i(k)|^2 * sum_k |s_{i+m}(k)|^2)
+# SLSC = sum_{m=1}^{M} R(m)
+#
+# s_i(k): delayed (and angle compounded) signal of element i at depth pixel k of an axial kernel around the pixel,
+# N - m: number of element pairs with lag m that are both inside the (apodization) aperture.
+#
+# Adapted from:
+# [1] M. A. Lediju, G. E. Trahey, B. C. Byram and J. J. Dahl, Short-lag spatial coherence of backscattered echoes:
+# imaging characteristics, IEEE Transactions on Ultrasonics, Ferroelectrics, and Frequency Control, vol. 58, 7,
+# pp. 1377-1388, 2011. doi: https://doi.org/10.1109/TUFFC.2011.1957
+#
+# The delayed channel data is gathered with the delay and apodization tables (see delays.py, apodization.py) for a
+# tile of depth rows at a time. The axial kernel sums of all lag products are read from cumulative sums along the
+# depth axis, and only the lags 1 ... M are evaluated: the cost per pixel is O(M * N) instead of O(N^2).
+#
+# shape signals: [samples, td_element, nbr of angles] (analytic signal)
+# shape frame: [depth, lateral pixel]
+
+
+import numpy as np
+
+from dasIT.src.das_bf import zero_pad_samples, delayed_channels
+
+class slsc_beamformer():
+    def __init__(self, signals=None, delays=None, apodization=None, max_lag=10, kernel=5, depth_tile=64,
+                 nsamples=None):
+        self._signals = zero_pad_samples(signals.reshape(signals.shape[0], signals.shape[1], -1), delays, nsamples)
+        self._delays = delays
+        self._apodization = apodization
+        self._max_lag = int(max_lag)
+        # axial kernel length [depth pixels] (odd, centered on the pixel)
+        self._kernel_half = int(kernel) // 2
+        self._depth_tile = int(depth_tile)
+
+        if self._max_lag >= delays.shape[2]:
+            print(r'ERROR MESSAGE: Maximum lag exceeds the number of elements. Choose a smaller \textit{max_lag}.')
+
+        self._lag_coherence = self.beamform()
+        self._frame = np.sum(self._lag_coherence, axis=2)
+
+
+    def _axial_kernel_sum(self, values, rows):
+        # Sum over the axial kernel (truncated at the tile borders) around the given rows via cumulative sums
+        cumulative = np.concatenate((np.zeros((1,) + values.shape[1:], dtype=values.dtype), np.cumsum(values, axis=0)))
+        low = np.maximum(rows - self._kernel_half, 0)
+        high = np.minimum(rows + self._kernel_half + 1, values.shape[0])
+        return cumulative[high] - cumulative[low]
+
+
+    def beamform(self):
+        nr_depth, nr_lateral, nr_elements, _ = self._delays.shape
+        lag_coherence = np.zeros((nr_depth, nr_lateral, self._max_lag))
+
+        for depth_start in range(0, nr_depth, self._depth_tile):
+            depth_stop = min(depth_start + self._depth_tile, nr_depth)
+            # halo of half a kernel on both sides of the tile
+            halo_start = max(depth_start - self._kernel_half, 0)
+            halo_stop = min(depth_stop + self._kernel_half, nr_depth)
+            channels = delayed_channels(self._signals, self._delays, self._apodization, halo_start, halo_stop)
+            rows = np.arange(depth_start, depth_stop) - halo_start
+
+            energy = self._axial_kernel_sum(np.abs(channels) ** 2, rows)
+            active = energy > 0
+            for lag in range(1, self._max_lag + 1):
+                products = np.real(channels[:, :, :-lag] * np.conj(channels[:, :, lag:]))
+                correlation = self._axial_kernel_sum(products, rows)
+                normalization = np.sqrt(energy[:, :, :-lag] * energy[:, :, lag:])
+                valid = active[:, :, :-lag] & active[:, :, lag:]
+                normalized = np.divide(correlation, normalization, out=np.zeros_like(correlation), where=valid)
+                nr_pairs = np.sum(valid, axis=2)
+                lag_coherence[depth_start:depth_stop, :, lag - 1] = np.divide(np.sum(normalized, axis=2), nr_pairs,
+                                                                              out=np.zeros(nr_pairs.shape),
+                                                                              where=nr_pairs > 0)
+        return lag_coherence
+
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def lag_coherence(self):
+        # spatial coherence R(m) for the lags 1 ... M, shape [depth, lateral pixel, lags]
+        return self._lag_coherence
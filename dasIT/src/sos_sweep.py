@@ -0,0 +1,158 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Speed of sound sweep and autofocus:
+# The two-way travel distances between pixels and elements only depend on the geometry. They are computed
+# once (planewave_delays with keep_path_length=True) and converted into sample delays for a whole vector of
+# candidate speeds of sound at once:
+#
+# delays_sample = rint(path_length / sos_candidate * fsampling)
+# shape [candidates, depth, lateral pixel, td_element, nbr of angles]
+#
+# One frame (or a region of interest, see medium.py) is beamformed for all candidates in batched gathers.
+# By default the candidates are processed in batches whose gathered signals stay within max_bytes.
+# A focus metric selects the best speed of sound:
+#   'coherence': coherence factor CF = |sum(s)|^2 / (N * sum(|s|^2)), averaged over the image weighted by
+#                the pixel intensity (bright structures and not the background determine the focus)
+#   'sharpness': normalized second moment of the intensity image I = |frame|^2: sum(I^2) * N_px / sum(I)^2
+#
+# shape signals: [samples, td_element, nbr of angles]
+# shape frames: [depth, lateral pixel, candidates]
+
+
+import numpy as np
+
+from dasIT.src.delays import planewave_delays
+
+class sos_autofocus():
+    def __init__(self,
+                 signals=None,
+                 medium=None,
+                 sos=None,
+                 fsampling=1,
+                 angles=0,
+                 elements=None,
+                 apodization=None,
+                 metric='coherence',
+                 batch=None,
+                 max_bytes=512 * 1024 ** 2):
+
+        self._signals = signals.reshape(signals.shape[0], signals.shape[1], -1)
+        self._nr_samples = self._signals.shape[0]
+        self._sos_candidates = np.ravel(np.asarray(sos, dtype=np.float64))
+        self._sampling_frequency = fsampling
+        self._apodization = apodization
+        self._metric = metric
+
+        if self._metric not in ('coherence', 'sharpness'):
+            print(r'ERROR MESSAGE: Selected focus metric does not exist. Choose either \textit{coherence} or \textit{sharpness}.')
+
+        # geometry (path lengths only) is evaluated once for all candidates
+        self._geometry = planewave_delays(medium=medium,
+                                          sos=self._sos_candidates[0],
+                                          fsampling=fsampling,
+                                          angles=angles,
+                                          elements=elements,
+                                          nsamples=self._nr_samples,
+                                          keep_path_length=True,
+                                          sample_table=False)
+        self._batch = self.candidate_batch(max_bytes) if batch is None else int(batch)
+
+        self._frames, self._focus = self.sweep()
+        self._best_idx = int(np.nanargmax(self._focus))
+
+
+    def candidate_batch(self, max_bytes):
+        # number of candidates per batch so that the gathered signals (plus the sample delays) of a batch stay
+        # within max_bytes
+        candidate_nbytes = self._geometry.path_lengths.size * \
+                           (np.result_type(self._signals.dtype, np.complex64).itemsize + np.dtype(np.int32).itemsize)
+        return int(np.clip(max_bytes // candidate_nbytes, 1, self._sos_candidates.size))
+
+
+    def _candidate_delays(self, sos):
+        # shape [candidates, depth, lateral pixel, td_element, nbr of angles]
+        # Single precision conversion, identical to planewave_delays.delays_by_sample for each candidate
+        sos = sos.astype(np.float32).reshape(-1, 1, 1, 1, 1)
+        delays_time = self._geometry.path_lengths[np.newaxis] / sos
+        delays_sample = np.rint(np.multiply(delays_time, np.float32(self._sampling_frequency)))
+        delays_sample[(delays_sample < 0) | (delays_sample >= self._nr_samples)] = self._nr_samples
+        return delays_sample.astype(planewave_delays.table_dtype(self._nr_samples))
+
+
+    def _focus_metric(self, delayed_signals, frames):
+        # delayed_signals shape: [candidates, depth, lateral pixel, td_element, nbr of angles]
+        # frames shape: [candidates, depth, lateral pixel]
+        if self._metric == 'coherence':
+            incoherent_energy = np.sum(np.abs(delayed_signals) ** 2, axis=(3, 4))
+            if self._apodization is not None:
+                nr_channels = np.sum(np.broadcast_to(self._apodization, delayed_signals.shape[1:]) != 0, axis=(2, 3))
+            else:
+                nr_channels = np.prod(delayed_signals.shape[3:])
+            intensity = np.abs(frames) ** 2
+            with np.errstate(invalid='ignore', divide='ignore'):
+                coherence_factor = np.nan_to_num(intensity / (nr_channels * incoherent_energy))
+            return np.sum(coherence_factor * intensity, axis=(1, 2)) / np.sum(intensity, axis=(1, 2))
+
+        intensity = np.abs(frames) ** 2
+        nr_pixels = intensity.shape[1] * intensity.shape[2]
+        return np.sum(intensity ** 2, axis=(1, 2)) * nr_pixels / np.sum(intensity, axis=(1, 2)) ** 2
+
+
+    def sweep(self):
+        signals = np.pad(self._signals, ((0, 1), (0, 0), (0, 0)), mode='constant', constant_values=0)
+        table_shape = self._geometry.path_lengths.shape
+        _, _, _, tdelement_selector, angle_selector = np.ogrid[:0, :0, :0, :table_shape[2], :table_shape[3]]
+
+        frames = []
+        focus = []
+        for batch_start in range(0, self._sos_candidates.size, self._batch):
+            sos = self._sos_candidates[batch_start:batch_start + self._batch]
+
+            delayed_signals = signals[self._candidate_delays(sos), tdelement_selector, angle_selector]
+            if self._apodization is not None:
+                delayed_signals = delayed_signals * self._apodization[np.newaxis]
+            frames_batch = np.sum(delayed_signals, axis=(3, 4))
+
+            focus.append(self._focus_metric(delayed_signals, frames_batch))
+            frames.append(frames_batch)
+
+        return np.moveaxis(np.concatenate(frames, axis=0), 0, -1), np.concatenate(focus)
+
+
+    @property
+    def sos_candidates(self):
+        return self._sos_candidates
+
+    @property
+    def frames(self):
+        return self._frames
+
+    @property
+    def focus(self):
+        return self._focus
+
+    @property
+    def best_sos(self):
+        return self._sos_candidates[self._best_idx]
+
+    @property
+    def frame(self):
+        return self._frames[:, :, self._best_idx]
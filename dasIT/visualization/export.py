@@ -0,0 +1,154 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Headless image export:
+# Writes B-mode frames directly from arrays without creating any matplotlib figure. Intended for batch jobs
+# with thousands of (ultrafast) frames where rendering through plot_signal_grid is far too slow.
+#
+# shape frames: [depth, lateral, frames] (uint8 B-mode, e.g. from to_uint8)
+# imagegrid_mm: [lateral axis vector, axial axis vector] in [mm] (see interp_lateral.imagegrid_mm)
+#
+# Each image carries its axis and scale metadata: the pixel spacing is stored as resolution (dpi) and the
+# axis extents are embedded as a JSON text chunk (PNG) or image description (TIFF). Cine files are written
+# to HDF5 with the axis vectors as datasets.
+
+
+import os
+import json
+import numpy as np
+import h5py
+from concurrent.futures import ThreadPoolExecutor
+
+from dasIT.features.signal import logcompression
+
+try:
+    from PIL import Image, PngImagePlugin
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+def to_uint8(signals, dbrange=50, compression=True):
+    # Convert beamformed (envelope) data to 8-bit B-mode images
+    if compression:
+        signals = logcompression(signals, dbrange)
+    return np.clip(np.rint(signals), 0, 255).astype(np.uint8)
+
+
+def _grid_metadata(imagegrid_mm, frame_idx=None):
+    if imagegrid_mm is None:
+        return {}
+
+    lateral_mm = np.ravel(imagegrid_mm[0])
+    axial_mm = np.ravel(imagegrid_mm[1])
+    metadata = {'lateral_mm': [float(lateral_mm[0]), float(lateral_mm[-1])],
+                'axial_mm': [float(axial_mm[0]), float(axial_mm[-1])],
+                'spacing_mm': [float(np.mean(np.diff(lateral_mm))) if lateral_mm.size > 1 else 0.0,
+                               float(np.mean(np.diff(axial_mm))) if axial_mm.size > 1 else 0.0]}
+    if frame_idx is not None:
+        metadata['frame'] = int(frame_idx)
+    return metadata
+
+
+def _write_image(image, file_path, fmt, metadata):
+    img = Image.fromarray(image)
+    save_kwargs = {}
+
+    # pixel spacing [mm] -> resolution [dots per inch]
+    if metadata and all(spacing > 0 for spacing in metadata['spacing_mm']):
+        save_kwargs['dpi'] = tuple(25.4 / spacing for spacing in metadata['spacing_mm'])
+
+    if fmt == 'png':
+        pnginfo = PngImagePlugin.PngInfo()
+        pnginfo.add_text('dasIT', json.dumps(metadata))
+        img.save(file_path, format='PNG', pnginfo=pnginfo, compress_level=1, **save_kwargs)
+    else:
+        img.save(file_path, format='TIFF', description=json.dumps(metadata), **save_kwargs)
+
+    return file_path
+
+
+def export_frames(frames=None,
+                  imagegrid_mm=None,
+                  path=None,
+                  fmt='png',
+                  prefix='frame',
+                  start_index=0,
+                  workers=None):
+    # Write a numbered image stack (prefix_00000.png, ...) from a uint8 frame cube.
+    # Images are encoded in a thread pool (zlib / tiff encoding releases the GIL).
+    if not PIL_AVAILABLE:
+        print('ERROR MESSAGE: Image export requires Pillow (pip install pillow).')
+        return []
+
+    fmt = fmt.lower()
+    if fmt not in ('png', 'tiff'):
+        print(r'ERROR MESSAGE: Selected export format does not exist. Choose either \textit{png} or \textit{tiff}.')
+        return []
+
+    frames = np.asarray(frames)
+    if frames.ndim == 2:
+        frames = frames[:, :, np.newaxis]
+    if frames.dtype != np.uint8:
+        frames = to_uint8(frames, compression=False)
+
+    os.makedirs(path, exist_ok=True)
+    extension = 'png' if fmt == 'png' else 'tif'
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(_write_image,
+                            np.ascontiguousarray(frames[:, :, idx]),
+                            os.path.join(path, f'{prefix}_{start_index + idx:05}.{extension}'),
+                            fmt,
+                            _grid_metadata(imagegrid_mm, start_index + idx))
+                for idx in range(frames.shape[2])]
+        file_paths = [job.result() for job in jobs]
+
+    return file_paths
+
+
+def export_cine(frames=None,
+                imagegrid_mm=None,
+                path=None,
+                frame_rate=None,
+                compression='gzip'):
+    # Write a uint8 frame cube as a cine into a single HDF5 file
+    # shape cine dataset: [frames, depth, lateral] (one chunk per frame)
+    frames = np.asarray(frames)
+    if frames.ndim == 2:
+        frames = frames[:, :, np.newaxis]
+    if frames.dtype != np.uint8:
+        frames = to_uint8(frames, compression=False)
+
+    cine = np.moveaxis(frames, -1, 0)
+    with h5py.File(path, 'w') as file:
+        dataset = file.create_dataset('cine',
+                                      data=cine,
+                                      chunks=(1,) + cine.shape[1:],
+                                      compression=compression)
+        for key, value in _grid_metadata(imagegrid_mm).items():
+            dataset.attrs[key] = value
+        if imagegrid_mm is not None:
+            file.create_dataset('lateral_mm', data=np.ravel(imagegrid_mm[0]))
+            file.create_dataset('axial_mm', data=np.ravel(imagegrid_mm[1]))
+        if frame_rate is not None:
+            dataset.attrs['frame_rate_hz'] = frame_rate
+
+    return path
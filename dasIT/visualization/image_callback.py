@@ -26,7 +26,7 @@ from matplotlib import pyplot as plt
 from dasIT.features.signal import logcompression, envelope
 
 
-def plot_signal_image(signal, compression=True, dbrange=1, path=None):
+def plot_signal_image(signal, compression=True, dbrange=1, path=None, filename='plot1.png'):
     if compression:
         signal = logcompression(signal, dbrange)
 
@@ -47,7 +47,7 @@ def plot_signal_image(signal, compression=True, dbrange=1, path=None):
     plt.show()
 
     if path:
-        fig.savefig(os.path.join(path, 'plot1.png'), dpi=300)
+        fig.savefig(os.path.join(path, filename), dpi=300)
 
 
 def plot_signal_grid(signals=None,
@@ -55,13 +55,14 @@ def plot_signal_grid(signals=None,
                      axial_clip=None,
                      compression=True,
                      dbrange=50,
-                     path=None):
+                     path=None,
+                     filename='plot2.png'):
 
     m2mm_conversion = 1000
 
     if axial_clip:
         # convert to mm
-        axial_clip = np.array(axial_clip, dtype=np.float)
+        axial_clip = np.array(axial_clip, dtype=float)
         axial_clip[np.isnan(axial_clip)] = 0
         axial_clip *= m2mm_conversion
 
@@ -71,7 +72,7 @@ def plot_signal_grid(signals=None,
             cutoff_pzt[1] = cutoff_pzt[0] * 1.5
 
         # calculate the number of samples to clip off
-        axial_clip = np.ceil(cutoff_pzt * axis_vectors_xz[1].size).astype(np.int)
+        axial_clip = np.ceil(cutoff_pzt * axis_vectors_xz[1].size).astype(int)
 
         # clip
         axis_vectors_xz[1] = axis_vectors_xz[1][axial_clip[0]:-axial_clip[1]]
@@ -107,7 +108,7 @@ def plot_signal_grid(signals=None,
     plt.show()
 
     if path:
-        fig.savefig(os.path.join(path, 'plot2.png'), dpi=300)
+        fig.savefig(os.path.join(path, filename), dpi=300)
 
 def extents(f):
     delta = f[1] - f[0]
@@ -8,5 +8,9 @@ setup(
     license='Apache License 2.0',
     author='Christoph Leitner',
     author_email='christoph.leitner@tugraz.at',
-    description='plane-wave delay-and-sum beamformer'
+    description='plane-wave delay-and-sum beamformer',
+    extras_require={
+        'numba': ['numba'],
+        'export': ['pillow'],
+    }
 )
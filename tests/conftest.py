@@ -0,0 +1,76 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Shared synthetic plane wave acquisition: small linear array, three compounded angles and two point scatterers.
+# The record is a quarter shorter than the medium depth so that the delay table holds sentinel taps.
+
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.src.delays import planewave_delays
+from dasIT.data.synthetic import point_scatterer_rf
+
+
+SOS = 1540
+
+
+@pytest.fixture(scope='session')
+def planewave_setup():
+    dasIT_transducer = transducer(center_frequency_hz=5e6,
+                                  bandwidth_hz=[3e6, 7e6],
+                                  adc_ratio=4,
+                                  transducer_elements_nr=32,
+                                  element_pitch_m=3e-4,
+                                  pinmap=np.arange(1, 33),
+                                  focus_number=1.0,
+                                  totalnr_planewaves=3,
+                                  planewave_angle_interval=[-5, 5],
+                                  speed_of_sound_ms=SOS)
+    dasIT_medium = medium(speed_of_sound_ms=SOS,
+                          center_frequency=dasIT_transducer.center_frequency,
+                          sampling_frequency=dasIT_transducer.sampling_frequency,
+                          max_depth_wavelength=40,
+                          lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing)
+    angles = np.radians(np.array([-5.0, 0.0, 5.0])).reshape(-1, 1)
+    nsamples = dasIT_medium.rx_echo_totalnr_samples * 3 // 4
+    signals = point_scatterer_rf(transducer=dasIT_transducer,
+                                 nsamples=nsamples,
+                                 scatterers=[(-1e-3, 6e-3), (1.5e-3, 9e-3)],
+                                 angles=angles,
+                                 sos=SOS,
+                                 noise=0.01,
+                                 seed=0)
+    delays = planewave_delays(medium=dasIT_medium.medium,
+                              sos=SOS,
+                              fsampling=dasIT_transducer.sampling_frequency,
+                              angles=angles,
+                              elements=dasIT_transducer.lateral_transducer_spacing,
+                              nsamples=nsamples)
+    return SimpleNamespace(transducer=dasIT_transducer,
+                           medium=dasIT_medium,
+                           angles=angles,
+                           nsamples=nsamples,
+                           signals=signals,
+                           delays=delays)
@@ -0,0 +1,129 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Local beamforming service: frames match RXbeamformer, invalid requests fail for their own client only and the
+# daemon runs from the command line
+
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+
+import numpy as np
+import pytest
+
+from dasIT.__main__ import setup, add_setup_arguments
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.service.beamforming_service import beamforming_server, beamforming_client
+
+
+@pytest.fixture
+def service(planewave_setup, tmp_path):
+    socket_path = str(tmp_path / 'dasIT.sock')
+    server = beamforming_server(socket_path=socket_path,
+                                delays=planewave_setup.delays.sample_delays,
+                                nsamples=planewave_setup.nsamples)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    thread.join()
+
+
+def wait_for(path, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, f'{path} was not created'
+        time.sleep(0.05)
+
+
+def test_frame_matches_rxbeamformer(planewave_setup, service):
+    client = beamforming_client(socket_path=service)
+    try:
+        frame = client.beamform(planewave_setup.signals)
+    finally:
+        client.close()
+    expected = RXbeamformer(signals=planewave_setup.signals,
+                            delays=planewave_setup.delays.sample_delays,
+                            nsamples=planewave_setup.nsamples).frame
+    np.testing.assert_allclose(frame, expected)
+
+
+def test_rf_longer_than_table_is_rejected(planewave_setup, service):
+    signals = planewave_setup.signals
+    longer = np.concatenate([signals, np.ones((10,) + signals.shape[1:], dtype=signals.dtype)], axis=0)
+    client = beamforming_client(socket_path=service)
+    try:
+        with pytest.raises(RuntimeError, match='does not match the delay table'):
+            client.beamform(longer)
+        # the connection is still served
+        assert client.beamform(signals).shape == planewave_setup.delays.sample_delays.shape[:2]
+    finally:
+        client.close()
+
+
+def test_malformed_lines_get_an_error_reply(service):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(service)
+    stream = connection.makefile('rwb')
+    try:
+        for line in (b'not json\n', b'[1, 2]\n', b'\xff\n'):
+            stream.write(line)
+            stream.flush()
+            assert json.loads(stream.readline())['status'] == 'error'
+        stream.write(b'{"cmd": "info"}\n')
+        stream.flush()
+        assert json.loads(stream.readline())['status'] == 'ok'
+    finally:
+        stream.close()
+        connection.close()
+
+
+def test_serve_subcommand(tmp_path):
+    socket_path = str(tmp_path / 'dasIT.sock')
+    arguments = ['--elements', '16', '--angles', '3', '--angle-interval', '-5', '5', '--depth', '30']
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    python_path = os.pathsep.join(filter(None, [repository, os.environ.get('PYTHONPATH')]))
+    environment = dict(os.environ, PYTHONPATH=python_path)
+    daemon = subprocess.Popen([sys.executable, '-m', 'dasIT', 'serve', '--socket', socket_path] + arguments,
+                              env=environment, stdout=subprocess.DEVNULL)
+    try:
+        wait_for(socket_path)
+        parser = argparse.ArgumentParser()
+        add_setup_arguments(parser)
+        dasIT_transducer, dasIT_medium = setup(parser.parse_args(arguments))
+
+        client = beamforming_client(socket_path=socket_path)
+        try:
+            signals = np.zeros((dasIT_medium.rx_echo_totalnr_samples, 16, 3))
+            frame_shape = (np.ravel(dasIT_medium.medium[1]).size, np.ravel(dasIT_medium.medium[0]).size)
+            assert client.beamform(signals).shape == frame_shape
+        finally:
+            client.close()
+    finally:
+        daemon.send_signal(signal.SIGINT)
+        assert daemon.wait(timeout=30) == 0
+    assert not os.path.exists(socket_path)
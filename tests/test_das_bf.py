@@ -0,0 +1,66 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Sentinel taps of the delay table (index == nsamples) must read zero, whatever the length of the signals
+
+
+import numpy as np
+import pytest
+
+from dasIT.src.das_bf import RXbeamformer, zero_pad_samples, padded_signals
+
+
+def reference_frame(signals, delays, nsamples):
+    # brute-force DAS: sum of all taps inside the record
+    nr_depth, nr_lateral, nr_elements, nr_angles = delays.shape
+    element, angle = np.meshgrid(np.arange(nr_elements), np.arange(nr_angles), indexing='ij')
+    frame = np.zeros((nr_depth, nr_lateral), dtype=signals.dtype)
+    for depth in range(nr_depth):
+        for lateral in range(nr_lateral):
+            taps = delays[depth, lateral]
+            valid = taps < nsamples
+            frame[depth, lateral] = np.sum(signals[taps[valid], element[valid], angle[valid]])
+    return frame
+
+
+def test_sentinel_taps_read_zero(planewave_setup):
+    delays = planewave_setup.delays.sample_delays
+    assert np.any(delays == planewave_setup.nsamples)
+    frame = RXbeamformer(signals=planewave_setup.signals, delays=delays, nsamples=planewave_setup.nsamples).frame
+    np.testing.assert_allclose(frame, reference_frame(planewave_setup.signals, delays, planewave_setup.nsamples))
+
+
+@pytest.mark.parametrize('nsamples', [None, 'table'])
+def test_signals_longer_than_table(planewave_setup, nsamples):
+    # RF recorded beyond the record length of the delay table gives the same frame as the cropped RF
+    delays = planewave_setup.delays.sample_delays
+    nsamples = planewave_setup.nsamples if nsamples == 'table' else None
+    signals = planewave_setup.signals
+    rng = np.random.default_rng(1)
+    longer = np.concatenate([signals, rng.standard_normal((50,) + signals.shape[1:])], axis=0)
+
+    frame = RXbeamformer(signals=signals, delays=delays, nsamples=nsamples).frame
+    longer_frame = RXbeamformer(signals=longer, delays=delays, nsamples=nsamples).frame
+    np.testing.assert_array_equal(longer_frame, frame)
+
+
+def test_padded_signals_are_not_copied(planewave_setup):
+    padded = padded_signals(planewave_setup.signals)
+    assert zero_pad_samples(padded, planewave_setup.delays.sample_delays, planewave_setup.nsamples) is padded
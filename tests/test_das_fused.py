@@ -0,0 +1,74 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Fused kernel against the delay table path (RXbeamformer) and the NumPy fallback without numba
+
+
+import numpy as np
+import pytest
+
+import dasIT.src.das_fused as das_fused
+from dasIT.src.das_fused import fused_beamformer
+from dasIT.src.apodization import apodization
+from dasIT.src.das_bf import RXbeamformer
+
+
+def table_frame(setup, apodization_table=None):
+    return RXbeamformer(signals=setup.signals,
+                        delays=setup.delays.sample_delays,
+                        apodization=apodization_table,
+                        nsamples=setup.nsamples).frame
+
+
+def fused_frame(setup, backend, apo=None):
+    return fused_beamformer(signals=setup.signals,
+                            medium=setup.medium.medium,
+                            sos=setup.medium.speed_of_sound,
+                            fsampling=setup.transducer.sampling_frequency,
+                            angles=setup.angles,
+                            elements=setup.transducer.lateral_transducer_spacing,
+                            apodization=apo,
+                            backend=backend)
+
+
+@pytest.mark.skipif(not das_fused.NUMBA_AVAILABLE, reason='numba is not installed')
+@pytest.mark.parametrize('apo', [None, 'rec'])
+def test_kernel_matches_delay_table(planewave_setup, apo):
+    apo = None if apo is None else apodization(delays=None, medium=planewave_setup.medium.medium,
+                                               transducer=planewave_setup.transducer, apo=apo,
+                                               angles=planewave_setup.angles)
+    beamformer = fused_frame(planewave_setup, 'numba', apo)
+    assert beamformer.backend == 'numba'
+    expected = table_frame(planewave_setup, None if apo is None else apo.table)
+    np.testing.assert_allclose(beamformer.frame, expected, rtol=1e-10, atol=1e-10)
+
+
+def test_fallback_without_numba(planewave_setup, monkeypatch, capsys):
+    monkeypatch.setattr(das_fused, 'NUMBA_AVAILABLE', False)
+    expected = table_frame(planewave_setup)
+
+    beamformer = fused_frame(planewave_setup, 'auto')
+    assert beamformer.backend == 'numpy'
+    np.testing.assert_array_equal(beamformer.frame, expected)
+
+    beamformer = fused_frame(planewave_setup, 'numba')
+    assert 'ERROR MESSAGE' in capsys.readouterr().out
+    assert beamformer.backend == 'numpy'
+    np.testing.assert_array_equal(beamformer.frame, expected)
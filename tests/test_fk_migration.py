@@ -0,0 +1,141 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# f-k migration against delay-and-sum on synthetic point scatterers (same receive aperture for both engines)
+#
+# run from the repository root: python -m pytest tests
+
+
+import numpy as np
+import pytest
+
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.src.delays import planewave_delays
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.fk_migration import fk_migration
+from dasIT.data.synthetic import point_scatterer_rf
+
+
+SOS = 1540
+FNUMBER = 1.0
+POINT = (4e-3, 20e-3)
+
+
+def setup(nr_elements=64, angles_deg=(0,), roi=None, roi_spacing=None):
+    dasIT_transducer = transducer(center_frequency_hz=5e6,
+                                  bandwidth_hz=[3e6, 7e6],
+                                  adc_ratio=4,
+                                  transducer_elements_nr=nr_elements,
+                                  element_pitch_m=3e-4,
+                                  pinmap=np.arange(1, nr_elements + 1),
+                                  focus_number=FNUMBER,
+                                  totalnr_planewaves=1,
+                                  planewave_angle_interval=[0, 0],
+                                  speed_of_sound_ms=SOS)
+    dasIT_medium = medium(speed_of_sound_ms=SOS,
+                          center_frequency=dasIT_transducer.center_frequency,
+                          sampling_frequency=dasIT_transducer.sampling_frequency,
+                          max_depth_wavelength=100,
+                          lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing,
+                          roi=roi,
+                          roi_spacing=roi_spacing)
+    angles = np.radians(np.asarray(angles_deg, dtype=np.float64)).reshape(-1, 1)
+    signals = point_scatterer_rf(transducer=dasIT_transducer,
+                                 nsamples=dasIT_medium.rx_echo_totalnr_samples,
+                                 scatterers=[POINT],
+                                 angles=angles,
+                                 sos=SOS,
+                                 noise=0.01,
+                                 seed=0)
+    return dasIT_transducer, dasIT_medium, angles, signals
+
+
+def reconstruct(dasIT_transducer, dasIT_medium, angles, signals):
+    grid = dasIT_medium.medium
+    elements = dasIT_transducer.lateral_transducer_spacing
+    delays = planewave_delays(medium=grid,
+                              sos=SOS,
+                              fsampling=dasIT_transducer.sampling_frequency,
+                              angles=angles,
+                              elements=elements,
+                              nsamples=dasIT_medium.rx_echo_totalnr_samples)
+    aperture = np.abs(np.reshape(grid[0], (1, -1, 1)) - np.reshape(elements, (1, 1, -1))) <= \
+               np.reshape(grid[1], (-1, 1, 1)) / (2 * FNUMBER)
+    das_frame = RXbeamformer(signals=signals,
+                             delays=delays.sample_delays,
+                             apodization=np.expand_dims(aperture, axis=3).astype(int)).frame
+    fk_frame = fk_migration(signals=signals,
+                            transducer=dasIT_transducer,
+                            medium=grid,
+                            angles=angles,
+                            sos=SOS,
+                            fnumber=FNUMBER).frame
+    return das_frame, fk_frame
+
+
+def peak(frame):
+    peak_z, peak_x = np.unravel_index(np.argmax(np.abs(frame)), frame.shape)
+    return peak_x, peak_z
+
+
+def fwhm(profile, spacing):
+    # -6 dB width with linear interpolation of the crossings
+    profile = profile / np.amax(profile)
+    above = np.nonzero(profile >= 0.5)[0]
+    left, right = above[0], above[-1]
+    left_edge = left - (profile[left] - 0.5) / (profile[left] - profile[left - 1])
+    right_edge = right + (profile[right] - 0.5) / (profile[right] - profile[right + 1])
+    return (right_edge - left_edge) * spacing
+
+
+@pytest.mark.parametrize('angle_deg', [20, -15])
+def test_steered_point_localized_like_das(angle_deg):
+    # single steered plane wave on the default (element pitch) grid: the f-k peak lies within one pixel of DAS
+    dasIT_transducer, dasIT_medium, angles, signals = setup(angles_deg=(angle_deg,))
+    das_frame, fk_frame = reconstruct(dasIT_transducer, dasIT_medium, angles, signals)
+
+    das_x, das_z = peak(das_frame)
+    fk_x, fk_z = peak(fk_frame)
+    assert abs(fk_x - das_x) <= 1
+    assert abs(fk_z - das_z) <= 1
+
+
+def test_compounded_resolution_matches_das():
+    # compounded plane waves on a fine grid around the point: same peak and comparable -6 dB widths
+    spacing = 5e-5
+    roi = [[POINT[0] - 1.5e-3, POINT[0] + 1.5e-3], [POINT[1] - 1e-3, POINT[1] + 1e-3]]
+    dasIT_transducer, dasIT_medium, angles, signals = setup(angles_deg=np.linspace(-10, 10, 7),
+                                                            roi=roi,
+                                                            roi_spacing=[spacing, spacing])
+    das_frame, fk_frame = reconstruct(dasIT_transducer, dasIT_medium, angles, signals)
+
+    das_x, das_z = peak(das_frame)
+    fk_x, fk_z = peak(fk_frame)
+    assert abs(fk_x - das_x) <= 1
+    assert abs(fk_z - das_z) <= 1
+
+    das_envelope, fk_envelope = np.abs(das_frame), np.abs(fk_frame)
+    das_lateral = fwhm(das_envelope[das_z, :], spacing)
+    fk_lateral = fwhm(fk_envelope[fk_z, :], spacing)
+    das_axial = fwhm(das_envelope[:, das_x], spacing)
+    fk_axial = fwhm(fk_envelope[:, fk_x], spacing)
+    assert fk_lateral <= 1.2 * das_lateral
+    assert fk_axial <= 1.2 * das_axial
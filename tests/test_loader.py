@@ -0,0 +1,69 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Prefetching reader: the chunks equal the corresponding frames of RFDataloader, also when resuming at a frame
+# inside a chunk, and an abandoned iteration stops the reader thread
+
+
+import threading
+
+import h5py
+import numpy as np
+import pytest
+
+from dasIT.data.loader import RFDataloader, RFprefetchloader
+
+
+NR_FRAMES, NR_SHOTS = 7, 2
+
+
+@pytest.fixture
+def rf_path(tmp_path):
+    path = tmp_path / 'rf.h5'
+    rng = np.random.default_rng(0)
+    with h5py.File(path, 'w') as file:
+        for f in range(NR_FRAMES):
+            for s in range(NR_SHOTS):
+                file[f'frame{f:04}/shot{s:04}'] = rng.integers(-2**15, 2**15, size=(50, 16), dtype=np.int16)
+    return path
+
+
+@pytest.mark.parametrize('start', [0, 4])
+def test_chunks_match_dataloader(rf_path, start):
+    signal = RFDataloader(rf_path).signal
+    loader = RFprefetchloader(rf_path, chunk=3, start=start)
+    assert loader.nbr_frames == NR_FRAMES
+
+    frame_starts = []
+    for frame_start, signals in loader:
+        frame_stop = min(frame_start + 3, NR_FRAMES)
+        np.testing.assert_array_equal(signals, signal[:, :, frame_start * NR_SHOTS:frame_stop * NR_SHOTS])
+        frame_starts.append(frame_start)
+    assert frame_starts == list(range(start, NR_FRAMES, 3))
+    assert len(loader) == len(frame_starts)
+
+
+def test_abandoned_iteration_stops_reader(rf_path):
+    nr_threads = threading.active_count()
+    chunks = iter(RFprefetchloader(rf_path, chunk=1, queue_size=1))
+    next(chunks)
+    assert threading.active_count() == nr_threads + 1
+    chunks.close()
+    assert threading.active_count() == nr_threads
@@ -0,0 +1,49 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Speckle tracking of a known rigid shift and of frames smaller than the search window
+
+
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+from dasIT.features.motion import speckle_tracking
+
+
+def speckle_frames(shift=(3, -2), shape=(160, 96)):
+    # smooth random speckle, the second frame is the first one moved by shift pixels (axial, lateral)
+    speckle = gaussian_filter(np.random.default_rng(0).standard_normal((shape[0] + 40, shape[1] + 40)), 1.5)
+    first = speckle[20:20 + shape[0], 20:20 + shape[1]]
+    second = speckle[20 - shift[0]:20 - shift[0] + shape[0], 20 - shift[1]:20 - shift[1] + shape[1]]
+    return np.stack((first, second), axis=2)
+
+
+def test_rigid_shift_is_tracked():
+    tracking = speckle_tracking(signals=speckle_frames(), envelope=False)
+    np.testing.assert_allclose(np.median(tracking.axial_displacement), 3, atol=0.1)
+    np.testing.assert_allclose(np.median(tracking.lateral_displacement), -2, atol=0.1)
+    assert np.median(tracking.correlation) > 0.9
+
+
+def test_search_window_larger_than_frame(capsys):
+    tracking = speckle_tracking(signals=speckle_frames(shape=(30, 20)), block_size=(32, 16), search_range=(8, 4))
+    assert 'ERROR MESSAGE' in capsys.readouterr().out
+    assert tracking.axial_displacement is None
+    assert tracking.block_centers is None
@@ -0,0 +1,81 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Minimum variance beamformer against a per pixel covariance estimate with explicit subarray outer products and
+# np.linalg.solve, across depth tile borders
+
+
+import numpy as np
+import pytest
+
+from dasIT.src.apodization import apodization
+from dasIT.src.mv_bf import mv_beamformer
+
+
+def brute_force_channels(signals, delays, apodization_table, nsamples):
+    # angle compounded delayed signal of every element, shape [depth, lateral pixel, td_element]
+    nr_depth, nr_lateral, nr_elements, nr_angles = delays.shape
+    channels = np.zeros((nr_depth, nr_lateral, nr_elements), dtype=complex)
+    for element in range(nr_elements):
+        for angle in range(nr_angles):
+            taps = delays[:, :, element, angle]
+            valid = taps < nsamples
+            weights = 1.0 if apodization_table is None else \
+                apodization_table[:, :, element, min(angle, apodization_table.shape[3] - 1)]
+            channels[:, :, element] += np.where(valid, signals[np.minimum(taps, nsamples - 1), element, angle], 0) \
+                * weights
+    return channels
+
+
+def brute_force_pixel(channels, depth, lateral, length, diagonal_loading, axial_kernel):
+    nr_subarrays = channels.shape[2] - length + 1
+    covariance = np.zeros((length, length), dtype=complex)
+    for row in range(max(depth - axial_kernel, 0), min(depth + axial_kernel + 1, channels.shape[0])):
+        for subarray in range(nr_subarrays):
+            x = channels[row, lateral, subarray:subarray + length]
+            covariance += np.outer(x, np.conj(x))
+    covariance /= nr_subarrays
+
+    trace = np.real(np.trace(covariance))
+    covariance += (diagonal_loading * trace / length if trace > 0 else 1) * np.eye(length)
+    steering = np.ones(length)
+    weights = np.linalg.solve(covariance, steering)
+    weights /= np.conj(steering) @ weights
+
+    x = channels[depth, lateral]
+    return sum(np.conj(weights) @ x[subarray:subarray + length] for subarray in range(nr_subarrays)) / nr_subarrays
+
+
+@pytest.mark.parametrize('apo, axial_kernel', [(None, 0), ('rec', 0), (None, 2)])
+def test_frame_matches_brute_force(planewave_setup, apo, axial_kernel):
+    delays = planewave_setup.delays.sample_delays
+    apodization_table = None if apo is None else \
+        apodization(delays=None, medium=planewave_setup.medium.medium, transducer=planewave_setup.transducer,
+                    apo=apo, angles=planewave_setup.angles).table
+    mv = mv_beamformer(signals=planewave_setup.signals, delays=delays, apodization=apodization_table, subarray=8,
+                       axial_kernel=axial_kernel, depth_tile=7, nsamples=planewave_setup.nsamples)
+    channels = brute_force_channels(planewave_setup.signals, delays, apodization_table, planewave_setup.nsamples)
+
+    nr_depth, nr_lateral = delays.shape[:2]
+    # first and last rows and the rows on both sides of the tile borders
+    for depth in (0, 1, 6, 7, 13, 14, nr_depth // 2, nr_depth - 1):
+        for lateral in range(0, nr_lateral, 5):
+            expected = brute_force_pixel(channels, depth, lateral, 8, 1e-2, axial_kernel)
+            np.testing.assert_allclose(mv.frame[depth, lateral], expected, rtol=1e-8, atol=1e-12)
@@ -0,0 +1,84 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Memoized stage graph: the beamform stage matches RXbeamformer on the notebook chain and a parameter change only
+# recomputes the stages downstream of it
+
+
+import numpy as np
+import pytest
+
+from dasIT.features.signal import RFfilter, analytic_signal
+from dasIT.data.synthetic import point_scatterer_rf
+from dasIT.src.delays import planewave_delays
+from dasIT.src.apodization import apodization
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.pipeline import beamforming_pipeline
+
+
+@pytest.fixture
+def pipeline_setup(planewave_setup):
+    dasIT_transducer, dasIT_medium = planewave_setup.transducer, planewave_setup.medium
+    rf = point_scatterer_rf(transducer=dasIT_transducer,
+                            nsamples=dasIT_medium.rx_echo_totalnr_samples,
+                            scatterers=[(-1e-3, 6e-3), (1.5e-3, 9e-3)],
+                            angles=planewave_setup.angles,
+                            noise=0.01,
+                            analytic=False,
+                            seed=0)
+    pipeline = beamforming_pipeline(rf=rf, transducer=dasIT_transducer, medium=dasIT_medium)
+    return dasIT_transducer, dasIT_medium, rf, pipeline
+
+
+def test_beamform_stage_matches_rxbeamformer(pipeline_setup):
+    dasIT_transducer, dasIT_medium, rf, pipeline = pipeline_setup
+    angles = dasIT_transducer.planewave_angles()
+
+    signals = np.array(rf[:, dasIT_transducer.transducer_pinmap])
+    signals[:dasIT_transducer.start_depth_rec_samples] = 0
+    signals = RFfilter(signals=signals, fcutoff_band=dasIT_transducer.bandwidth,
+                       fsampling=dasIT_transducer.sampling_frequency, type='gaussian', order=10).signal
+    delays = planewave_delays(medium=dasIT_medium.medium, sos=dasIT_medium.speed_of_sound,
+                              fsampling=dasIT_transducer.sampling_frequency, angles=angles,
+                              nsamples=dasIT_medium.rx_echo_totalnr_samples).sample_delays
+    apodization_table = apodization(delays=None, medium=dasIT_medium.medium, transducer=dasIT_transducer,
+                                    apo='rec', angles=angles).table
+    expected = RXbeamformer(signals=analytic_signal(signals), delays=delays, apodization=apodization_table).frame
+
+    np.testing.assert_allclose(pipeline.get('beamform'), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_parameter_change_recomputes_downstream_stages(pipeline_setup):
+    dasIT_transducer, dasIT_medium, _, pipeline = pipeline_setup
+    pipeline.get('compress')
+
+    pipeline.set('compress', dbrange=40)
+    assert pipeline.stale('compress') == ['compress']
+    pipeline.get('compress')
+    assert pipeline.computed == ['compress']
+
+    pipeline.set('apodization', apo='mask')
+    pipeline.get('compress')
+    assert pipeline.computed == ['apodization', 'beamform', 'interpolate', 'compress']
+
+    # the cached analytic signal holds the zero sentinel sample of the delay table
+    analytic = pipeline.get('analytic')
+    assert analytic.shape[0] == dasIT_medium.rx_echo_totalnr_samples + 1
+    assert not np.any(analytic[-1])
@@ -0,0 +1,88 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# BeamformingPlan against the stage-by-stage pipeline (RXbeamformer) on raw RF in acquisition channel order
+
+
+import pickle
+
+import numpy as np
+import pytest
+
+from dasIT.features.transducer import transducer
+from dasIT.features.medium import medium
+from dasIT.data.synthetic import point_scatterer_rf
+from dasIT.src.plan import geometry_spec, BeamformingPlan
+from dasIT.src.pipeline import beamforming_pipeline
+
+
+SOS = 1540
+NR_ELEMENTS = 24
+
+
+@pytest.fixture(scope='module')
+def acquisition():
+    pinmap = np.random.default_rng(0).permutation(NR_ELEMENTS) + 1
+    dasIT_transducer = transducer(center_frequency_hz=5e6,
+                                  bandwidth_hz=[3e6, 7e6],
+                                  adc_ratio=4,
+                                  transducer_elements_nr=NR_ELEMENTS,
+                                  element_pitch_m=3e-4,
+                                  pinmap=pinmap,
+                                  focus_number=1.0,
+                                  totalnr_planewaves=3,
+                                  planewave_angle_interval=[-5, 5],
+                                  speed_of_sound_ms=SOS)
+    dasIT_medium = medium(speed_of_sound_ms=SOS,
+                          center_frequency=dasIT_transducer.center_frequency,
+                          sampling_frequency=dasIT_transducer.sampling_frequency,
+                          max_depth_wavelength=40,
+                          lateral_transducer_element_spacing=dasIT_transducer.lateral_transducer_spacing)
+    signals = point_scatterer_rf(transducer=dasIT_transducer,
+                                 nsamples=dasIT_medium.rx_echo_totalnr_samples + 10,
+                                 scatterers=[(-1e-3, 6e-3), (1.5e-3, 9e-3)],
+                                 angles=dasIT_transducer.planewave_angles(),
+                                 sos=SOS,
+                                 noise=0.01,
+                                 analytic=False,
+                                 seed=0)
+    # raw RF in acquisition channel order
+    rf = np.empty_like(signals)
+    rf[:, pinmap - 1] = signals
+    return dasIT_transducer, dasIT_medium, rf
+
+
+def test_spec_round_trip(acquisition):
+    dasIT_transducer, dasIT_medium, _ = acquisition
+    spec = geometry_spec.from_setup(transducer=dasIT_transducer, medium=dasIT_medium)
+    plan = BeamformingPlan(spec)
+    assert geometry_spec.from_setup(transducer=plan.transducer, medium=plan.medium) == spec
+    assert hash(pickle.loads(pickle.dumps(spec))) == hash(spec)
+
+
+def test_plan_matches_pipeline(acquisition):
+    dasIT_transducer, dasIT_medium, rf = acquisition
+    spec = geometry_spec.from_setup(transducer=dasIT_transducer, medium=dasIT_medium, interp_scale=2, dbrange=50)
+    plan = BeamformingPlan(spec)
+    image = plan.execute(rf)
+
+    pipeline = beamforming_pipeline(rf=rf, transducer=dasIT_transducer, medium=dasIT_medium)
+    np.testing.assert_allclose(plan.frame, pipeline.get('beamform'), rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(image, pipeline.get('compress'))
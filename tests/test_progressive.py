@@ -0,0 +1,60 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Progressive beamforming: the first preview is cheap (decimated grid, centre angle, element subset) and the final
+# frame equals RXbeamformer
+
+
+import numpy as np
+import pytest
+
+from dasIT.src.apodization import apodization
+from dasIT.src.das_bf import RXbeamformer
+from dasIT.src.progressive import progressive_beamformer
+
+
+@pytest.fixture(scope='module')
+def apodization_table(planewave_setup):
+    return apodization(delays=None, medium=planewave_setup.medium.medium, transducer=planewave_setup.transducer,
+                       apo='rec', angles=planewave_setup.angles).table
+
+
+@pytest.mark.parametrize('options', [{}, {'element_stride': 4}, {'angle_groups': [[0, 2], [1]], 'strides': (3, 1)}])
+def test_final_frame_matches_rxbeamformer(planewave_setup, apodization_table, options):
+    delays = planewave_setup.delays.sample_delays
+    progressive = progressive_beamformer(signals=planewave_setup.signals, delays=delays,
+                                         apodization=apodization_table, nsamples=planewave_setup.nsamples, **options)
+    expected = RXbeamformer(signals=planewave_setup.signals, delays=delays, apodization=apodization_table,
+                            nsamples=planewave_setup.nsamples).frame
+    np.testing.assert_allclose(progressive.run(), expected, rtol=1e-10, atol=1e-10)
+
+
+def test_first_preview_uses_the_centre_angle_and_an_element_subset(planewave_setup):
+    delays = planewave_setup.delays.sample_delays
+    progressive = progressive_beamformer(signals=planewave_setup.signals, delays=delays, element_stride=4,
+                                         nsamples=planewave_setup.nsamples)
+    preview = next(progressive.refine())
+
+    # DAS of the centre angle and every 4th element on the stride 4 grid
+    subset = (slice(None, None, 4), slice(None, None, 4), slice(None, None, 4), slice(1, 2))
+    expected = RXbeamformer(signals=planewave_setup.signals[:, ::4, 1:2], delays=np.ascontiguousarray(delays[subset]),
+                            nsamples=planewave_setup.nsamples).frame
+    np.testing.assert_allclose(preview[::4, ::4], expected, rtol=1e-10, atol=1e-10)
+    assert progressive.passes == 1
@@ -0,0 +1,76 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Per-channel quality control on int16 RF: saturation against the ADC range, dead channels and strict JSON report
+
+
+import json
+
+import numpy as np
+
+from dasIT.features.quality import channel_quality
+
+
+FSAMPLING = 20e6
+
+
+def acquisition(nr_samples=2048, nr_channels=16, nr_frames=3, amplitude=8000, seed=0):
+    rng = np.random.default_rng(seed)
+    time = np.arange(nr_samples).reshape(-1, 1, 1) / FSAMPLING
+    signals = amplitude * np.sin(2 * np.pi * 5e6 * time + rng.uniform(0, 2 * np.pi, (1, nr_channels, nr_frames)))
+    signals = signals + 50 * rng.standard_normal((nr_samples, nr_channels, nr_frames))
+    return np.rint(signals).astype(np.int16)
+
+
+def reject_constant(constant):
+    raise AssertionError(f'{constant} in the JSON report')
+
+
+def test_normal_acquisition_passes():
+    # the largest sample of a normal acquisition is not saturation
+    quality = channel_quality(signals=acquisition(), fsampling=FSAMPLING, fband=[4e6, 6e6])
+    assert quality.report['full_scale'] == np.iinfo(np.int16).max
+    assert not np.any(quality.flags['saturated'])
+    assert quality.passed
+
+
+def test_clipped_and_dead_channels_are_flagged(tmp_path):
+    signals = acquisition()
+    signals[:, 3] = np.clip(signals[:, 3].astype(np.int32) * 8, -32768, 32767)
+    signals[:, 7] = 0
+    quality = channel_quality(signals=signals, fsampling=FSAMPLING, fband=[4e6, 6e6])
+    assert np.flatnonzero(quality.flags['saturated']).tolist() == [3]
+    assert np.flatnonzero(quality.flags['dead']).tolist() == [7]
+    assert not quality.passed
+
+    # RMS of int16 samples is computed without overflow
+    np.testing.assert_allclose(quality.rms[3], np.sqrt(np.mean(signals[:, 3].astype(np.float64) ** 2, axis=0)))
+
+    # the dead channel has no finite SNR, the report is still strict JSON
+    with open(quality.save_report(str(tmp_path / 'report.json'))) as report_file:
+        report = json.load(report_file, parse_constant=reject_constant)
+    assert report['channel_snr_db'][7] is None
+
+
+def test_float_signals_without_full_scale_skip_saturation():
+    quality = channel_quality(signals=acquisition().astype(np.float64), fsampling=FSAMPLING, fband=[4e6, 6e6])
+    assert quality.saturation is None
+    assert quality.report['full_scale'] is None
+    assert not np.any(quality.flags['saturated'])
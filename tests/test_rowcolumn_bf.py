@@ -0,0 +1,98 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Row-column beamforming against a dense (brute-force) delay table and table memory against the array size
+
+
+import numpy as np
+import pytest
+
+from dasIT.features.transducer import rowcolumn_transducer
+from dasIT.src.rowcolumn_bf import rowcolumn_delays, rowcolumn_beamformer
+from dasIT.data.synthetic import rowcolumn_point_scatterer_rf
+
+
+SOS = 1540
+NSAMPLES = 400
+
+
+def setup(nr_elements=16, fnumber=1.0, pixels=(12, 10, 30)):
+    dasIT_transducer = rowcolumn_transducer(center_frequency_hz=5e6,
+                                            bandwidth_hz=[3e6, 7e6],
+                                            adc_ratio=4,
+                                            rows_nr=nr_elements,
+                                            columns_nr=nr_elements,
+                                            row_pitch_m=3e-4,
+                                            focus_number=fnumber,
+                                            totalnr_planewaves=3,
+                                            planewave_angle_interval=[-5, 5],
+                                            speed_of_sound_ms=SOS)
+    nr_lateral, nr_elevation, nr_depth = pixels
+    volume = [np.linspace(-2e-3, 2e-3, nr_lateral), np.linspace(-2e-3, 2e-3, nr_elevation),
+              np.linspace(2e-3, 8e-3, nr_depth)]
+    angles = dasIT_transducer.planewave_angles()
+    delays = rowcolumn_delays(volume=volume,
+                              sos=SOS,
+                              fsampling=dasIT_transducer.sampling_frequency,
+                              angles=angles,
+                              columns=dasIT_transducer.column_positions,
+                              fnumber=fnumber,
+                              nsamples=NSAMPLES)
+    return dasIT_transducer, volume, angles, delays
+
+
+def reference_volume(signals, volume, angles, columns, fnumber, fsampling):
+    # dense delay table [depth, lateral, elevation, columns, angles]
+    x, y, z = [np.asarray(axis, dtype=np.float32) for axis in volume]
+    x, y, z = x.reshape(1, -1, 1, 1, 1), y.reshape(1, 1, -1, 1, 1), z.reshape(-1, 1, 1, 1, 1)
+    x_c = np.asarray(columns, dtype=np.float32).reshape(1, 1, 1, -1, 1)
+    alpha = np.ravel(angles).reshape(1, 1, 1, 1, -1)
+    tx = z * np.cos(alpha).astype(np.float32) + y * np.sin(alpha).astype(np.float32)
+    rx = np.sqrt(z ** 2 + (x - x_c) ** 2)
+    delays = np.rint((tx + rx) / np.float32(SOS) * np.float32(fsampling)).astype(np.int64)
+    valid = (delays >= 0) & (delays < NSAMPLES) & (np.abs(x - x_c) <= z / (2 * fnumber))
+    column = np.broadcast_to(np.arange(x_c.size).reshape(1, 1, 1, -1, 1), delays.shape)
+    angle = np.broadcast_to(np.arange(alpha.size).reshape(1, 1, 1, 1, -1), delays.shape)
+    taps = np.where(valid, signals[np.minimum(delays, NSAMPLES - 1), column, angle], 0)
+    return np.sum(taps, axis=(3, 4))
+
+
+def test_volume_matches_dense_table():
+    dasIT_transducer, volume, angles, delays = setup()
+    signals = rowcolumn_point_scatterer_rf(transducer=dasIT_transducer, nsamples=NSAMPLES,
+                                           scatterers=[(0.5e-3, -0.5e-3, 5e-3)], angles=angles, sos=SOS,
+                                           noise=0.01, seed=0)
+    beamformed = rowcolumn_beamformer(signals=signals, delays=delays, slice_batch=4).volume
+    expected = reference_volume(signals, volume, angles, dasIT_transducer.column_positions, 1.0,
+                                dasIT_transducer.sampling_frequency)
+    np.testing.assert_allclose(beamformed, expected, rtol=1e-10, atol=1e-10)
+
+    # RF recorded beyond nsamples is cropped to the table
+    longer = np.concatenate([signals, np.ones((20,) + signals.shape[1:])], axis=0)
+    np.testing.assert_array_equal(rowcolumn_beamformer(signals=longer, delays=delays, slice_batch=4).volume,
+                                  beamformed)
+
+
+@pytest.mark.parametrize('nr_elements', [16, 64])
+def test_table_memory_is_linear_in_the_array_size(nr_elements):
+    # with lateral and elevation pixels equal to the columns and rows the tables grow with (rows + columns) x depth
+    _, _, angles, delays = setup(nr_elements=nr_elements, pixels=(nr_elements, nr_elements, 50))
+    per_element = delays.nbytes / ((2 * nr_elements) * 50 * len(angles))
+    assert per_element <= 4
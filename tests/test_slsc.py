@@ -0,0 +1,76 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# SLSC against a per pixel evaluation of R(m) with explicit element pairs, across depth tile borders
+
+
+import numpy as np
+import pytest
+
+from dasIT.src.apodization import apodization
+from dasIT.src.slsc import slsc_beamformer
+
+
+def brute_force_channels(signals, delays, apodization_table, nsamples):
+    # angle compounded delayed signal of every element, shape [depth, lateral pixel, td_element]
+    nr_depth, nr_lateral, nr_elements, nr_angles = delays.shape
+    channels = np.zeros((nr_depth, nr_lateral, nr_elements), dtype=complex)
+    for element in range(nr_elements):
+        for angle in range(nr_angles):
+            taps = delays[:, :, element, angle]
+            valid = taps < nsamples
+            weights = 1.0 if apodization_table is None else \
+                apodization_table[:, :, element, min(angle, apodization_table.shape[3] - 1)]
+            channels[:, :, element] += np.where(valid, signals[np.minimum(taps, nsamples - 1), element, angle], 0) \
+                * weights
+    return channels
+
+
+def brute_force_coherence(channels, depth, lateral, max_lag, kernel_half):
+    kernel = channels[max(depth - kernel_half, 0):depth + kernel_half + 1, lateral]
+    coherence = np.zeros(max_lag)
+    for lag in range(1, max_lag + 1):
+        pairs = []
+        for element in range(channels.shape[2] - lag):
+            first, second = kernel[:, element], kernel[:, element + lag]
+            energy_first, energy_second = np.sum(np.abs(first) ** 2), np.sum(np.abs(second) ** 2)
+            if energy_first > 0 and energy_second > 0:
+                pairs.append(np.real(np.sum(first * np.conj(second))) / np.sqrt(energy_first * energy_second))
+        coherence[lag - 1] = np.mean(pairs) if pairs else 0
+    return coherence
+
+
+@pytest.mark.parametrize('apo', [None, 'rec'])
+def test_lag_coherence_matches_brute_force(planewave_setup, apo):
+    delays = planewave_setup.delays.sample_delays
+    apodization_table = None if apo is None else \
+        apodization(delays=None, medium=planewave_setup.medium.medium, transducer=planewave_setup.transducer,
+                    apo=apo, angles=planewave_setup.angles).table
+    slsc = slsc_beamformer(signals=planewave_setup.signals, delays=delays, apodization=apodization_table,
+                           max_lag=4, kernel=5, depth_tile=7, nsamples=planewave_setup.nsamples)
+    channels = brute_force_channels(planewave_setup.signals, delays, apodization_table, planewave_setup.nsamples)
+
+    nr_depth, nr_lateral = delays.shape[:2]
+    # first and last rows and the rows on both sides of the tile borders
+    for depth in (0, 1, 6, 7, 13, 14, nr_depth // 2, nr_depth - 1):
+        for lateral in range(0, nr_lateral, 5):
+            expected = brute_force_coherence(channels, depth, lateral, 4, 2)
+            np.testing.assert_allclose(slsc.lag_coherence[depth, lateral], expected, rtol=1e-9, atol=1e-12)
+            np.testing.assert_allclose(slsc.frame[depth, lateral], np.sum(expected), rtol=1e-9, atol=1e-12)
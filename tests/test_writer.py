@@ -0,0 +1,80 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements. See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+KIND, either express or implied.  See the License for the
+specific language governing permissions and limitations
+under the License.
+'''
+
+
+# Chunked frame sink: an interrupted job resumes at the chunk of the first missing frame and the finished cube equals
+# the frames written in one go
+
+
+import numpy as np
+import pytest
+
+from dasIT.data.writer import frame_writer
+
+
+FRAME_SHAPE = (12, 9)
+NR_FRAMES = 20
+
+
+def frames():
+    return np.random.default_rng(0).standard_normal(FRAME_SHAPE + (NR_FRAMES,))
+
+
+def write_batches(sink, cube, start, stop, batch=5):
+    for frame_start in range(start, stop, batch):
+        sink.write(cube[:, :, frame_start:min(frame_start + batch, stop)], start=frame_start)
+
+
+def test_resume_after_interruption(tmp_path):
+    path, cube = tmp_path / 'frames.h5', frames()
+
+    # interrupted after 10 frames, i.e. in the middle of the second chunk of 8 frames
+    with frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES, chunk_frames=8) as sink:
+        write_batches(sink, cube, 0, 10)
+        assert sink.completed_frames == 10
+
+    with frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES) as sink:
+        assert sink.completed_frames == 10
+        assert sink.next_frame == 8
+        assert not sink.done
+        write_batches(sink, cube, sink.next_frame, NR_FRAMES)
+        assert sink.done
+        np.testing.assert_array_equal(sink.dataset[...], cube)
+
+
+def test_out_of_order_batch_does_not_advance_marker(tmp_path):
+    path, cube = tmp_path / 'frames.h5', frames()
+    with frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES, chunk_frames=8) as sink:
+        sink.write(cube[:, :, 8:16], start=8)
+        assert sink.completed_frames == 0
+        sink.write(cube[:, :, :8], start=0)
+        assert sink.completed_frames == 8
+
+
+def test_resume_with_other_shape_is_rejected(tmp_path):
+    path = tmp_path / 'frames.h5'
+    with frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES):
+        pass
+    with pytest.raises(ValueError):
+        frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES + 1)
+
+    # without resume the file is started over
+    with frame_writer(path, frame_shape=FRAME_SHAPE, nr_frames=NR_FRAMES + 1, resume=False) as sink:
+        assert sink.completed_frames == 0
+        assert sink.dataset.shape == FRAME_SHAPE + (NR_FRAMES + 1,)